@@ -4,6 +4,17 @@ Health check endpoints
 from fastapi import APIRouter
 from app.models.schemas import HealthResponse
 from app.core.config import settings
+from app.core.rate_limiter import gemini_rate_limiter
+from app.core.shared_state import shared_state
+from app.core.tokens import token_counter
+from app.core.tracing import tracer
+from app.services.github_service import github_service
+from app.services.review_cache import review_cache
+from app.services.hunk_memo import hunk_review_cache
+from app.services.job_queue import job_queue
+from app.services.review_store import review_writer
+from app.services.review_worker import review_workers
+from app.services.webhook_deliveries import webhook_deliveries
 
 router = APIRouter()
 
@@ -19,5 +30,28 @@ async def health_check():
     return HealthResponse(
         status="healthy",
         version="0.1.0",
-        claude_model=settings.GEMINI_MODEL  # Still using claude_model field name for now
-    )
\ No newline at end of file
+        claude_model=settings.model_name  # Still using claude_model field name for now
+    )
+
+
+@router.get("/stats")
+async def get_stats():
+    """
+    Runtime statistics for in-process subsystems
+    
+    Returns:
+        Counters and sizes keyed by subsystem
+    """
+    return {
+        "gemini_rate_limiter": gemini_rate_limiter.stats(),
+        "token_counter": token_counter.stats(),
+        "github": github_service.stats(),
+        "webhook_deliveries": webhook_deliveries.stats(),
+        "review_cache": review_cache.stats(),
+        "hunk_cache": hunk_review_cache.stats(),
+        "jobs": await job_queue.stats(),
+        "workers": review_workers.stats(),
+        "shared_state": shared_state.stats(),
+        "review_writer": review_writer.stats(),
+        "tracing": tracer.stats()
+    }
@@ -0,0 +1,31 @@
+"""
+Background job endpoints
+"""
+from fastapi import APIRouter, HTTPException, status
+from app.models.schemas import JobStatusResponse
+from app.services.job_queue import job_queue
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    Get the status of a queued review job
+    
+    Args:
+        job_id: Id returned when the job was enqueued
+        
+    Returns:
+        Current job status, attempts and last error
+        
+    Raises:
+        HTTPException: If no job has that id
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job not found: {job_id}"
+        )
+    return job
@@ -0,0 +1,20 @@
+"""
+Prometheus scrape endpoint
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Stage timings and counters in the Prometheus text format
+    
+    Returns:
+        text/plain exposition of every registered metric
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
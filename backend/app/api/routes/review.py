@@ -1,9 +1,19 @@
 """
 Code review endpoints
 """
+import json
 from fastapi import APIRouter, HTTPException, status
-from app.models.schemas import ReviewResponse, ReviewRequest, ErrorResponse
-from app.core.gemini_client import gemini_client
+from fastapi.responses import StreamingResponse
+from app.models.schemas import (
+    BatchReviewRequest, BatchReviewResponse, ErrorResponse, ReviewRequest, ReviewResponse
+)
+from app.core.gemini_client import gemini_client, is_rate_limit_error
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+from app.core.stream_parser import IssueStreamParser
+from app.services.batch_review_service import review_batch
+from app.services.review_cache import review_cache
+from app.services.review_store import record_review
+from app.services.static_analysis import fold_findings, static_analyzer, static_result
 from app.core.config import settings
 from app.utils.logger import get_logger
 
@@ -28,28 +38,27 @@ async def analyze_code(request: ReviewRequest):
     try:
         logger.info(f"Received review request for {request.filename} ({request.review_type})")
         
-        # Validate code length
-        line_count = len(request.code.split('\n'))
-        if line_count > settings.MAX_FILE_LINES:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File too large: {line_count} lines (max {settings.MAX_FILE_LINES})"
-            )
+        _validate_request(request)
         
-        # Validate code is not empty
-        if not request.code.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Code cannot be empty"
-            )
+        # Local rules first; a file of only comments never reaches the model
+        report = await static_analyzer.analyze(request.code, request.filename, [request.review_type])
+        if not report.needs_model:
+            logger.info(f"Skipping model for {request.filename}: {report.skip_reason}")
+            review = ReviewResponse(**static_result(report, request.filename, request.review_type))
+            record_review(review.model_dump(), request.code, source="analyze")
+            return review
         
-        # Validate review type
-        valid_types = ["general", "security", "performance", "style"]
-        if request.review_type not in valid_types:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid review_type. Must be one of: {', '.join(valid_types)}"
-            )
+        # Serve repeat reviews of identical input from the cache (model results only;
+        # static findings are cheap and always current, so they are folded in afterwards)
+        cache_key = None
+        if settings.REVIEW_CACHE_ENABLED:
+            cache_key = review_cache.make_key(request.code, request.filename, request.review_type)
+            cached = await review_cache.get(cache_key)
+            if cached is not None:
+                CACHE_HITS.inc(cache="review", review_type=request.review_type)
+                logger.info(f"Cache hit for {request.filename} ({request.review_type})")
+                return fold_findings(cached, report.findings)
+            CACHE_MISSES.inc(cache="review", review_type=request.review_type)
         
         # Call Gemini to review code
         logger.info("Sending code to Gemini for review...")
@@ -59,9 +68,15 @@ async def analyze_code(request: ReviewRequest):
             review_type=request.review_type
         )
         
-        logger.info(f"Review completed successfully with {len(result.get('issues', []))} issues")
+        # Don't pin a degraded (unparseable) review in the cache
+        if cache_key and not result["metadata"].get("degraded"):
+            await review_cache.set(cache_key, ReviewResponse(**result).model_dump())
+        review = ReviewResponse(**fold_findings(result, report.findings))
+        record_review(review.model_dump(), request.code, source="analyze")
         
-        return result
+        logger.info(f"Review completed successfully with {len(review.issues)} issues")
+        
+        return review
         
     except HTTPException:
         # Re-raise HTTP exceptions (our validation errors)
@@ -69,28 +84,195 @@ async def analyze_code(request: ReviewRequest):
         
     except Exception as e:
         # Catch any other errors (API failures, etc.)
-        error_message = str(e).lower()
         logger.error(f"Error during code review: {str(e)}")
+        raise _api_error(e)
+
+
+@router.post("/analyze/stream")
+async def analyze_code_stream(request: ReviewRequest):
+    """
+    Analyze code, streaming issues over Server-Sent Events as they are found
+    
+    Events:
+        issue: One ReviewIssue, sent as soon as the model finishes writing it
+        done: The complete ReviewResponse (authoritative; replaces streamed issues)
+        error: {"status": <http status>, "detail": <message>} if the review failed
+    
+    Args:
+        request: ReviewRequest with code, filename, and review_type
         
-        # Check for rate limit errors
-        if 'quota' in error_message or 'rate limit' in error_message or 'resource exhausted' in error_message:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Gemini API rate limit reached. Please try again in a few minutes."
+    Returns:
+        text/event-stream response
+        
+    Raises:
+        HTTPException: If the request is invalid (before streaming starts)
+    """
+    logger.info(f"Received streaming review request for {request.filename} ({request.review_type})")
+    _validate_request(request)
+    
+    report = await static_analyzer.analyze(request.code, request.filename, [request.review_type])
+    
+    cache_key = None
+    cached = None
+    if settings.REVIEW_CACHE_ENABLED and report.needs_model:
+        cache_key = review_cache.make_key(request.code, request.filename, request.review_type)
+        cached = await review_cache.get(cache_key)
+        (CACHE_MISSES if cached is None else CACHE_HITS).inc(cache="review", review_type=request.review_type)
+    
+    async def events():
+        # Static findings are known before the model starts writing
+        for issue in report.findings:
+            yield _sse("issue", issue)
+        
+        if not report.needs_model:
+            review = ReviewResponse(**static_result(report, request.filename, request.review_type))
+            record_review(review.model_dump(), request.code, source="stream")
+            yield _sse("done", review.model_dump())
+            return
+        
+        if cached is not None:
+            logger.info(f"Cache hit for {request.filename} ({request.review_type})")
+            merged = fold_findings(cached, report.findings)
+            for issue in merged["issues"][len(report.findings):]:
+                yield _sse("issue", issue)
+            yield _sse("done", merged)
+            return
+        
+        parser = IssueStreamParser()
+        try:
+            async for text in gemini_client.stream_review(
+                code=request.code,
+                filename=request.filename,
+                review_type=request.review_type
+            ):
+                for issue in parser.feed(text):
+                    yield _sse("issue", issue)
+            
+            review = ReviewResponse(
+                **gemini_client.build_result(parser.text, request.filename, request.review_type, parser=parser)
             )
+            if cache_key and not review.metadata.degraded:
+                await review_cache.set(cache_key, review.model_dump())
+            review = ReviewResponse(**fold_findings(review.model_dump(), report.findings))
+            record_review(review.model_dump(), request.code, source="stream")
+            
+            logger.info(f"Streamed review completed with {len(review.issues)} issues")
+            yield _sse("done", review.model_dump())
+        
+        except Exception as e:
+            logger.error(f"Error during streaming code review: {str(e)}")
+            error = _api_error(e)
+            yield _sse("error", {"status": error.status_code, "detail": error.detail})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/batch", response_model=BatchReviewResponse)
+async def analyze_batch(request: BatchReviewRequest):
+    """
+    Review several files and/or review types in one request
+    
+    All reviews run concurrently and each file's results are merged into a
+    single de-duplicated review.
+    
+    Args:
+        request: BatchReviewRequest with files and review_types
         
-        # Check for API key errors
-        if 'api key' in error_message or 'authentication' in error_message or 'unauthorized' in error_message:
+    Returns:
+        BatchReviewResponse with one review per file
+        
+    Raises:
+        HTTPException: If the batch is invalid or a review fails
+    """
+    try:
+        logger.info(f"Received batch review request for {len(request.files)} file(s) ({', '.join(request.review_types)})")
+        
+        if not request.files or not request.review_types:
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid Gemini API key. Please check your configuration."
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Batch needs at least one file and one review type"
             )
+        if len(request.files) > settings.BATCH_MAX_FILES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many files: {len(request.files)} (max {settings.BATCH_MAX_FILES})"
+            )
+        for file in request.files:
+            for review_type in request.review_types:
+                _validate_request(ReviewRequest(code=file.code, filename=file.filename, review_type=review_type))
+        
+        results = await review_batch([file.model_dump() for file in request.files], request.review_types)
+        response = BatchReviewResponse(reviews=[ReviewResponse(**result) for result in results])
+        for file, review in zip(request.files, response.reviews):
+            record_review(review.model_dump(), file.code, source="batch")
+        return response
         
-        # Generic error
+    except HTTPException:
+        raise
+        
+    except Exception as e:
+        logger.error(f"Error during batch code review: {str(e)}")
+        raise _api_error(e)
+
+
+def _validate_request(request: ReviewRequest):
+    """Raise a 400 HTTPException if the review request can't be served"""
+    # Validate code length
+    line_count = len(request.code.split('\n'))
+    if line_count > settings.MAX_FILE_LINES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File too large: {line_count} lines (max {settings.MAX_FILE_LINES})"
+        )
+    
+    # Validate code is not empty
+    if not request.code.strip():
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to analyze code: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Code cannot be empty"
         )
+    
+    # Validate review type
+    valid_types = ["general", "security", "performance", "style"]
+    if request.review_type not in valid_types:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid review_type. Must be one of: {', '.join(valid_types)}"
+        )
+
+
+def _api_error(e: Exception) -> HTTPException:
+    """Map a model/API failure to the HTTPException the client should see"""
+    error_message = str(e).lower()
+    
+    # Check for rate limit errors (still failing after the limiter's retries)
+    if is_rate_limit_error(e):
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Gemini API rate limit reached. Please try again in a few minutes."
+        )
+    
+    # Check for API key errors
+    if 'api key' in error_message or 'authentication' in error_message or 'unauthorized' in error_message:
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid Gemini API key. Please check your configuration."
+        )
+    
+    # Generic error
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Failed to analyze code: {str(e)}"
+    )
+
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 @router.get("/types")
@@ -0,0 +1,94 @@
+"""
+Stored review history endpoints
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.models.schemas import ReviewListResponse, StoredReview
+from app.services import review_history
+
+router = APIRouter()
+
+
+def _require_db(session: Optional[AsyncSession]) -> AsyncSession:
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Review history is unavailable: the database is disabled"
+        )
+    return session
+
+
+@router.get("", response_model=ReviewListResponse)
+async def list_reviews(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    repository: Optional[str] = Query(None, description="owner/repo"),
+    severity: Optional[str] = Query(None, pattern="^(high|medium|low)$"),
+    review_type: Optional[str] = Query(None, pattern="^(general|security|performance|style)$"),
+    source: Optional[str] = Query(None, description="analyze, stream, batch or pull_request"),
+    session: Optional[AsyncSession] = Depends(get_db)
+):
+    """
+    List stored reviews, newest first
+
+    Args:
+        limit: Page size
+        cursor: next_cursor from the previous page
+        repository: Only reviews of this repository
+        severity: Only reviews with at least one issue of this severity
+        review_type: Only reviews that covered this review type
+        source: Only reviews from this source
+        session: Database session
+
+    Returns:
+        Review summaries (no code or issue details) and the next page's cursor
+
+    Raises:
+        HTTPException: If the cursor is invalid or the database is disabled
+    """
+    session = _require_db(session)
+    try:
+        return await review_history.list_reviews(
+            session,
+            limit=limit,
+            cursor=cursor,
+            repository=repository,
+            severity=severity,
+            review_type=review_type,
+            source=source
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/{review_id}", response_model=StoredReview)
+async def get_review(
+    review_id: int,
+    include_code: bool = False,
+    session: Optional[AsyncSession] = Depends(get_db)
+):
+    """
+    Get one stored review with its issues
+
+    Args:
+        review_id: Review id
+        include_code: Also return the reviewed code
+        session: Database session
+
+    Returns:
+        The stored review
+
+    Raises:
+        HTTPException: If there is no such review or the database is disabled
+    """
+    review = await review_history.get_review(_require_db(session), review_id, include_code=include_code)
+    if review is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Review not found: {review_id}"
+        )
+    return review
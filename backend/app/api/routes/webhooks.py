@@ -1,12 +1,31 @@
 import hmac
 import hashlib
 import asyncio
-from fastapi import APIRouter, Request, HTTPException, Header, BackgroundTasks
+import re
+from fastapi import APIRouter, Request, HTTPException, Header
+from fastapi.responses import ORJSONResponse
 from typing import Optional
 import os
 
+import orjson
+
+from app.core.config import settings
+from app.core.metrics import WEBHOOK_DELIVERIES, WEBHOOK_SECONDS
+from app.core.tracing import current_span, current_traceparent, tracer
+from app.services.job_queue import job_queue
+from app.services.webhook_deliveries import webhook_deliveries
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
 router = APIRouter()
 
+# Events we act on; anything else is acknowledged without parsing the payload
+HANDLED_EVENTS = {"ping", "push", "pull_request"}
+# pull_request actions that queue or cancel a review
+PR_ACTIONS = {"opened", "synchronize", "closed"}
+# GitHub sends "action" as the first key, so it can be read without parsing the whole payload
+_ACTION_RE = re.compile(rb'\s*\{\s*"action"\s*:\s*"([^"\\]{1,64})"')
+
 
 def verify_signature(payload: bytes, signature: str, secret: str) -> bool:
     """Verify GitHub webhook signature."""
@@ -18,36 +37,77 @@ def verify_signature(payload: bytes, signature: str, secret: str) -> bool:
     return hmac.compare_digest(expected, signature)
 
 
+def peek_action(payload: bytes) -> Optional[str]:
+    """The payload's action if it is the first key, without parsing the rest"""
+    match = _ACTION_RE.match(payload, 0, 256)
+    return match.group(1).decode() if match else None
+
+
 @router.post("/github")
 async def github_webhook(
     request: Request,
-    background_tasks: BackgroundTasks,
     x_hub_signature_256: Optional[str] = Header(None),
     x_github_event: Optional[str] = Header(None),
+    x_github_delivery: Optional[str] = Header(None),
 ):
     """Handle GitHub webhook events."""
+    event = x_github_event or ""
+    with WEBHOOK_SECONDS.time(event=event), tracer.span(
+        "github_webhook", **{"github.event": event, "github.delivery": x_github_delivery or ""}
+    ):
+        # Skips FastAPI's response encoding; these are small flat dicts
+        return ORJSONResponse(await _handle_webhook(request, x_hub_signature_256, event, x_github_delivery or ""))
+
+
+def _ignored(event: str, details: dict) -> dict:
+    WEBHOOK_DELIVERIES.inc(event=event, outcome="ignored")
+    return {"status": "ignored", **details}
+
+
+async def _handle_webhook(request: Request, x_hub_signature_256: Optional[str], event: str, delivery: str):
     payload = await request.body()
     
     # Verify signature
     secret = os.getenv("GITHUB_WEBHOOK_SECRET", "")
     if secret and not verify_signature(payload, x_hub_signature_256 or "", secret):
+        WEBHOOK_DELIVERIES.inc(event=event, outcome="rejected")
         raise HTTPException(status_code=401, detail="Invalid signature")
     
-    try:
-        data = await request.json()
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid JSON")
-    
-    if x_github_event == "ping":
-        return {"status": "pong", "message": "Webhook connected successfully!"}
+    # Filter on the headers (and the leading action) before paying for a full parse
+    if event not in HANDLED_EVENTS:
+        return _ignored(event, {"event": event})
+    if event == "pull_request":
+        action = peek_action(payload)
+        if action is not None and action not in PR_ACTIONS:
+            return _ignored(event, {"action": action})
     
-    elif x_github_event == "push":
-        return handle_push(data)
+    if not await webhook_deliveries.claim(delivery):
+        logger.info(f"Dropping redelivery {delivery} of a {event} event")
+        WEBHOOK_DELIVERIES.inc(event=event, outcome="duplicate")
+        return {"status": "duplicate", "delivery": delivery}
     
-    elif x_github_event == "pull_request":
-        return await handle_pull_request(data, background_tasks)
+    try:
+        data = orjson.loads(payload)
+        if not isinstance(data, dict):
+            raise ValueError("payload is not an object")
+    except ValueError:
+        await webhook_deliveries.forget(delivery)
+        WEBHOOK_DELIVERIES.inc(event=event, outcome="rejected")
+        raise HTTPException(status_code=400, detail="Invalid JSON")
     
-    return {"status": "ignored", "event": x_github_event}
+    try:
+        if event == "ping":
+            result = {"status": "pong", "message": "Webhook connected successfully!"}
+        elif event == "push":
+            result = handle_push(data)
+        else:
+            result = await handle_pull_request(data)
+    except Exception:
+        # Not handled, so GitHub's redelivery should be
+        await webhook_deliveries.forget(delivery)
+        raise
+    WEBHOOK_DELIVERIES.inc(event=event, outcome="handled" if result["status"] != "ignored" else "ignored")
+    return result
 
 
 def handle_push(data: dict):
@@ -56,12 +116,12 @@ def handle_push(data: dict):
     ref = data.get("ref", "")
     commits = data.get("commits", [])
     
-    print(f"📦 Push to {repo} on {ref}: {len(commits)} commit(s)")
+    logger.info(f"📦 Push to {repo} on {ref}: {len(commits)} commit(s)")
     
     return {"status": "received", "event": "push", "commits": len(commits)}
 
 
-async def handle_pull_request(data: dict, background_tasks: BackgroundTasks):
+async def handle_pull_request(data: dict):
     """Handle pull request events."""
     action = data.get("action", "")
     pr = data.get("pull_request", {})
@@ -73,22 +133,41 @@ async def handle_pull_request(data: dict, background_tasks: BackgroundTasks):
     pr_number = pr.get("number")
     pr_title = pr.get("title", "")
     
-    print(f"🔀 PR #{pr_number} {action} in {repo_full}: {pr_title}")
+    logger.info(f"🔀 PR #{pr_number} {action} in {repo_full}: {pr_title}")
+    span = current_span()
+    if span is not None:
+        span.set_attributes(**{"repo": repo_full, "pr.number": pr_number or 0, "pr.action": action})
+    
+    # One review per PR at a time: a newer event supersedes any pending or running one
+    dedupe_key = f"{repo_full}#{pr_number}"
     
     # Only review on opened or synchronize (new commits pushed)
     if action in ["opened", "synchronize"]:
-        # Import here to avoid circular imports
-        from app.services.pr_review_service import review_pull_request
-        
-        # Run review in background so we respond quickly to GitHub
-        background_tasks.add_task(review_pull_request, owner, repo, pr_number, pr_title)
+        # Queue the review so we respond quickly to GitHub; workers pick it up.
+        # The short delay lets a burst of pushes collapse into one review of the latest head.
+        job = await job_queue.enqueue("pr_review", repo_full, {
+            "owner": owner,
+            "repo": repo,
+            "pr_number": pr_number,
+            "pr_title": pr_title,
+            "head_sha": pr.get("head", {}).get("sha", ""),
+            # Set when the webhook comes from the GitHub App; the review calls GitHub as it
+            "installation_id": (data.get("installation") or {}).get("id"),
+            # The worker's spans join this webhook's trace
+            "traceparent": current_traceparent(),
+        }, delay=settings.PR_REVIEW_DEBOUNCE_SECONDS, dedupe_key=dedupe_key)
         
         return {
-            "status": "processing",
+            "status": "queued",
             "event": "pull_request",
             "action": action,
             "pr_number": pr_number,
-            "message": "Code review started"
+            "job_id": job["id"],
+            "message": "Code review queued"
         }
     
+    if action == "closed":
+        cancelled = await job_queue.supersede(dedupe_key)
+        return {"status": "cancelled", "action": action, "jobs": cancelled}
+    
     return {"status": "ignored", "action": action}
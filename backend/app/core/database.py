@@ -1,12 +1,81 @@
+"""
+Async database access
+
+The database is optional (DATABASE_ENABLED). When it is on, reviews are
+stored for history and analytics; nothing on the request path waits for it.
+Postgres is used through asyncpg; a sqlite:/// URL works locally through
+aiosqlite.
+"""
+from typing import AsyncIterator, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+
 from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Base = declarative_base()
+
+# Sync driver URLs (also used by Alembic) mapped to their async drivers
+_ASYNC_DRIVERS = {
+    "postgresql://": "postgresql+asyncpg://",
+    "postgresql+psycopg2://": "postgresql+asyncpg://",
+    "postgres://": "postgresql+asyncpg://",
+    "sqlite://": "sqlite+aiosqlite://",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Swap a sync driver URL for its async equivalent"""
+    for prefix, async_prefix in _ASYNC_DRIVERS.items():
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+
+def _create_engine() -> AsyncEngine:
+    url = async_database_url(settings.DATABASE_URL)
+    if url.startswith("sqlite"):
+        # SQLite has a single writer; the default pool for it is fine
+        return create_async_engine(url)
+    return create_async_engine(
+        url,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+    )
+
+
+engine: Optional[AsyncEngine] = _create_engine() if settings.DATABASE_ENABLED else None
+SessionLocal: Optional[async_sessionmaker] = (
+    async_sessionmaker(engine, expire_on_commit=False) if engine is not None else None
+)
+
+
+async def init_db():
+    """Create any missing tables (no-op when the database is disabled)"""
+    if engine is None:
+        return
+    # Import models so they are registered on Base.metadata
+    import app.models  # noqa: F401
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    logger.info("Database ready")
+
 
-# Database is optional for now
-# We're not using it for the core PR review feature
+async def close_db():
+    """Close pooled connections"""
+    if engine is not None:
+        await engine.dispose()
 
-engine = None
-SessionLocal = None
-Base = None
 
-def get_db():
-    """Database dependency - not used currently"""
-    return None
+async def get_db() -> AsyncIterator[Optional[AsyncSession]]:
+    """Database session dependency; yields None when the database is disabled"""
+    if SessionLocal is None:
+        yield None
+        return
+    async with SessionLocal() as session:
+        yield session
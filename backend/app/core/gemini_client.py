@@ -1,22 +1,206 @@
 """
 Gemini API client wrapper for code review
 """
-import json
-from typing import Dict, Any
-import google.generativeai as genai
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Any, List, Optional
 from app.core.config import settings
+from app.core.llm_provider import LLMProvider, create_provider
+from app.core.metrics import (
+    FAILURES, GEMINI_SECONDS, PARSE_SECONDS, PROMPT_BUILD_SECONDS, RATE_LIMIT_WAIT_SECONDS, TOKENS, TRUNCATIONS
+)
+from app.core.prompts import prompt_registry
+from app.core.rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, gemini_rate_limiter
+from app.core.stream_parser import IssueStreamParser, parse_review
+from app.core.tokens import estimate_tokens, token_counter
+from app.core.tracing import SPAN_KIND_CLIENT, current_span, tracer
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+def strip_code_fence(text: str) -> str:
+    """Remove the markdown code block Gemini sometimes wraps JSON in"""
+    text = text.strip()
+    
+    if text.startswith("```json"):
+        text = text[7:]  # Remove ```json
+    elif text.startswith("```"):
+        text = text[3:]  # Remove ```
+        
+    if text.endswith("```"):
+        text = text[:-3]  # Remove ending ```
+        
+    return text.strip()
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True if the model rejected a call for quota/rate reasons (HTTP 429)"""
+    # google.api_core's TooManyRequests and the stub's RateLimitError both carry the HTTP code
+    if getattr(error, "code", None) == 429:
+        return True
+    message = str(error).lower()
+    return 'quota' in message or 'rate limit' in message or 'resource exhausted' in message
+
+
 class GeminiClient:
     """Wrapper for Gemini API interactions"""
     
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        self._provider = provider
         self.max_tokens = settings.MAX_TOKENS
+        # The SDK call is blocking, so it runs on a bounded pool instead of the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.GEMINI_MAX_WORKERS,
+            thread_name_prefix="gemini"
+        )
+    
+    @property
+    def provider(self) -> LLMProvider:
+        """The model backend, built on first use so importing this module needs no key"""
+        if self._provider is None:
+            self._provider = create_provider()
+        return self._provider
+    
+    @provider.setter
+    def provider(self, provider: LLMProvider):
+        self._provider = provider
+    
+    async def _generate(
+        self,
+        prompt: str,
+        priority: int = PRIORITY_BACKGROUND,
+        review_type: str = "general",
+        repo: str = ""
+    ):
+        """
+        Run a blocking provider call without stalling the event loop
+        
+        Waits for the shared rate limiter first; a 429 pauses the limiter and
+        the call is retried up to GEMINI_MAX_RETRIES times. review_type and
+        repo only label the call's metrics.
+        """
+        loop = asyncio.get_running_loop()
+        prompt_tokens = token_counter.count(prompt)
+        with tracer.span(
+            "gemini.generate",
+            kind=SPAN_KIND_CLIENT,
+            **{"review_type": review_type, "gemini.model": settings.model_name, "tokens.in": prompt_tokens}
+        ) as span:
+            for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+                span.set_attribute("gemini.attempts", attempt + 1)
+                with RATE_LIMIT_WAIT_SECONDS.time(review_type=review_type, repo=repo):
+                    await gemini_rate_limiter.acquire(prompt_tokens, priority)
+                TOKENS.inc(prompt_tokens, direction="in", review_type=review_type, repo=repo)
+                sent_at = time.monotonic()
+                try:
+                    response = await loop.run_in_executor(self._executor, self.provider.generate, prompt)
+                except Exception as e:
+                    GEMINI_SECONDS.observe(time.monotonic() - sent_at, review_type=review_type, repo=repo)
+                    if is_rate_limit_error(e):
+                        gemini_rate_limiter.on_rate_limited(sent_at)
+                        if attempt < settings.GEMINI_MAX_RETRIES:
+                            continue
+                    FAILURES.inc(stage="gemini", review_type=review_type, repo=repo)
+                    raise
+                GEMINI_SECONDS.observe(time.monotonic() - sent_at, review_type=review_type, repo=repo)
+                gemini_rate_limiter.on_success()
+                if response.prompt_tokens:
+                    # Free calibration: the model reports what the prompt really cost
+                    token_counter.observe(prompt, response.prompt_tokens)
+                response_tokens = estimate_tokens(response.text)
+                gemini_rate_limiter.consume(response_tokens)
+                TOKENS.inc(response_tokens, direction="out", review_type=review_type, repo=repo)
+                span.set_attribute("tokens.out", response_tokens)
+                return response
+    
+    async def _generate_stream(
+        self,
+        prompt: str,
+        priority: int = PRIORITY_BACKGROUND,
+        review_type: str = "general",
+        repo: str = ""
+    ) -> AsyncIterator[str]:
+        """
+        Run a streaming provider call, yielding text as it arrives
+        
+        The blocking provider iterator is drained on the worker pool and handed to
+        the event loop through a queue. Rate limiting matches _generate; a 429
+        is only retried if nothing has been yielded yet.
+        """
+        loop = asyncio.get_running_loop()
+        prompt_tokens = estimate_tokens(prompt)
+        for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+            with RATE_LIMIT_WAIT_SECONDS.time(review_type=review_type, repo=repo):
+                await gemini_rate_limiter.acquire(prompt_tokens, priority)
+            TOKENS.inc(prompt_tokens, direction="in", review_type=review_type, repo=repo)
+            sent_at = time.monotonic()
+            queue: asyncio.Queue = asyncio.Queue()
+            stop = threading.Event()
+            
+            def produce():
+                try:
+                    for text in self.provider.stream(prompt):
+                        if stop.is_set():
+                            return
+                        loop.call_soon_threadsafe(queue.put_nowait, (text, None))
+                    loop.call_soon_threadsafe(queue.put_nowait, (None, None))
+                except Exception as e:
+                    loop.call_soon_threadsafe(queue.put_nowait, (None, e))
+            
+            loop.run_in_executor(self._executor, produce)
+            received = 0
+            try:
+                while True:
+                    text, error = await queue.get()
+                    if error is not None:
+                        GEMINI_SECONDS.observe(time.monotonic() - sent_at, review_type=review_type, repo=repo)
+                        if is_rate_limit_error(error):
+                            gemini_rate_limiter.on_rate_limited(sent_at)
+                            if received == 0 and attempt < settings.GEMINI_MAX_RETRIES:
+                                break
+                        FAILURES.inc(stage="gemini", review_type=review_type, repo=repo)
+                        raise error
+                    if text is None:
+                        GEMINI_SECONDS.observe(time.monotonic() - sent_at, review_type=review_type, repo=repo)
+                        gemini_rate_limiter.on_success()
+                        gemini_rate_limiter.consume(received)
+                        TOKENS.inc(received, direction="out", review_type=review_type, repo=repo)
+                        # A generator can't hold a span across yields, so annotate the caller's
+                        span = current_span()
+                        if span is not None:
+                            span.set_attributes(**{"tokens.in": prompt_tokens, "tokens.out": received})
+                        return
+                    received += estimate_tokens(text)
+                    yield text
+            finally:
+                # Lets the worker thread stop early if the client went away
+                stop.set()
+    
+    def shutdown(self):
+        """Stop the worker pool, dropping calls that have not started yet"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def count_tokens(self, text: str) -> int:
+        """
+        Exact token count for text from the model's tokenizer
+        
+        Counts are cached by content hash and calibrate estimate_tokens. If
+        the count call fails, the calibrated estimate is returned instead.
+        """
+        tokens = token_counter.exact(text)
+        if tokens is not None:
+            return tokens
+        loop = asyncio.get_running_loop()
+        try:
+            tokens = await loop.run_in_executor(self._executor, self.provider.count_tokens, text)
+        except Exception as e:
+            logger.debug(f"count_tokens failed, using estimate: {str(e)}")
+            return token_counter.estimate(text)
+        token_counter.observe(text, tokens)
+        return tokens
     
     async def review_code(
         self, 
@@ -36,137 +220,158 @@ class GeminiClient:
             Dictionary with review results
         """
         try:
-            prompt = self._build_prompt(code, filename, review_type)
+            with PROMPT_BUILD_SECONDS.time(review_type=review_type):
+                prompt = self._build_prompt(code, filename, review_type)
             
             logger.info(f"Sending review request for {filename} (type: {review_type})")
             
             # Generate response from Gemini
-            response = self.model.generate_content(prompt)
+            response = await self._generate(prompt, priority=PRIORITY_INTERACTIVE, review_type=review_type)
             
-            # Extract text from response
-            response_text = response.text
+            result = self.build_result(response.text, filename, review_type)
             
-            # Clean up response - Gemini sometimes wraps JSON in code blocks
-            response_text = response_text.strip()
+            logger.info(f"Review completed: {len(result.get('issues', []))} issues found")
             
-            # Remove markdown code blocks if present
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]  # Remove ```json
-            elif response_text.startswith("```"):
-                response_text = response_text[3:]  # Remove ```
-                
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]  # Remove ending ```
-                
-            response_text = response_text.strip()
+            return result
             
-            # Try to parse as JSON
-            try:
-                result = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                logger.warning(f"Failed to parse JSON: {str(e)}")
-                logger.warning(f"Response text: {response_text[:200]}...")
-                # If not JSON, wrap in structure
-                result = {
-                    "issues": [],
-                    "summary": response_text,
-                    "positive_aspects": []
-                }
+        except Exception as e:
+            logger.error(f"Gemini API error: {str(e)}")
+            raise
+    
+    async def review_code_combined(
+        self,
+        code: str,
+        filename: str,
+        review_types: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Review code for several review types with a single model call
+        
+        Args:
+            code: The code to review
+            filename: Name of the file being reviewed
+            review_types: Review types to cover, e.g. ["security", "style"]
             
-            # Add metadata
-            result["metadata"] = {
-                "model": settings.GEMINI_MODEL,
-                "filename": filename,
-                "review_type": review_type
-            }
+        Returns:
+            Dictionary with review results; metadata.review_type lists the
+            types joined with commas
+        """
+        label = ",".join(review_types)
+        try:
+            with PROMPT_BUILD_SECONDS.time(review_type=label):
+                prompt = self._build_combined_prompt(code, filename, review_types)
             
-            logger.info(f"Review completed: {len(result.get('issues', []))} issues found")
+            logger.info(f"Sending combined review request for {filename} (types: {', '.join(review_types)})")
             
-            return result
+            response = await self._generate(prompt, priority=PRIORITY_INTERACTIVE, review_type=label)
+            return self.build_result(response.text, filename, label)
             
         except Exception as e:
             logger.error(f"Gemini API error: {str(e)}")
             raise
     
-    def _build_prompt(self, code: str, filename: str, review_type: str) -> str:
-        """Build the prompt for Gemini based on review type"""
+    async def stream_review(
+        self,
+        code: str,
+        filename: str,
+        review_type: str = "general"
+    ) -> AsyncIterator[str]:
+        """
+        Stream a code review from Gemini as it is generated
         
-        base_context = f"""You are an expert code reviewer analyzing JavaScript/TypeScript code.
-File: {filename}
-
-"""
+        Args:
+            code: The code to review
+            filename: Name of the file being reviewed
+            review_type: Type of review (general, security, performance, style)
+            
+        Yields:
+            Pieces of the raw JSON review text; pass the joined text to
+            build_result once the stream ends
+        """
+        with PROMPT_BUILD_SECONDS.time(review_type=review_type):
+            prompt = self._build_prompt(code, filename, review_type)
+        logger.info(f"Streaming review request for {filename} (type: {review_type})")
+        async for text in self._generate_stream(prompt, priority=PRIORITY_INTERACTIVE, review_type=review_type):
+            yield text
+    
+    def build_result(
+        self,
+        response_text: str,
+        filename: str,
+        review_type: str,
+        parser: Optional[IssueStreamParser] = None
+    ) -> Dict[str, Any]:
+        """
+        Turn raw model output into a review result dict
         
-        if review_type == "general":
-            instructions = """Analyze this code comprehensively and identify:
-1. **Bugs and Errors**: Logic errors, potential runtime issues, edge cases, type coercion problems
-2. **Code Quality**: Readability, maintainability, naming conventions
-3. **Best Practices**: Modern JavaScript/TypeScript patterns, common pitfalls
-4. **Performance**: Inefficient algorithms, unnecessary computations
-5. **Security**: Potential vulnerabilities, unsafe operations
-
-"""
-        elif review_type == "security":
-            instructions = """Focus specifically on security vulnerabilities:
-1. **Injection Attacks**: SQL injection, XSS, command injection
-2. **Authentication/Authorization**: Weak auth, missing checks
-3. **Data Exposure**: Sensitive data in logs, insecure storage
-4. **Dependencies**: Known vulnerable packages
-5. **Input Validation**: Missing or weak validation
-
-"""
-        elif review_type == "performance":
-            instructions = """Focus on performance optimization:
-1. **Algorithm Efficiency**: Time/space complexity issues
-2. **Memory Leaks**: Unclosed resources, circular references
-3. **Async Operations**: Blocking operations, race conditions
-4. **Database Queries**: N+1 queries, missing indexes
-5. **Caching Opportunities**: Repeated computations
-
-"""
-        elif review_type == "style":
-            instructions = """Focus on code style and maintainability:
-1. **Naming**: Variable, function, class naming
-2. **Structure**: Function length, code organization
-3. **Documentation**: Missing comments, unclear logic
-4. **Consistency**: Style inconsistencies
-5. **Modern Patterns**: Outdated patterns, ES6+ features
-
-"""
-        else:
-            instructions = "Provide a general code review.\n\n"
+        Malformed JSON is repaired where possible, so findings survive code
+        fences, trailing commas and truncated answers.
         
-        output_format = """Respond in JSON format:
-{
-  "issues": [
-    {
-      "type": "bug|security|performance|style",
-      "severity": "high|medium|low",
-      "line": <line_number or null>,
-      "title": "Brief title",
-      "description": "Detailed explanation",
-      "suggestion": "How to fix it",
-      "code_snippet": "Relevant code if helpful"
-    }
-  ],
-  "summary": "Overall assessment of the code quality",
-  "positive_aspects": ["List of things done well"]
-}
-
-Code to review:
-```javascript
-"""
+        Args:
+            response_text: Full text returned by the model
+            filename: Name of the reviewed file
+            review_type: Type of review
+            parser: Parser that already consumed the text while streaming;
+                    its issues are reused instead of parsing them again
+            
+        Returns:
+            Dictionary with issues, summary, positive_aspects and metadata
+        """
+        with PARSE_SECONDS.time(review_type=review_type):
+            parsed = parser.finish() if parser is not None else parse_review(response_text)
+        if parsed.truncated:
+            TRUNCATIONS.inc(review_type=review_type)
+        if parsed.rejected:
+            logger.warning(f"Dropped {parsed.rejected} issue(s) that did not match the schema")
         
-        return base_context + instructions + output_format + code + "\n```"
-
+        result = parsed.data
+        if result is None:
+            FAILURES.inc(stage="parse", review_type=review_type)
+            response_text = strip_code_fence(response_text)
+            logger.warning(f"Response text: {response_text[:200]}...")
+            # If not JSON, wrap in structure
+            result = {
+                "issues": [],
+                "summary": response_text,
+                "positive_aspects": []
+            }
+        elif parsed.repaired:
+            logger.info(f"Repaired malformed review JSON ({len(result['issues'])} issues recovered)")
+        
+        # Add metadata
+        result["metadata"] = {
+            "model": settings.model_name,
+            "filename": filename,
+            "review_type": review_type,
+            # A truncated answer is partial, so it counts as degraded even if recovered
+            "degraded": parsed.data is None or parsed.truncated,
+            "repaired": parsed.repaired
+        }
+        return result
+    
+    def _build_prompt(self, code: str, filename: str, review_type: str) -> str:
+        """Build the prompt for Gemini for the file's language and review type"""
+        return prompt_registry.build(code, filename, (review_type,))
+    
+    def _build_combined_prompt(self, code: str, filename: str, review_types: List[str]) -> str:
+        """Build one prompt covering several review types, so the code is only sent once"""
+        return prompt_registry.build(code, filename, review_types)
 
-    async def generate_review(self, prompt: str) -> str:
+    async def generate_review(
+        self,
+        prompt: str,
+        priority: int = PRIORITY_BACKGROUND,
+        review_type: str = "general",
+        repo: str = ""
+    ) -> str:
         """
         Generate a free-form code review from Gemini.
-        Used for PR reviews where we want a markdown response.
+        Used for PR reviews, which queue behind interactive requests by default.
+        review_type and repo label the call's metrics.
         """
         try:
             # We can use the same model
-            response = self.model.generate_content(prompt)
+            response = await self._generate(prompt, priority=priority, review_type=review_type, repo=repo)
             return response.text
         except Exception as e:
             logger.error(f"Gemini API error (generate_review): {str(e)}")
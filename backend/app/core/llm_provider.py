@@ -0,0 +1,308 @@
+"""
+Model providers behind GeminiClient
+
+GeminiClient owns everything around a model call (rate limiting, retries,
+metrics, tracing, parsing); a provider only turns a prompt into text. The
+gemini provider wraps google.generativeai. The stub provider is a local,
+deterministic stand-in for benchmarks, CI and offline work: it answers
+with canned review JSON (or malformed, empty or prose output) after a
+configurable latency, so the whole webhook → review → comment path can be
+timed without a key or network.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class Completion:
+    """Text of one model answer"""
+    text: str
+    prompt_tokens: Optional[int] = None  # As reported by the model, when it does
+
+
+class RateLimitError(Exception):
+    """The model rejected a call for quota reasons (HTTP 429)"""
+    code = 429
+
+
+class LLMProvider:
+    """
+    A model backend; every method is blocking and runs on GeminiClient's pool
+    """
+    name = ""
+
+    def generate(self, prompt: str) -> Completion:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Yield the answer's text as it is generated"""
+        raise NotImplementedError
+
+    def count_tokens(self, text: str) -> int:
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through google.generativeai"""
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str):
+        # Imported here so the stub provider works without the SDK installed
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str) -> Completion:
+        response = self.model.generate_content(prompt)
+        # Raises ValueError for blocked responses, which callers report
+        text = response.text
+        usage = getattr(response, "usage_metadata", None)
+        return Completion(text, getattr(usage, "prompt_token_count", None) or None)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+    def count_tokens(self, text: str) -> int:
+        return int(self.model.count_tokens(text).total_tokens)
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution like "lognormal:1.2,0.5" into a sampler
+
+    Args:
+        spec: fixed:S, uniform:A,B, normal:MEAN,SD, lognormal:MEDIAN,SIGMA or
+              exponential:MEAN, all in seconds; a bare number means fixed
+
+    Returns:
+        Function drawing one latency (seconds, never negative) from an rng
+    """
+    kind, _, args = spec.strip().partition(":")
+    if not args:
+        kind, args = "fixed", kind
+    try:
+        values = [float(value) for value in args.split(",")]
+    except ValueError:
+        raise ValueError(f"Bad latency spec: {spec}")
+    samplers = {
+        ("fixed", 1): lambda rng: values[0],
+        ("uniform", 2): lambda rng: rng.uniform(values[0], values[1]),
+        ("normal", 2): lambda rng: rng.gauss(values[0], values[1]),
+        ("lognormal", 2): lambda rng: values[0] * rng.lognormvariate(0.0, values[1]),
+        ("exponential", 1): lambda rng: rng.expovariate(1.0 / values[0]) if values[0] else 0.0,
+    }
+    sampler = samplers.get((kind.lower(), len(values)))
+    if sampler is None:
+        raise ValueError(f"Bad latency spec: {spec}")
+    return lambda rng: max(sampler(rng), 0.0)
+
+
+_DIFF_BLOCK_RE = re.compile(r"```diff\n(.*?)\n```", re.DOTALL)
+_CODE_BLOCK_RE = re.compile(r"Code to review:\n```[^\n]*\n(.*)\n```", re.DOTALL)
+_HUNK_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+_ISSUE_TYPES = ("bug", "security", "performance", "style")
+_SEVERITIES = ("high", "medium", "low")
+
+
+def _added_lines(diff: str) -> List[tuple]:
+    """(path, new line number) of every added line in a unified diff"""
+    spots = []
+    path, line_number = None, 0
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            path = line[6:] if line.startswith("+++ b/") else None
+            continue
+        match = _HUNK_RE.match(line)
+        if match:
+            line_number = int(match.group(1))
+            continue
+        if path is None or line.startswith(("diff --git", "--- ", "\\")):
+            continue
+        if line.startswith("+"):
+            spots.append((path, line_number))
+        if not line.startswith("-"):
+            line_number += 1
+    return spots
+
+
+class StubProvider(LLMProvider):
+    """
+    Local deterministic model for benchmarks, CI and offline runs
+
+    Every draw (latency, which lines to flag, injected failures) comes from
+    an rng seeded by the prompt, the seed and how often that prompt was
+    sent, so a run replays exactly, retries included. Subclass and override
+    respond() for custom answers.
+    """
+    name = "stub"
+
+    # Prompts whose send count is remembered; retries come soon after, so older ones are dropped
+    TRACKED_PROMPTS = 4096
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        tokens_per_second: float = 0.0,
+        output: str = "review",
+        response_file: str = "",
+        issues: int = 2,
+        malformed_rate: float = 0.0,
+        error_rate: float = 0.0,
+        chunk_chars: int = 32,
+        seed: int = 0
+    ):
+        """
+        Args:
+            latency: Time to the first token, see parse_latency
+            tokens_per_second: Generation speed after the first token (0 = instant)
+            output: review, empty, malformed or prose
+            response_file: File whose contents are returned verbatim instead
+            issues: Issues in a canned review
+            malformed_rate: Share of answers cut short or given a trailing comma
+            error_rate: Share of calls failing with a 429
+            chunk_chars: Characters per streamed chunk
+            seed: Varies the draws between otherwise identical runs
+        """
+        if output not in ("review", "empty", "malformed", "prose"):
+            raise ValueError(f"Unknown stub output: {output}")
+        self.latency = parse_latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.output = output
+        self.canned = None
+        if response_file:
+            with open(response_file, encoding="utf-8") as f:
+                self.canned = f.read()
+        self.issues = issues
+        self.malformed_rate = malformed_rate
+        self.error_rate = error_rate
+        self.chunk_chars = max(chunk_chars, 1)
+        self.seed = seed
+        self.calls = 0
+        self._attempts: "OrderedDict[str, int]" = OrderedDict()  # prompt digest -> times sent, least recent first
+        self._lock = threading.Lock()
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            self.calls += 1
+            attempt = self._attempts.pop(digest, 0)
+            self._attempts[digest] = attempt + 1
+            if len(self._attempts) > self.TRACKED_PROMPTS:
+                self._attempts.popitem(last=False)
+        return random.Random(f"{self.seed}:{digest}:{attempt}")
+
+    def respond(self, prompt: str, rng: random.Random) -> str:
+        """The full answer to a prompt"""
+        if self.canned is not None:
+            return self.canned
+        if self.output == "empty":
+            return ""
+        if self.output == "prose":
+            return "The code looks reasonable. Consider adding tests for the edge cases."
+        text = json.dumps(self.review(prompt, rng), indent=2)
+        if self.output == "malformed" or rng.random() < self.malformed_rate:
+            text = self.malform(text, rng)
+        return text
+
+    def review(self, prompt: str, rng: random.Random) -> dict:
+        """A canned review flagging lines of the diff or code in the prompt"""
+        diff = _DIFF_BLOCK_RE.search(prompt)
+        if diff is not None:
+            spots = _added_lines(diff.group(1))
+        else:
+            code = _CODE_BLOCK_RE.search(prompt)
+            lines = code.group(1).splitlines() if code else []
+            spots = [(None, number) for number, line in enumerate(lines, start=1) if line.strip()]
+        picked = sorted(rng.sample(spots, min(self.issues, len(spots))), key=lambda spot: (spot[0] or "", spot[1]))
+        issues = []
+        for path, line in picked:
+            issue = {
+                "type": rng.choice(_ISSUE_TYPES),
+                "severity": rng.choice(_SEVERITIES),
+                "line": line,
+                "title": f"Stub finding on line {line}",
+                "description": "Canned finding from the stub model.",
+                "suggestion": "Nothing to do; this review is synthetic."
+            }
+            if path is not None:
+                issue["file"] = path
+            issues.append(issue)
+        return {"summary": f"Stub review with {len(issues)} issue(s)", "issues": issues, "positive_aspects": []}
+
+    @staticmethod
+    def malform(text: str, rng: random.Random) -> str:
+        """Break JSON the ways models do: cut off mid-answer, or a trailing comma"""
+        if rng.random() < 0.5 and "}\n  ]" in text:
+            return text.replace("}\n  ]", "},\n  ]", 1)
+        return text[:max(len(text) * 2 // 3, 1)]
+
+    def _answer(self, prompt: str) -> tuple:
+        """The answer and the delay before its first token, or a 429"""
+        rng = self._rng(prompt)
+        delay = self.latency(rng)
+        if rng.random() < self.error_rate:
+            time.sleep(delay)
+            raise RateLimitError("429 Resource exhausted (stub)")
+        return self.respond(prompt, rng), delay
+
+    def _generation_seconds(self, text: str) -> float:
+        if not self.tokens_per_second:
+            return 0.0
+        return (len(text) / 4) / self.tokens_per_second
+
+    def generate(self, prompt: str) -> Completion:
+        text, delay = self._answer(prompt)
+        time.sleep(delay + self._generation_seconds(text))
+        return Completion(text, self.count_tokens(prompt))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        text, delay = self._answer(prompt)
+        time.sleep(delay)
+        for start in range(0, len(text), self.chunk_chars):
+            chunk = text[start:start + self.chunk_chars]
+            time.sleep(self._generation_seconds(chunk))
+            yield chunk
+
+    def count_tokens(self, text: str) -> int:
+        return max(len(text) // 4, 1)
+
+
+def create_provider(name: str = None) -> LLMProvider:
+    """
+    Build the provider selected by LLM_PROVIDER
+
+    Args:
+        name: Provider to build instead of settings.LLM_PROVIDER
+
+    Returns:
+        The provider
+    """
+    name = name or settings.LLM_PROVIDER
+    if name == "gemini":
+        return GeminiProvider(settings.GEMINI_API_KEY, settings.GEMINI_MODEL)
+    if name == "stub":
+        logger.info(f"Using the stub model (latency {settings.LLM_STUB_LATENCY}, output {settings.LLM_STUB_OUTPUT})")
+        return StubProvider(
+            latency=settings.LLM_STUB_LATENCY,
+            tokens_per_second=settings.LLM_STUB_TOKENS_PER_SECOND,
+            output=settings.LLM_STUB_OUTPUT,
+            response_file=settings.LLM_STUB_RESPONSE_FILE,
+            issues=settings.LLM_STUB_ISSUES,
+            malformed_rate=settings.LLM_STUB_MALFORMED_RATE,
+            error_rate=settings.LLM_STUB_ERROR_RATE,
+            chunk_chars=settings.LLM_STUB_STREAM_CHUNK_CHARS,
+            seed=settings.LLM_STUB_SEED
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER: {name}")
@@ -0,0 +1,236 @@
+"""
+In-process metrics in the Prometheus text format
+
+Counters and histograms are plain Python objects updated from the event
+loop: an observation is a dict lookup, a bisect and two additions, cheap
+enough to leave on everywhere. GET /metrics renders them for scraping.
+
+Label values are capped per metric (METRICS_MAX_SERIES); once a metric has
+that many series, new label combinations are counted under "other" so an
+unbounded label such as repo can't grow memory without limit.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from app.core.config import settings
+
+# Seconds; spans a cache hit up to a long model call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+OVERFLOW_LABEL = "other"
+
+
+class _CounterSeries:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class _HistogramSeries:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        registry.register(self)
+
+    def labels(self, **labels):
+        """Series for one label combination; missing labels are empty strings"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            if len(self._series) >= settings.METRICS_MAX_SERIES:
+                key = (OVERFLOW_LABEL,) * len(self.labelnames)
+                series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = self._new_series()
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, series in sorted(self._series.items()):
+            lines.extend(self._render_series(key, series))
+        return lines
+
+    def _render_series(self, key, series) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. tokens sent or failures"""
+    kind = "counter"
+
+    def _new_series(self) -> _CounterSeries:
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def _render_series(self, key, series: _CounterSeries) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {_number(series.value)}"]
+
+
+class Histogram(_Metric):
+    """Distribution of durations (seconds) over fixed buckets"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_series(self) -> _HistogramSeries:
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        """Context manager observing how long its block takes"""
+        return self.labels(**labels).time()
+
+    def _render_series(self, key, series: _HistogramSeries) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), series.counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+            lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_number(series.sum)}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {series.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Every metric defined in the process, in definition order"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+registry = MetricsRegistry()
+
+
+# Stage timings
+WEBHOOK_SECONDS = Histogram(
+    "brocode_webhook_seconds", "Time to handle a GitHub webhook delivery", ["event"]
+)
+DIFF_FETCH_SECONDS = Histogram(
+    "brocode_diff_fetch_seconds", "Time to fetch a pull request diff from GitHub", ["repo"]
+)
+PROMPT_BUILD_SECONDS = Histogram(
+    "brocode_prompt_build_seconds", "Time to build a model prompt", ["review_type", "repo"]
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "brocode_rate_limit_wait_seconds", "Time a model call waited for quota", ["review_type", "repo"]
+)
+GEMINI_SECONDS = Histogram(
+    "brocode_gemini_seconds", "Model call latency, excluding quota waits", ["review_type", "repo"]
+)
+PARSE_SECONDS = Histogram(
+    "brocode_parse_seconds", "Time to parse a model response into a review", ["review_type", "repo"]
+)
+COMMENT_POST_SECONDS = Histogram(
+    "brocode_comment_post_seconds", "Time to post a review comment on GitHub", ["repo"]
+)
+
+# Counters
+TOKENS = Counter(
+    "brocode_tokens_total", "Estimated model tokens, direction is in (prompt) or out (response)",
+    ["direction", "review_type", "repo"]
+)
+CACHE_HITS = Counter(
+    "brocode_cache_hits_total", "Reviews (cache=review) or PR hunks (cache=hunk) served from cache",
+    ["cache", "review_type", "repo"]
+)
+CACHE_MISSES = Counter(
+    "brocode_cache_misses_total", "Cache lookups that needed a model call",
+    ["cache", "review_type", "repo"]
+)
+TRUNCATIONS = Counter(
+    "brocode_truncated_reviews_total", "Model answers that were cut off", ["review_type", "repo"]
+)
+FILES_SKIPPED = Counter(
+    "brocode_pr_files_skipped_total", "PR files left out of review by the file filter", ["reason"]
+)
+STATIC_FINDINGS = Counter(
+    "brocode_static_findings_total", "Findings from the local static analysis rules", ["rule"]
+)
+MODEL_CALLS_SKIPPED = Counter(
+    "brocode_model_calls_skipped_total", "Files and PR hunks settled by static analysis alone",
+    ["reason", "source"]
+)
+WEBHOOK_DELIVERIES = Counter(
+    "brocode_webhook_deliveries_total",
+    "GitHub webhook deliveries by outcome (handled, ignored, duplicate, rejected)", ["event", "outcome"]
+)
+FAILURES = Counter(
+    "brocode_failures_total", "Failed pipeline stages (gemini, parse, diff_fetch, comment_post)",
+    ["stage", "review_type", "repo"]
+)
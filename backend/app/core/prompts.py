@@ -0,0 +1,374 @@
+"""
+Language detection and precompiled review prompt templates
+
+The language of a file is taken from its name (extension or well-known file
+name), then from a shebang, then from a few telltale constructs in the first
+couple of KB of the code. Each (language, review types) pair has one prompt
+template, assembled once: the registry compiles every single-type template
+when it is created and caches combined ones on first use, so building a
+prompt per request is three string joins around the filename and code.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Bump whenever the templates change so cached reviews from the old prompt are not reused
+PROMPT_VERSION = "2"
+
+REVIEW_TYPES = ("general", "security", "performance", "style")
+
+# Content sniffing only looks at the start of the file
+SNIFF_CHARS = 2048
+
+
+@dataclass(frozen=True)
+class Language:
+    """A language the reviewer knows how to focus on"""
+    key: str
+    name: str
+    fence: str
+    extensions: Tuple[str, ...] = ()
+    filenames: Tuple[str, ...] = ()
+    interpreters: Tuple[str, ...] = ()
+    # Review type -> what to look out for in this language
+    focus: Dict[str, str] = field(default_factory=dict, hash=False, compare=False)
+
+
+LANGUAGES = [
+    Language(
+        "python", "Python", "python", (".py", ".pyi", ".pyw"), ("SConstruct",), ("python", "python3"),
+        {
+            "general": "mutable default arguments, broad except clauses, late-binding closures, None handling",
+            "security": "eval/exec, pickle or yaml.load on untrusted data, subprocess with shell=True, SQL built with f-strings",
+            "performance": "quadratic list operations, string concatenation in loops, blocking I/O inside async code",
+            "style": "PEP 8, type hints, comprehensions and context managers where they read better",
+        },
+    ),
+    Language(
+        "javascript", "JavaScript", "javascript", (".js", ".jsx", ".mjs", ".cjs"), (), ("node", "nodejs"),
+        {
+            "general": "type coercion, unhandled promise rejections, `this` binding, null/undefined checks",
+            "security": "XSS through innerHTML or dangerouslySetInnerHTML, eval, prototype pollution, catastrophic regexes",
+            "performance": "blocking the event loop, needless re-renders, leaked listeners and timers",
+            "style": "const/let, async/await, destructuring and other modern syntax",
+        },
+    ),
+    Language(
+        "typescript", "TypeScript", "typescript", (".ts", ".tsx", ".mts", ".cts"), (), ("ts-node", "deno"),
+        {
+            "general": "`any` leaks, unsafe casts and non-null assertions, unhandled promise rejections",
+            "security": "XSS through innerHTML or dangerouslySetInnerHTML, eval, prototype pollution, unvalidated external data typed as trusted",
+            "performance": "blocking the event loop, needless re-renders, leaked listeners and timers",
+            "style": "precise types over `any`, discriminated unions, readonly where data is not mutated",
+        },
+    ),
+    Language(
+        "go", "Go", "go", (".go",), (), (),
+        {
+            "general": "ignored errors, nil dereferences, goroutine leaks, loop variable capture, defer inside loops",
+            "security": "input reaching os/exec or database/sql unescaped, disabled TLS verification, unchecked type assertions",
+            "performance": "avoidable allocations, slices not preallocated, unbounded goroutines, lock contention",
+            "style": "Effective Go conventions, wrapped errors with context, small interfaces",
+        },
+    ),
+    Language(
+        "java", "Java", "java", (".java",), (), (),
+        {
+            "general": "null handling, equals/hashCode contracts, unclosed resources, thread safety",
+            "security": "unsafe deserialization, XXE, SQL built by concatenation, path traversal",
+            "performance": "boxing in hot loops, string concatenation in loops, over-broad synchronization",
+            "style": "Java naming conventions, try-with-resources, Optional instead of null returns",
+        },
+    ),
+    Language(
+        "kotlin", "Kotlin", "kotlin", (".kt", ".kts"), (), (),
+        {
+            "general": "`!!` assertions, platform types from Java, coroutine scope and cancellation",
+            "security": "SQL built with string templates, unsafe deserialization, exported Android components",
+            "performance": "blocking calls on the main dispatcher, needless collection copies",
+            "style": "idiomatic null safety, data classes, scope functions used sparingly",
+        },
+    ),
+    Language(
+        "rust", "Rust", "rust", (".rs",), (), (),
+        {
+            "general": "unwrap/expect on fallible paths, integer overflow, unsound unsafe blocks",
+            "security": "unsafe code soundness, unchecked indexing on untrusted input, panics reachable from input",
+            "performance": "needless clones and allocations, holding locks across .await",
+            "style": "clippy lints, ? for error propagation, iterator adaptors over index loops",
+        },
+    ),
+    Language(
+        "ruby", "Ruby", "ruby", (".rb", ".rake"), ("Gemfile", "Rakefile"), ("ruby",),
+        {
+            "general": "nil errors, mutation of shared state, rescue of StandardError",
+            "security": "SQL fragments from params, mass assignment, send/constantize on user input",
+            "performance": "N+1 queries, loading whole tables into memory",
+            "style": "Ruby style guide conventions, guard clauses, small methods",
+        },
+    ),
+    Language(
+        "php", "PHP", "php", (".php",), (), ("php",),
+        {
+            "general": "loose comparisons, unchecked array keys, error suppression with @",
+            "security": "SQL injection, XSS from unescaped output, file inclusion, unserialize on input",
+            "performance": "queries in loops, repeated file reads",
+            "style": "PSR-12, strict types, typed properties",
+        },
+    ),
+    Language(
+        "csharp", "C#", "csharp", (".cs",), (), (),
+        {
+            "general": "null references, async void, undisposed IDisposables, deadlocks from .Result",
+            "security": "SQL built by concatenation, unsafe deserialization, missing authorization attributes",
+            "performance": "sync over async, LINQ in hot paths, boxing",
+            "style": ".NET naming conventions, using declarations, nullable reference types",
+        },
+    ),
+    Language(
+        "c", "C", "c", (".c", ".h"), (), (),
+        {
+            "general": "buffer overflows, use after free, leaks, unchecked return values, undefined behaviour",
+            "security": "unbounded string functions, format string bugs, integer overflow in sizes",
+            "performance": "cache-unfriendly access, repeated strlen, needless copies",
+            "style": "consistent ownership rules, const correctness, small functions",
+        },
+    ),
+    Language(
+        "cpp", "C++", "cpp", (".cc", ".cpp", ".cxx", ".hpp", ".hh", ".hxx"), (), (),
+        {
+            "general": "dangling references, iterator invalidation, raw new/delete, undefined behaviour",
+            "security": "buffer overflows, unchecked casts, integer overflow in sizes",
+            "performance": "needless copies where a move or reference would do, allocation in hot loops",
+            "style": "RAII, smart pointers, const correctness",
+        },
+    ),
+    Language(
+        "swift", "Swift", "swift", (".swift",), (), (),
+        {
+            "general": "force unwraps, retain cycles in closures, main-thread UI updates",
+            "security": "insecure storage of secrets, disabled certificate validation",
+            "performance": "work on the main thread, needless copies of large value types",
+            "style": "Swift API design guidelines, guard let, value types where possible",
+        },
+    ),
+    Language(
+        "shell", "shell", "bash", (".sh", ".bash", ".zsh"), (), ("sh", "bash", "zsh", "dash"),
+        {
+            "general": "unquoted variables, missing set -euo pipefail, unchecked exit codes",
+            "security": "eval or unquoted input reaching commands, predictable temp files",
+            "performance": "subshells and pipelines inside loops",
+            "style": "quoting, [[ ]] tests, functions for repeated steps",
+        },
+    ),
+    Language(
+        "sql", "SQL", "sql", (".sql",), (), (),
+        {
+            "general": "NULL semantics, implicit type conversions, missing transaction boundaries",
+            "security": "dynamic SQL built from input, over-broad grants",
+            "performance": "missing indexes, SELECT *, functions on indexed columns",
+            "style": "consistent keyword case, explicit column lists, readable joins",
+        },
+    ),
+]
+
+# Used when nothing identifies the language
+GENERIC = Language("text", "", "")
+
+_BY_KEY = {language.key: language for language in LANGUAGES}
+_BY_EXTENSION = {ext: language for language in LANGUAGES for ext in language.extensions}
+_BY_FILENAME = {name.lower(): language for language in LANGUAGES for name in language.filenames}
+_BY_INTERPRETER = {name: language for language in LANGUAGES for name in language.interpreters}
+
+_SHEBANG_RE = re.compile(r"^#!\s*(?:\S*/)?(?:env\s+(?:-\S+\s+)*)?([\w.+-]+)")
+
+# (language, construct, weight); a language needs a score of 2 to be picked
+_CONTENT_HINTS = [
+    ("php", r"<\?php", 2),
+    ("go", r"^package \w+\s*$", 2),
+    ("go", r"\bfunc (\(\w+ \*?\w+\) )?\w+\(", 1),
+    ("go", r":= ", 1),
+    ("python", r"^(from [\w.]+ )?import [\w.]+", 1),
+    ("python", r"^\s*def \w+\(.*\)( -> .+)?:\s*$", 2),
+    ("python", r"^\s*class \w+(\(.*\))?:\s*$", 2),
+    ("python", r"\bself\.", 1),
+    ("rust", r"^\s*(pub )?fn \w+", 2),
+    ("rust", r"\blet mut\b|^use \w+::", 1),
+    ("java", r"^import java\.|\bpublic (final )?class\b", 2),
+    ("java", r"System\.out\.", 1),
+    ("csharp", r"^using System|\bnamespace [\w.]+", 2),
+    ("typescript", r"\binterface \w+ \{|: (string|number|boolean)\b|^export type ", 2),
+    ("javascript", r"\brequire\(|module\.exports|\bconst \w+ = |=> ", 1),
+    ("javascript", r"^import .* from ['\"]", 1),
+    ("ruby", r"^\s*require ['\"]|^\s*def \w+[^:]*$|^\s*end\s*$", 1),
+    ("c", r"^#include [<\"]\w+\.h[>\"]", 2),
+    ("cpp", r"^#include <\w+>|\bstd::|\btemplate ?<", 2),
+    ("sql", r"^\s*(SELECT|INSERT|UPDATE|DELETE|CREATE TABLE)\b", 2),
+]
+_CONTENT_RES = [
+    (_BY_KEY[key], re.compile(pattern, re.MULTILINE), weight) for key, pattern, weight in _CONTENT_HINTS
+]
+
+
+def detect_language(filename: str, code: str = "") -> Language:
+    """
+    Language of a file, from its name first and its content second
+
+    Args:
+        filename: File name or path
+        code: File content, used when the name is not conclusive
+
+    Returns:
+        The detected Language, or GENERIC
+    """
+    # str methods rather than os.path: this runs on every review request
+    name = filename.rpartition("/")[2].rpartition("\\")[2].lower()
+    language = _BY_FILENAME.get(name)
+    if language is None and "." in name:
+        language = _BY_EXTENSION.get("." + name.rpartition(".")[2])
+    if language is not None or not code:
+        return language or GENERIC
+
+    shebang = _SHEBANG_RE.match(code)
+    if shebang:
+        interpreter = re.sub(r"[\d.]+$", "", shebang.group(1))
+        language = _BY_INTERPRETER.get(shebang.group(1)) or _BY_INTERPRETER.get(interpreter)
+        if language is not None:
+            return language
+
+    head = code[:SNIFF_CHARS]
+    scores: Dict[str, int] = {}
+    for candidate, pattern, weight in _CONTENT_RES:
+        if pattern.search(head):
+            scores[candidate.key] = scores.get(candidate.key, 0) + weight
+    if scores:
+        key = max(scores, key=scores.get)
+        if scores[key] >= 2:
+            return _BY_KEY[key]
+    return GENERIC
+
+
+_INSTRUCTIONS = {
+    "general": (
+        "Review this code and report:\n"
+        "1. Bugs: logic errors, runtime failures, unhandled edge cases\n"
+        "2. Security: vulnerabilities and unsafe operations\n"
+        "3. Performance: inefficient algorithms, needless work\n"
+        "4. Maintainability: readability, naming, structure\n"
+    ),
+    "security": (
+        "Review this code for security vulnerabilities only:\n"
+        "1. Injection: SQL, command, XSS, path traversal\n"
+        "2. Missing or weak authentication and authorization checks\n"
+        "3. Sensitive data exposed in logs, errors or storage\n"
+        "4. Missing or weak input validation\n"
+    ),
+    "performance": (
+        "Review this code for performance problems only:\n"
+        "1. Time and memory complexity\n"
+        "2. Leaked resources: files, connections, handles\n"
+        "3. Blocking calls and concurrency issues\n"
+        "4. Database access: N+1 queries, missing indexes; work that could be cached\n"
+    ),
+    "style": (
+        "Review this code for style and maintainability only:\n"
+        "1. Naming\n"
+        "2. Function length and organization\n"
+        "3. Unclear logic without documentation\n"
+        "4. Inconsistencies\n"
+    ),
+}
+
+_FALLBACK_INSTRUCTIONS = "Review this code and report:\n1. Bugs, security issues, performance problems and unclear code\n"
+
+OUTPUT_FORMAT = """
+Respond with JSON only:
+{"issues": [{"type": "bug|security|performance|style", "severity": "high|medium|low", "line": <number or null>, "title": "...", "description": "...", "suggestion": "...", "code_snippet": "optional"}], "summary": "Overall assessment", "positive_aspects": ["..."]}
+
+"""
+
+
+def _instructions(language: Language, review_type: str) -> str:
+    text = _INSTRUCTIONS.get(review_type)
+    if text is None:
+        return _FALLBACK_INSTRUCTIONS
+    focus = language.focus.get(review_type)
+    if focus:
+        text += f"5. {language.name} specifics: {focus}\n"
+    return text
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A compiled prompt: fixed text around the two per-request values"""
+    head: str
+    middle: str
+    tail: str
+
+    def render(self, filename: str, code: str) -> str:
+        return f"{self.head}{filename}{self.middle}{code}{self.tail}"
+
+
+def compile_template(language: Language, review_types: Sequence[str]) -> PromptTemplate:
+    """Assemble the fixed parts of the prompt for one language and set of review types"""
+    reviewer = f"You are an expert {language.name} code reviewer." if language.name else "You are an expert code reviewer."
+    if len(review_types) == 1:
+        instructions = _instructions(language, review_types[0])
+    else:
+        instructions = (
+            "Review this code in each of the following areas. Report every issue once, "
+            "under the type that fits it best.\n\n"
+            # Each section without its "Review this code for ... only" opener
+            + "\n".join(f"### {review_type.title()} review\n" + _instructions(language, review_type).partition("\n")[2]
+                        for review_type in review_types)
+        )
+    return PromptTemplate(
+        head=f"{reviewer}\nFile: ",
+        middle=f"\n\n{instructions}{OUTPUT_FORMAT}Code to review:\n```{language.fence}\n",
+        tail="\n```",
+    )
+
+
+class PromptRegistry:
+    """Compiled templates per (language, review types)"""
+
+    def __init__(self, languages: Sequence[Language]):
+        self._templates: Dict[Tuple[str, Tuple[str, ...]], PromptTemplate] = {}
+        self._languages = [*languages, GENERIC]
+        for language in self._languages:
+            for review_type in REVIEW_TYPES:
+                self._templates[(language.key, (review_type,))] = compile_template(language, (review_type,))
+
+    def template(self, language: Language, review_types: Sequence[str]) -> PromptTemplate:
+        """
+        The compiled template for a language and review types
+
+        Combinations of known review types are cached on first use; anything
+        else is compiled per call so request input can't grow the cache.
+        """
+        key = (language.key, tuple(review_types))
+        template = self._templates.get(key)
+        if template is None:
+            template = compile_template(language, review_types)
+            if all(review_type in _INSTRUCTIONS for review_type in review_types):
+                self._templates[key] = template
+        return template
+
+    def build(self, code: str, filename: str, review_types: Sequence[str], language: Optional[Language] = None) -> str:
+        """
+        The review prompt for a file
+
+        Args:
+            code: Code to review
+            filename: Its file name, also used to detect the language
+            review_types: One review type, or several for a combined prompt
+            language: Skip detection and use this language
+        """
+        language = language or detect_language(filename, code)
+        return self.template(language, review_types).render(filename, code)
+
+    def languages(self) -> List[str]:
+        return [language.key for language in self._languages]
+
+
+prompt_registry = PromptRegistry(LANGUAGES)
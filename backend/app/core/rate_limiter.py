@@ -0,0 +1,215 @@
+"""
+Request and token rate limiting for Gemini calls
+
+Keeps model traffic just under the configured quota instead of bursting into
+429s. Callers wait in a priority queue (interactive reviews ahead of webhook
+jobs, FIFO within a priority) until both the request bucket and the token
+bucket can cover them. A 429 from the model pauses the whole queue with
+exponential backoff. When several processes share the quota (see
+shared_state), each limits itself to an even share of it.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.shared_state import shared_state
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+class TokenBucket:
+    """
+    Token bucket sized so no sliding window of `period` seconds exceeds limit
+
+    A burst of `burst_fraction` of the limit is allowed up front and the rest
+    refills evenly over the period (burst + refill per period == limit).
+    """
+
+    def __init__(self, limit: int, period: float = 60.0, burst_fraction: float = 0.1):
+        self.period = period
+        self.burst_fraction = burst_fraction
+        self.limit = limit
+        self.capacity = limit * burst_fraction
+        self.rate = limit * (1 - burst_fraction) / period
+        self.available = self.capacity
+        self._updated = time.monotonic()
+
+    def resize(self, limit: float):
+        """Change the limit, keeping at most the new capacity available"""
+        self._refill(time.monotonic())
+        self.limit = limit
+        self.capacity = limit * self.burst_fraction
+        self.rate = limit * (1 - self.burst_fraction) / self.period
+        self.available = min(self.available, self.capacity)
+
+    @property
+    def unlimited(self) -> bool:
+        return self.limit <= 0
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (capped at capacity so big requests still run)"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.available
+        return max(needed / self.rate, 0.0)
+
+    def take(self, amount: float, now: float):
+        """Take amount; the balance may go negative, which is paid back by later refills"""
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.available -= amount
+
+
+class RateLimiter:
+    """Priority-queued limiter over a request bucket and a token bucket"""
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        backoff_base: float,
+        backoff_max: float,
+        period: float = 60.0
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.requests = TokenBucket(requests_per_minute, period)
+        self.tokens = TokenBucket(tokens_per_minute, period)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._paused_until = 0.0
+        self._strikes = 0
+        self._last_strike = 0.0
+        self._counters = {"granted": 0, "rate_limited": 0, "wait_seconds": 0.0}
+
+    async def acquire(self, tokens: int, priority: int = PRIORITY_BACKGROUND):
+        """
+        Wait for a slot to send one request of about `tokens` tokens
+
+        Args:
+            tokens: Estimated prompt tokens for the request
+            priority: Lower runs first (PRIORITY_INTERACTIVE before PRIORITY_BACKGROUND)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), tokens, future))
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A cancelled waiter is skipped when it reaches the head of the queue
+            self._dispatch()
+            raise
+        self._counters["wait_seconds"] += time.monotonic() - started
+
+    def consume(self, tokens: int):
+        """Charge tokens only known after the call (e.g. the response)"""
+        self.tokens.take(tokens, time.monotonic())
+
+    def on_rate_limited(self, sent_at: float):
+        """
+        The model returned a 429: pause everyone with exponential backoff
+
+        Args:
+            sent_at: time.monotonic() when the rejected call was sent. Calls
+                     already in flight when the last backoff began don't
+                     escalate it further.
+        """
+        if sent_at < self._last_strike:
+            return
+        self._last_strike = time.monotonic()
+        self._strikes += 1
+        self._counters["rate_limited"] += 1
+        delay = min(self.backoff_base * 2 ** (self._strikes - 1), self.backoff_max)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        logger.warning(f"Gemini rate limited; pausing calls for {delay:.1f}s")
+
+    def on_success(self):
+        self._strikes = 0
+
+    def set_processes(self, processes: int):
+        """Take an even share of the quota, split with the other processes using it"""
+        if self.requests_per_minute > 0:
+            self.requests.resize(self.requests_per_minute / processes)
+        if self.tokens_per_minute > 0:
+            self.tokens.resize(self.tokens_per_minute / processes)
+        if self._waiters:
+            self._dispatch()
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(tokens, now)
+            )
+            if wait > 0:
+                loop = asyncio.get_running_loop()
+                self._timer = loop.call_later(wait, self._dispatch)
+                return
+
+            heapq.heappop(self._waiters)
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            self._counters["granted"] += 1
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per priority and remaining budget"""
+        now = time.monotonic()
+        depth: Dict[str, int] = {}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                depth[name] = depth.get(name, 0) + 1
+        self.requests._refill(now)
+        self.tokens._refill(now)
+        return {
+            **self._counters,
+            "queue_depth": sum(depth.values()),
+            "queue_depth_by_priority": depth,
+            "requests_available": None if self.requests.unlimited else round(self.requests.available, 2),
+            "tokens_available": None if self.tokens.unlimited else int(self.tokens.available),
+            "paused_for_seconds": round(max(self._paused_until - now, 0.0), 2),
+        }
+
+
+gemini_rate_limiter = RateLimiter(
+    requests_per_minute=settings.REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.TOKENS_PER_MINUTE,
+    backoff_base=settings.GEMINI_RATE_LIMIT_BACKOFF_SECONDS,
+    backoff_max=settings.GEMINI_RATE_LIMIT_BACKOFF_MAX_SECONDS
+)
+shared_state.on_processes_changed(gemini_rate_limiter.set_processes)
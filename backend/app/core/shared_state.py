@@ -0,0 +1,392 @@
+"""
+State shared by every API and worker process
+
+The API can run several uvicorn workers and any number of `python -m
+app.worker` processes. Anything that must hold across all of them lives
+here, behind one small interface:
+
+- webhook delivery dedup and review cache entries (keys with a TTL)
+- PR review locks (a key owned by one worker, renewed while it works)
+- which processes are alive, so each takes its share of the Gemini quota
+
+Backends (SHARED_STATE_BACKEND):
+- memory: a dict, for a single process (the default)
+- sqlite: a file every process on the host opens (SHARED_STATE_PATH);
+  SQLite's file locks make each operation atomic
+- redis: any Redis-compatible server (SHARED_STATE_URL), for several hosts
+
+Backend calls are blocking; the async API runs them on a thread, except for
+the memory backend, which never waits.
+"""
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Heartbeat group of the processes sharing the state
+PROCESSES = "processes"
+
+
+class SharedState:
+    """
+    Keys with a TTL and heartbeat groups
+
+    Subclasses implement the blocking methods; callers use the async ones.
+    Every key has an owner value, so a lock is only renewed or released by
+    whoever holds it.
+    """
+    name = ""
+    # Whether other processes see the same state
+    shared = True
+
+    def __init__(self, heartbeat_seconds: float):
+        self.heartbeat_seconds = heartbeat_seconds
+        # Identifies this process in heartbeat groups
+        self.process_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.processes = 1
+        self._listeners: List[Callable[[int], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    # Blocking implementations ------------------------------------------------
+
+    def _add(self, key: str, value: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    def _get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: str, ttl: float):
+        raise NotImplementedError
+
+    def _delete(self, key: str, owner: Optional[str]) -> bool:
+        raise NotImplementedError
+
+    def _renew(self, key: str, owner: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    def _heartbeat(self, group: str, member: str, ttl: float) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    # Async API ---------------------------------------------------------------
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(fn, *args)
+
+    async def add(self, key: str, ttl: float, value: str = "1") -> bool:
+        """
+        Set a key unless it is already set (and not expired)
+
+        Args:
+            key: The key
+            ttl: Seconds until it expires
+            value: Stored value; for a lock, its owner
+
+        Returns:
+            True if this call set it
+        """
+        return await self._call(self._add, key, value, ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        """The key's value, or None if unset or expired"""
+        return await self._call(self._get, key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        """Set a key, replacing any value"""
+        await self._call(self._set, key, value, ttl)
+
+    async def delete(self, key: str, owner: Optional[str] = None) -> bool:
+        """Delete a key; with an owner, only if that is still its value"""
+        return await self._call(self._delete, key, owner)
+
+    async def renew(self, key: str, owner: str, ttl: float) -> bool:
+        """Push back the expiry of a key still held by owner; False if it was lost"""
+        return await self._call(self._renew, key, owner, ttl)
+
+    async def heartbeat(self, group: str, member: str, ttl: float) -> int:
+        """Mark member alive for ttl seconds; returns how many members of the group are alive"""
+        return await self._call(self._heartbeat, group, member, ttl)
+
+    # Process membership ------------------------------------------------------
+
+    def on_processes_changed(self, listener: Callable[[int], None]):
+        """Call listener with the number of live processes whenever it changes"""
+        self._listeners.append(listener)
+
+    async def _beat(self):
+        processes = await self.heartbeat(PROCESSES, self.process_id, self.heartbeat_seconds * 3)
+        processes = max(processes, 1)
+        if processes != self.processes:
+            logger.info(f"Sharing state with {processes} process(es) ({self.name})")
+            self.processes = processes
+            for listener in self._listeners:
+                listener(processes)
+
+    async def _beat_forever(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                await self._beat()
+            except Exception as e:
+                logger.warning(f"Shared state heartbeat failed: {e}")
+
+    async def start(self):
+        """Join the process group. Called from the app and worker startup."""
+        if self._task is not None or not self.shared:
+            return
+        await self._beat()
+        self._task = asyncio.create_task(self._beat_forever())
+
+    async def stop(self):
+        """Stop the heartbeat; the process drops out of the group when it expires"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": self.name, "processes": self.processes}
+
+
+class MemoryState(SharedState):
+    """In-process state, for a single API process running its own workers"""
+    name = "memory"
+    shared = False
+
+    # Expired keys are swept after this many writes
+    SWEEP_EVERY = 1024
+
+    def __init__(self, heartbeat_seconds: float):
+        super().__init__(heartbeat_seconds)
+        self._lock = threading.Lock()
+        self._keys: Dict[str, Tuple[str, float]] = {}  # key -> (value, expires at)
+        self._writes = 0
+
+    async def _call(self, fn, *args):
+        return fn(*args)
+
+    def _live(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        entry = self._keys.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._keys[key]
+            return None
+        return entry
+
+    def _write(self, key: str, value: str, expires_at: float):
+        self._keys[key] = (value, expires_at)
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            now = time.time()
+            for stale in [k for k, (_, expires) in self._keys.items() if expires <= now]:
+                del self._keys[stale]
+
+    def _add(self, key: str, value: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            if self._live(key, now) is not None:
+                return False
+            self._write(key, value, now + ttl)
+            return True
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._live(key, time.time())
+        return entry[0] if entry else None
+
+    def _set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._write(key, value, time.time() + ttl)
+
+    def _delete(self, key: str, owner: Optional[str]) -> bool:
+        with self._lock:
+            entry = self._live(key, time.time())
+            if entry is None or (owner is not None and entry[0] != owner):
+                return False
+            del self._keys[key]
+            return True
+
+    def _renew(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is None or entry[0] != owner:
+                return False
+            self._keys[key] = (owner, now + ttl)
+            return True
+
+    def _heartbeat(self, group: str, member: str, ttl: float) -> int:
+        return 1
+
+
+class SQLiteState(SharedState):
+    """State in a SQLite file, shared by the processes on one host"""
+    name = "sqlite"
+
+    def __init__(self, path: str, heartbeat_seconds: float):
+        super().__init__(heartbeat_seconds)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_state ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_shared_state_expires_at ON shared_state (expires_at)")
+
+    def _add(self, key: str, value: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            # Takes over an expired key; leaves a live one alone
+            cursor = self._conn.execute(
+                "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at"
+                " WHERE shared_state.expires_at <= ?",
+                (key, value, now + ttl, now)
+            )
+            return cursor.rowcount > 0
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM shared_state WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl)
+            )
+
+    def _delete(self, key: str, owner: Optional[str]) -> bool:
+        with self._lock:
+            if owner is None:
+                cursor = self._conn.execute("DELETE FROM shared_state WHERE key = ?", (key,))
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM shared_state WHERE key = ? AND value = ?", (key, owner)
+                )
+            return cursor.rowcount > 0
+
+    def _renew(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE shared_state SET expires_at = ? WHERE key = ? AND value = ? AND expires_at > ?",
+                (now + ttl, key, owner, now)
+            )
+            return cursor.rowcount > 0
+
+    def _heartbeat(self, group: str, member: str, ttl: float) -> int:
+        now = time.time()
+        prefix = f"heartbeat:{group}:"
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO shared_state (key, value, expires_at) VALUES (?, ?, ?)",
+                (prefix + member, member, now + ttl)
+            )
+            # Heartbeats come rarely, so they also clear out expired keys
+            self._conn.execute("DELETE FROM shared_state WHERE expires_at <= ?", (now,))
+            # ";" sorts right after ":", so this is every key with the prefix
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM shared_state WHERE key > ? AND key < ?", (prefix, prefix[:-1] + ";")
+            ).fetchone()
+        return row[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Compare-and-delete and compare-and-expire, so a lock is only touched by its owner
+_DELETE_IF_OWNER = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+_RENEW_IF_OWNER = (
+    "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+)
+
+
+class RedisState(SharedState):
+    """State in a Redis-compatible server, shared across hosts"""
+    name = "redis"
+
+    # Namespaces BroCode's keys on a server that may hold other data
+    PREFIX = "brocode:"
+
+    def __init__(self, url: str, heartbeat_seconds: float):
+        super().__init__(heartbeat_seconds)
+        # Imported here so the package is only needed with this backend (requirements-redis.txt)
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("SHARED_STATE_BACKEND=redis needs the redis package: "
+                              "pip install -r requirements-redis.txt") from e
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._delete_if_owner = self._redis.register_script(_DELETE_IF_OWNER)
+        self._renew_if_owner = self._redis.register_script(_RENEW_IF_OWNER)
+
+    def _add(self, key: str, value: str, ttl: float) -> bool:
+        return bool(self._redis.set(self.PREFIX + key, value, nx=True, px=max(int(ttl * 1000), 1)))
+
+    def _get(self, key: str) -> Optional[str]:
+        return self._redis.get(self.PREFIX + key)
+
+    def _set(self, key: str, value: str, ttl: float):
+        self._redis.set(self.PREFIX + key, value, px=max(int(ttl * 1000), 1))
+
+    def _delete(self, key: str, owner: Optional[str]) -> bool:
+        if owner is None:
+            return bool(self._redis.delete(self.PREFIX + key))
+        return bool(self._delete_if_owner(keys=[self.PREFIX + key], args=[owner]))
+
+    def _renew(self, key: str, owner: str, ttl: float) -> bool:
+        return bool(self._renew_if_owner(keys=[self.PREFIX + key], args=[owner, max(int(ttl * 1000), 1)]))
+
+    def _heartbeat(self, group: str, member: str, ttl: float) -> int:
+        # Members of a sorted set scored by when they expire
+        key = f"{self.PREFIX}heartbeat:{group}"
+        now = time.time()
+        pipeline = self._redis.pipeline()
+        pipeline.zadd(key, {member: now + ttl})
+        pipeline.zremrangebyscore(key, "-inf", now)
+        pipeline.zcard(key)
+        return pipeline.execute()[-1]
+
+    def close(self):
+        self._redis.close()
+
+
+def create_shared_state(backend: str = None) -> SharedState:
+    """
+    Build the backend selected by SHARED_STATE_BACKEND
+
+    Args:
+        backend: Backend to build instead of settings.SHARED_STATE_BACKEND
+
+    Returns:
+        The shared state
+    """
+    backend = backend or settings.SHARED_STATE_BACKEND
+    heartbeat = settings.SHARED_STATE_HEARTBEAT_SECONDS
+    if backend == "memory":
+        return MemoryState(heartbeat)
+    if backend == "sqlite":
+        return SQLiteState(settings.SHARED_STATE_PATH, heartbeat)
+    if backend == "redis":
+        return RedisState(settings.SHARED_STATE_URL, heartbeat)
+    raise ValueError(f"Unknown SHARED_STATE_BACKEND: {backend}")
+
+
+# Global shared state
+shared_state = create_shared_state()
@@ -0,0 +1,18 @@
+"""
+The span open in the current context
+
+Kept apart from tracing so the logger can tag records with the current
+trace without importing the tracer, which logs through it.
+"""
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from app.core.tracing import Span
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional["Span"]:
+    """The innermost open span in this context, if any"""
+    return _current_span.get()
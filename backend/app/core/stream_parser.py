@@ -0,0 +1,356 @@
+"""
+Incremental, tolerant parsing of model review JSON
+
+The model writes its review as one JSON document, but not always a valid
+one: it wraps it in code fences or prose, leaves trailing commas, or stops
+mid-answer when it hits the output limit. IssueStreamParser watches the
+"issues" array as text arrives and hands back each issue as soon as its
+closing brace does, validated against ReviewIssue. When the stream ends,
+finish() repairs what it can so findings are recovered rather than the
+whole answer being thrown away.
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+from app.models.schemas import ReviewIssue
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SEEKING = "seeking"
+_IN_ARRAY = "in_array"
+_DONE = "done"
+
+# A string (group 1 is empty if it is not closed yet) or a bracket
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*("?)|[{}\[\]]', re.DOTALL)
+
+_DECODER = json.JSONDecoder(strict=False)
+
+# A whole string (skipped intact) or a comma followed by a closing bracket
+_TRAILING_COMMA = re.compile(r'"(?:[^"\\]|\\.)*"|,(\s*[}\]])', re.DOTALL)
+
+
+@dataclass
+class ParsedReview:
+    """Outcome of parsing one model response"""
+    data: Optional[Dict[str, Any]]  # issues, summary, positive_aspects; None if nothing was recoverable
+    repaired: bool = False  # malformed JSON was fixed up
+    truncated: bool = False  # the answer was cut off, so data is partial
+    rejected: int = 0  # issues dropped for failing validation
+
+
+def strip_trailing_commas(text: str) -> str:
+    """Remove commas directly before } or ], leaving string contents alone"""
+    return _TRAILING_COMMA.sub(lambda m: m.group(1) if m.group(1) is not None else m.group(0), text)
+
+
+def close_truncated(text: str) -> str:
+    """
+    Close whatever a cut-off JSON document left open
+
+    Ends an unterminated string, drops a dangling comma or key, and appends
+    the missing closing brackets.
+    """
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        text += "\\" if escaped else ""
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    elif text.endswith(":"):
+        text += " null"
+    elif stack and stack[-1] == "}" and re.search(r'[{,]\s*"(?:[^"\\]|\\.)*"$', text):
+        # A key with no value yet
+        text += ": null"
+    return text + "".join(reversed(stack))
+
+
+def _load_object(text: str) -> Optional[Dict[str, Any]]:
+    try:
+        value = json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def load_document(text: str) -> ParsedReview:
+    """
+    Parse a whole JSON object out of model text, repairing it if needed
+
+    Args:
+        text: Model output, possibly fenced, wrapped in prose, or truncated
+
+    Returns:
+        ParsedReview with the decoded object (unvalidated) in data
+    """
+    start = text.find("{")
+    if start == -1:
+        return ParsedReview(None)
+    candidate = text[start:]
+    end = candidate.rfind("}")
+
+    if end != -1:
+        value = _load_object(candidate[:end + 1])
+        if value is not None:
+            return ParsedReview(value)
+        value = _load_object(strip_trailing_commas(candidate[:end + 1]))
+        if value is not None:
+            return ParsedReview(value, repaired=True)
+
+    value = _load_object(close_truncated(strip_trailing_commas(candidate)))
+    if value is not None:
+        return ParsedReview(value, repaired=True, truncated=True)
+    return ParsedReview(None)
+
+
+class IssueStreamParser:
+    """Pulls completed issue objects out of a review while its text streams in"""
+
+    def __init__(self, key: str = "issues", model: Optional[Type[BaseModel]] = ReviewIssue):
+        """
+        Args:
+            key: Name of the top-level array holding the issues
+            model: Schema each issue is validated against; None keeps raw dicts
+        """
+        self._key = key
+        self._key_pattern = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self._model = model
+        self._chunks: List[str] = []
+        self._text: Optional[str] = ""
+        self._state = _SEEKING
+        # Only the text not yet scanned, or still part of an unfinished issue, is kept in _tail
+        self._tail = ""
+        self._pos = 0
+        self._depth = 0
+        self._pending = False  # an issue starts at _start but hasn't been decoded yet
+        self._start = 0
+        self._head = ""  # text before the issues array
+        self._after: List[str] = []  # text after it
+        self.issues: List[Dict[str, Any]] = []
+        self.repaired = False
+        self.rejected = 0
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        if self._text is None:
+            self._text = "".join(self._chunks)
+        return self._text
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add streamed text
+
+        Args:
+            chunk: The next piece of model output
+
+        Returns:
+            Issues completed by this chunk, in order
+        """
+        self._chunks.append(chunk)
+        self._text = None
+
+        if self._state == _DONE:
+            self._after.append(chunk)
+            return []
+
+        self._tail += chunk
+        if self._state == _SEEKING:
+            match = self._key_pattern.search(self._tail)
+            if match is None:
+                return []
+            self._state = _IN_ARRAY
+            self._head = self._tail[:match.end() - 1]
+            self._tail = self._tail[match.end():]
+            self._pos = 0
+
+        if self._pending and "}" not in chunk:
+            # The pending issue can't have closed yet
+            return []
+
+        completed = []
+        tail = self._tail
+        pos = self._pos
+        while True:
+            if self._pending:
+                # Let the C decoder find the end of the issue instead of scanning it here
+                try:
+                    value, pos = _DECODER.raw_decode(tail, self._start)
+                except json.JSONDecodeError as e:
+                    if e.pos >= len(tail) or e.msg.startswith("Unterminated string"):
+                        # Incomplete: try again when more text arrives
+                        pos = self._start
+                        break
+                    # Malformed: scan for the end of the object, then repair it
+                    self._pending = False
+                    self._depth = 1
+                    pos = self._start + 1
+                    continue
+                self._pending = False
+                issue = self._validate(value) if isinstance(value, dict) else None
+                if issue is not None:
+                    completed.append(issue)
+                continue
+
+            match = _TOKEN.search(tail, pos)
+            if match is None:
+                pos = len(tail)
+                break
+            char, index, pos = tail[match.start()], match.start(), match.end()
+
+            if char == '"':
+                if not match.group(1):
+                    # Unterminated string: wait for the rest of it
+                    pos = index
+                    break
+            elif char in "{[":
+                if self._depth == 0:
+                    self._start = index
+                    if char == "{":
+                        self._pending = True
+                        continue
+                self._depth += 1
+            elif self._depth == 0:
+                # End of the issues array
+                self._state = _DONE
+                self._after.append(tail[index + 1:])
+                self._tail = ""
+                break
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    issue = self._accept(tail[self._start:index + 1])
+                    if issue is not None:
+                        completed.append(issue)
+
+        if self._state == _IN_ARRAY:
+            keep = self._start if self._depth or self._pending else pos
+            self._tail = tail[keep:]
+            self._pos = pos - keep
+            if self._depth or self._pending:
+                self._start = 0
+        self.issues.extend(completed)
+        return completed
+
+    def finish(self) -> ParsedReview:
+        """
+        Parse the rest of the review once the stream has ended
+
+        Issues already extracted are not parsed again; only the document
+        around the issues array is.
+
+        Returns:
+            ParsedReview with issues, summary and positive_aspects
+        """
+        if self._state == _SEEKING:
+            # No issues array seen (or the model used another shape): parse it whole
+            parsed = load_document(self.text)
+            if parsed.data is not None:
+                self._adopt(parsed.data.get(self._key))
+            return self._result(parsed)
+
+        if self._state == _IN_ARRAY:
+            # Cut off inside the issues array: whatever closed before the cut is kept
+            head = load_document(close_truncated(self._head))
+            return self._result(ParsedReview(head.data or {}, repaired=True, truncated=True))
+
+        return self._result(load_document(self._head + "[]" + "".join(self._after)))
+
+    def _result(self, parsed: ParsedReview) -> ParsedReview:
+        if parsed.data is None and not self.issues:
+            return ParsedReview(None, rejected=self.rejected)
+        data = parsed.data or {}
+        summary = data.get("summary")
+        aspects = data.get("positive_aspects")
+        return ParsedReview(
+            {
+                "issues": self.issues,
+                "summary": summary if isinstance(summary, str) else "",
+                "positive_aspects": [str(a) for a in aspects] if isinstance(aspects, list) else [],
+            },
+            repaired=self.repaired or parsed.repaired or parsed.data is None,
+            truncated=parsed.truncated or parsed.data is None,
+            rejected=self.rejected
+        )
+
+    def _adopt(self, raw: Any):
+        """Take the issues from an already decoded document"""
+        if not isinstance(raw, list):
+            return
+        for item in raw:
+            issue = self._validate(item) if isinstance(item, dict) else None
+            if issue is not None:
+                self.issues.append(issue)
+
+    def _accept(self, fragment: str) -> Optional[Dict[str, Any]]:
+        value = _load_object(fragment)
+        if value is None:
+            value = _load_object(strip_trailing_commas(fragment))
+            if value is None:
+                logger.warning("Skipping unparseable streamed issue")
+                self.rejected += 1
+                return None
+            self.repaired = True
+        return self._validate(value)
+
+    def _validate(self, issue: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self._model is None:
+            return issue
+        try:
+            return self._model.model_validate(issue).model_dump()
+        except ValidationError:
+            self.rejected += 1
+            return None
+
+
+def parse_review(text: str, model: Optional[Type[BaseModel]] = ReviewIssue, key: str = "issues") -> ParsedReview:
+    """
+    Parse a complete model response into a review
+
+    Well-formed responses take a single json.loads; anything else goes
+    through the tolerant incremental parser.
+
+    Args:
+        text: Full model output
+        model: Schema to validate each issue against; None keeps raw dicts
+        key: Name of the issues array
+
+    Returns:
+        ParsedReview; data is None only if nothing could be recovered
+    """
+    parser = IssueStreamParser(key=key, model=model)
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        stripped = stripped.split("\n", 1)[1] if "\n" in stripped else ""
+        if stripped.rstrip().endswith("```"):
+            stripped = stripped.rstrip()[:-3]
+
+    data = _load_object(stripped)
+    if data is not None:
+        parser._adopt(data.get(key))
+        return parser._result(ParsedReview(data))
+
+    parser.feed(text)
+    return parser.finish()
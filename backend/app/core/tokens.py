@@ -0,0 +1,106 @@
+"""
+Token estimation for prompts and diffs
+
+Estimates are a character count divided by a characters-per-token ratio.
+The ratio starts at TOKEN_CHARS_PER_TOKEN and is calibrated from exact
+counts the model reports (count_tokens, or the usage metadata on a
+response), so packing tracks the real tokenizer for the code this instance
+actually sees. Exact counts are also cached by content hash, and `count()`
+returns one when the same text comes round again.
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+# Keep a single odd sample from swinging the ratio to something absurd
+MIN_CHARS_PER_TOKEN = 1.5
+MAX_CHARS_PER_TOKEN = 8.0
+
+# Older samples fade, so the ratio follows a shift in what is being reviewed
+DECAY = 0.9
+
+
+def content_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class TokenCounter:
+    """Character-ratio token estimator, calibrated against the model's tokenizer"""
+
+    def __init__(self, chars_per_token: float, cache_size: int, calibration_samples: int):
+        self.chars_per_token = chars_per_token
+        self.cache_size = cache_size
+        self.calibration_samples = calibration_samples
+        # Decayed totals over exact counts; the starting ratio is used until the first one
+        self._chars = 0.0
+        self._tokens = 0.0
+        self._exact: "OrderedDict[bytes, int]" = OrderedDict()
+        self._counters = {"samples": 0, "cache_hits": 0, "cache_misses": 0}
+
+    @property
+    def calibrated(self) -> bool:
+        return self._counters["samples"] >= self.calibration_samples
+
+    def estimate(self, text: str) -> int:
+        """Estimated token count; cheap enough to call per diff line"""
+        return int(len(text) / self.chars_per_token) + 1
+
+    def exact(self, text: str) -> Optional[int]:
+        """Cached exact count for this text, if the model has counted it before"""
+        key = content_key(text)
+        tokens = self._exact.get(key)
+        if tokens is None:
+            self._counters["cache_misses"] += 1
+            return None
+        self._exact.move_to_end(key)
+        self._counters["cache_hits"] += 1
+        return tokens
+
+    def count(self, text: str) -> int:
+        """Exact count if cached, otherwise the calibrated estimate"""
+        tokens = self.exact(text)
+        return tokens if tokens is not None else self.estimate(text)
+
+    def observe(self, text: str, tokens: int):
+        """
+        Record an exact count from the model
+
+        Args:
+            text: Text the model counted
+            tokens: Its token count
+        """
+        if not text or tokens <= 0:
+            return
+        key = content_key(text)
+        self._exact[key] = tokens
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.cache_size:
+            self._exact.popitem(last=False)
+
+        self._chars = self._chars * DECAY + len(text)
+        self._tokens = self._tokens * DECAY + tokens
+        ratio = self._chars / self._tokens
+        self.chars_per_token = min(max(ratio, MIN_CHARS_PER_TOKEN), MAX_CHARS_PER_TOKEN)
+        self._counters["samples"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "chars_per_token": round(self.chars_per_token, 3),
+            "calibrated": self.calibrated,
+            "cached": len(self._exact),
+        }
+
+
+token_counter = TokenCounter(
+    chars_per_token=settings.TOKEN_CHARS_PER_TOKEN,
+    cache_size=settings.TOKEN_COUNT_CACHE_SIZE,
+    calibration_samples=settings.TOKEN_CALIBRATION_SAMPLES
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated token count for text, using the calibrated ratio"""
+    return token_counter.estimate(text)
@@ -0,0 +1,270 @@
+"""
+Lightweight span tracing with an OTLP/JSON file exporter
+
+A span is opened with `tracer.span(name, **attributes)` and becomes the
+parent of anything started inside it, including tasks created from it
+(asyncio copies context variables into new tasks). Work that crosses the
+job queue carries a W3C traceparent in its payload, so a PR review run by a
+worker joins the trace of the webhook that queued it.
+
+Log lines written inside a span are tagged with its trace id. When
+TRACE_EXPORT_PATH is set, finished spans are batched and appended to that
+file as OTLP/JSON, one export request per line (the format the
+OpenTelemetry Collector's otlpjsonfile receiver reads). The file is written
+on a thread by the exporter task, never on the event loop.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.span_context import _current_span, current_span
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+_STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+@dataclass
+class Span:
+    """One timed operation within a trace"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    kind: int = SPAN_KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context header value pointing at this span"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": _STATUS_ERROR, "message": self.error} if self.error is not None else {},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """(trace_id, parent span_id) from a traceparent header, or None if absent or malformed"""
+    match = _TRACEPARENT.match(header.strip().lower()) if header else None
+    return match.groups() if match else None
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent for the current span, for handing work to another process"""
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+class Tracer:
+    """Creates spans and exports finished ones in batches"""
+
+    def __init__(self, path: str, service_name: str, batch_size: int, flush_interval: float):
+        self.path = path
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._finished: List[Span] = []
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._counters = {"exported": 0, "failed": 0}
+
+    @property
+    def exporting(self) -> bool:
+        return bool(self.path)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        parent: Optional[str] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        **attributes
+    ) -> Iterator[Span]:
+        """
+        Open a span for the duration of the with block
+
+        Args:
+            name: Operation name
+            parent: traceparent to continue (e.g. from a job payload or request
+                    header); defaults to the current span, else a new trace
+            kind: OTLP span kind
+            **attributes: Initial span attributes
+
+        Yields:
+            The span, for adding attributes as they become known
+        """
+        remote = parse_traceparent(parent)
+        if remote is not None:
+            trace_id, parent_span_id = remote
+        else:
+            enclosing = _current_span.get()
+            if enclosing is not None:
+                trace_id, parent_span_id = enclosing.trace_id, enclosing.span_id
+            else:
+                trace_id, parent_span_id = os.urandom(16).hex(), None
+
+        span = Span(name, trace_id, os.urandom(8).hex(), parent_span_id, kind=kind, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if self.exporting:
+                self._finish(span)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._finished.append(span)
+            full = len(self._finished) >= self.batch_size
+        if not full:
+            return
+        if self._task is not None:
+            # Spans also end on worker threads, so wake the exporter through the loop
+            self._loop.call_soon_threadsafe(self._wake.set)
+        else:
+            # No exporter running (a script outside the app lifecycle)
+            self.flush()
+
+    def flush(self):
+        """Append every finished span to the export file as one OTLP/JSON line (blocking)"""
+        with self._lock:
+            spans, self._finished = self._finished, []
+        if not spans or not self.exporting:
+            return
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "brocode"}, "spans": [span.to_otlp() for span in spans]}],
+            }]
+        }, separators=(",", ":"))
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            self._counters["failed"] += len(spans)
+            logger.error(f"Failed to export {len(spans)} span(s): {str(e)}")
+            return
+        self._counters["exported"] += len(spans)
+
+    async def start(self):
+        """Start the exporter: flushes on an interval, or sooner when a batch fills (no-op when not exporting)"""
+        if self.exporting and self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="trace-exporter")
+
+    async def stop(self):
+        """Stop the exporter and export what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await asyncio.to_thread(self.flush)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "exporting": self.exporting, "buffered": len(self._finished)}
+
+
+tracer = Tracer(
+    path=settings.TRACE_EXPORT_PATH,
+    service_name=settings.TRACE_SERVICE_NAME,
+    batch_size=settings.TRACE_BATCH_SIZE,
+    flush_interval=settings.TRACE_FLUSH_SECONDS
+)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per HTTP request"""
+
+    # Scraped or polled constantly; not worth a span each
+    UNTRACED_PATHS = {"/metrics", "/api/health"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.UNTRACED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with tracer.span(
+            f"{scope['method']} {scope['path']}",
+            parent=traceparent,
+            kind=SPAN_KIND_SERVER,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
@@ -10,9 +10,20 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from app.core.config import settings
+from app.core.database import close_db, init_db
+from app.core.gemini_client import gemini_client
+from app.core.shared_state import shared_state
+from app.core.tracing import TracingMiddleware, tracer
+from app.services.github_service import github_service
+from app.services.review_cache import review_cache
+from app.services.hunk_memo import hunk_review_cache
+from app.services.job_queue import job_queue
+from app.services.review_store import review_writer
+from app.services.review_worker import review_workers
+from app.services.static_analysis import static_analyzer
 from app.api.routes import health, review
 from app.utils.logger import get_logger
-from app.api.routes import webhooks
+from app.api.routes import webhooks, jobs, metrics, reviews
 
 logger = get_logger(__name__)
 
@@ -34,24 +45,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# One trace span per request; continues an incoming traceparent header
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(review.router, prefix="/api/review", tags=["review"])
 app.include_router(webhooks.router, prefix="/api/webhooks", tags=["webhooks"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(reviews.router, prefix="/api/reviews", tags=["reviews"])
+app.include_router(metrics.router, tags=["metrics"])
 
 
 @app.on_event("startup")
 async def startup_event():
     """Run on application startup"""
     logger.info("Starting BroCode API")
-    logger.info(f"Gemini Model: {settings.GEMINI_MODEL}")
+    settings.validate()
+    logger.info(f"Model: {settings.model_name} (provider: {settings.LLM_PROVIDER})")
     logger.info(f"Debug Mode: {settings.DEBUG}")
+    logger.info(f"Gemini worker pool: {settings.GEMINI_MAX_WORKERS} threads")
+    logger.info(f"Shared state: {settings.SHARED_STATE_BACKEND}")
+    await tracer.start()
+    await shared_state.start()
+    await job_queue.start()
+    await github_service.start()
+    await static_analyzer.start()
+    if settings.DATABASE_ENABLED:
+        await init_db()
+        await review_writer.start()
+    if settings.JOB_WORKERS > 0:
+        await review_workers.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Run on application shutdown"""
     logger.info("Shutting down BroCode API")
+    await review_workers.stop()
+    gemini_client.shutdown()
+    static_analyzer.shutdown()
+    await github_service.close()
+    await review_writer.stop()
+    await close_db()
+    review_cache.close()
+    hunk_review_cache.close()
+    job_queue.close()
+    await shared_state.stop()
+    shared_state.close()
+    await tracer.stop()
 
 
 if __name__ == "__main__":
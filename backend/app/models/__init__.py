@@ -1 +1,4 @@
-# Pydantic schemas only - database models disabled
+# Database models; Pydantic schemas live in app.models.schemas
+from app.models.user import User
+from app.models.repository import Repository
+from app.models.review import Review
@@ -7,12 +7,13 @@ class Repository(Base):
     __tablename__ = "repositories"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Repositories seen through webhooks aren't tied to a user
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     
     # GitHub Details
     github_id = Column(Integer, unique=True, nullable=True)
     name = Column(String, nullable=False)
-    full_name = Column(String, nullable=False)  # owner/repo
+    full_name = Column(String, unique=True, index=True, nullable=False)  # owner/repo
     description = Column(String, nullable=True)
     url = Column(String, nullable=True)
     
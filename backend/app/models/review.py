@@ -1,41 +1,84 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Enum as SQLEnum
+from datetime import datetime, timezone
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, ForeignKey, JSON, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-import enum
 from app.core.database import Base
 
-class ReviewType(str, enum.Enum):
-    GENERAL = "general"
-    SECURITY = "security"
-    PERFORMANCE = "performance"
-    BEST_PRACTICES = "best_practices"
+SEVERITIES = ("high", "medium", "low")
+REVIEW_TYPES = ("general", "security", "performance", "style")
+
+
+def _listing_index(name: str, sqlite_where: str, postgresql_where: str) -> Index:
+    """
+    Partial (created_at, id) index over the rows one listing filter keeps
+
+    A filtered page then seeks straight to matching reviews instead of
+    walking every newer review until the page fills.
+    """
+    return Index(
+        name, "created_at", "id",
+        sqlite_where=text(sqlite_where), postgresql_where=text(postgresql_where)
+    )
+
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        # History listings page newest first on (created_at, id), per repository or overall
+        Index("ix_reviews_repository_id_created_at", "repository_id", "created_at", "id"),
+        Index("ix_reviews_created_at", "created_at", "id"),
+        # ... and per severity and review type; predicates match the filters review_history renders
+        *(
+            _listing_index(f"ix_reviews_{name}_created_at", f"{name}_count > 0", f"{name}_count > 0")
+            for name in SEVERITIES
+        ),
+        *(
+            _listing_index(f"ix_reviews_{name}_created_at", f"covers_{name} = 1", f"covers_{name}")
+            for name in REVIEW_TYPES
+        ),
+        # Earlier reviews of the same code
+        Index("ix_reviews_content_hash", "content_hash"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Reviews from /analyze and webhooks aren't tied to a user
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     
     # Code Details
     filename = Column(String, nullable=False)
-    code = Column(Text, nullable=False)
+    code = Column(Text, nullable=True)  # Not stored for PR reviews
+    content_hash = Column(String(64), nullable=False)  # sha256 of the code (or PR diff)
     language = Column(String, nullable=True)
     
     # Review Details
-    review_type = Column(SQLEnum(ReviewType), default=ReviewType.GENERAL)
+    source = Column(String(32), nullable=False, default="analyze")  # analyze, stream, batch, pull_request
+    review_type = Column(String(64), default="general")  # Comma-separated for combined reviews
+    # The review types above as flags, so type filters can use an index
+    covers_general = Column(Boolean, default=False, nullable=False)
+    covers_security = Column(Boolean, default=False, nullable=False)
+    covers_performance = Column(Boolean, default=False, nullable=False)
+    covers_style = Column(Boolean, default=False, nullable=False)
     summary = Column(Text, nullable=True)
     issues = Column(JSON, nullable=True)  # Store as JSON array
     positive_aspects = Column(JSON, nullable=True)
     
+    # Issue counts, computed on write so listings never load the issues blob
+    issue_count = Column(Integer, default=0, nullable=False)
+    high_count = Column(Integer, default=0, nullable=False)
+    medium_count = Column(Integer, default=0, nullable=False)
+    low_count = Column(Integer, default=0, nullable=False)
+    
     # Metadata
     model = Column(String, default="gemini-pro")
     tokens_used = Column(Integer, nullable=True)
+    degraded = Column(Boolean, default=False, nullable=False)
     
     # Repository (optional)
     repository_id = Column(Integer, ForeignKey("repositories.id"), nullable=True)
+    pr_number = Column(Integer, nullable=True)
     
-    # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Timestamps (set when the review finished, not when the batch was written)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="reviews")
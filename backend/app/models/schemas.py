@@ -1,6 +1,7 @@
 """
 Pydantic models for request/response validation
 """
+from datetime import datetime
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 
@@ -14,6 +15,7 @@ class ReviewIssue(BaseModel):
     description: str = Field(..., description="Detailed explanation")
     suggestion: str = Field(..., description="How to fix the issue")
     code_snippet: Optional[str] = Field(None, description="Relevant code snippet")
+    rule: Optional[str] = Field(None, description="Static analysis rule id; unset for model findings")
 
 
 class ReviewMetadata(BaseModel):
@@ -21,6 +23,8 @@ class ReviewMetadata(BaseModel):
     model: str
     filename: str
     review_type: str
+    degraded: bool = Field(False, description="True if the model output could not be parsed, or was cut off")
+    repaired: bool = Field(False, description="True if malformed model JSON was repaired")
 
 
 class ReviewResponse(BaseModel):
@@ -41,6 +45,73 @@ class ReviewRequest(BaseModel):
     )
 
 
+class BatchReviewFile(BaseModel):
+    """One file in a batch review"""
+    code: str = Field(..., description="Code content to review")
+    filename: str = Field(..., description="Name of the file")
+
+
+class BatchReviewRequest(BaseModel):
+    """Request to review one or more files for one or more review types"""
+    files: List[BatchReviewFile] = Field(..., description="Files to review")
+    review_types: List[str] = Field(
+        default=["general"],
+        description="Review types to run on every file: general, security, performance, style"
+    )
+
+
+class BatchReviewResponse(BaseModel):
+    """Merged review per file, in request order"""
+    reviews: List[ReviewResponse]
+
+
+class JobStatusResponse(BaseModel):
+    """Status of a background review job"""
+    id: str
+    kind: str
+    repo: str
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    attempts: int
+    max_attempts: int
+    payload: Dict[str, Any]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    last_error: Optional[str] = None
+
+
+class StoredReviewSummary(BaseModel):
+    """A stored review without its code or issue details"""
+    id: int
+    filename: str
+    repository: Optional[str] = Field(None, description="owner/repo for pull request reviews")
+    pr_number: Optional[int] = None
+    source: str = Field(..., description="analyze, stream, batch or pull_request")
+    review_type: str
+    model: Optional[str] = None
+    degraded: bool
+    summary: Optional[str] = None
+    issue_count: int
+    high_count: int
+    medium_count: int
+    low_count: int
+    created_at: datetime
+
+
+class StoredReview(StoredReviewSummary):
+    """A stored review with its issues"""
+    content_hash: str
+    issues: List[Dict[str, Any]]
+    positive_aspects: List[str]
+    code: Optional[str] = Field(None, description="Only included when requested")
+
+
+class ReviewListResponse(BaseModel):
+    """One page of review history, newest first"""
+    reviews: List[StoredReviewSummary]
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to get the next page; null on the last page")
+
+
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str
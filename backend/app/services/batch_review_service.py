@@ -0,0 +1,158 @@
+"""
+Batch reviews: several review types and/or files in one request
+
+Every (file, review type) pair runs concurrently, so a full audit takes
+about as long as its slowest call. Large files get one combined prompt for
+all requested types instead, so their code is only sent once. Results are
+merged into one de-duplicated review per file.
+"""
+import asyncio
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.gemini_client import gemini_client
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+from app.core.tokens import estimate_tokens
+from app.services.review_cache import review_cache
+from app.services.static_analysis import fold_findings, static_analyzer, static_result
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SEVERITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+# Issues on the same line whose titles share at least this fraction of their words are one finding
+DUPLICATE_TITLE_SIMILARITY = 0.5
+
+
+def _title_words(title: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", title.lower()))
+
+
+def _is_duplicate(issue: Dict[str, Any], kept: Dict[str, Any]) -> bool:
+    if issue.get("line") != kept.get("line"):
+        return False
+    words, kept_words = _title_words(issue.get("title", "")), _title_words(kept.get("title", ""))
+    if not words or not kept_words:
+        return words == kept_words
+    return len(words & kept_words) / len(words | kept_words) >= DUPLICATE_TITLE_SIMILARITY
+
+
+def merge_reviews(reviews: List[Tuple[str, Dict[str, Any]]], filename: str) -> Dict[str, Any]:
+    """
+    Merge reviews of one file into a single review
+
+    Issues reported by more than one review type (same line, mostly the same
+    title) are kept once, at the highest severity reported.
+
+    Args:
+        reviews: (review type, review result) pairs, in the order requested
+        filename: Name of the reviewed file
+
+    Returns:
+        One review result dict covering every review type
+    """
+    if len(reviews) == 1:
+        return reviews[0][1]
+
+    issues: List[Dict[str, Any]] = []
+    for _, review in reviews:
+        for issue in review.get("issues", []):
+            duplicate = next((kept for kept in issues if _is_duplicate(issue, kept)), None)
+            if duplicate is None:
+                issues.append(dict(issue))
+            elif SEVERITY_RANK.get(issue.get("severity"), 3) < SEVERITY_RANK.get(duplicate.get("severity"), 3):
+                duplicate["severity"] = issue["severity"]
+
+    positive_aspects: List[str] = []
+    for _, review in reviews:
+        for aspect in review.get("positive_aspects") or []:
+            if aspect not in positive_aspects:
+                positive_aspects.append(aspect)
+
+    summary = "\n\n".join(
+        f"**{review_type.title()}:** {review['summary']}" for review_type, review in reviews if review.get("summary")
+    )
+    review_types = ",".join(review_type for review_type, _ in reviews)
+    return {
+        "issues": issues,
+        "summary": summary,
+        "positive_aspects": positive_aspects,
+        "metadata": {
+            "model": settings.model_name,
+            "filename": filename,
+            "review_type": review_types,
+            "degraded": any(review["metadata"].get("degraded") for _, review in reviews),
+        },
+    }
+
+
+async def _cached_review(code: str, filename: str, review_type: str, fetch) -> Dict[str, Any]:
+    """Serve a review from the cache, or fetch it and cache it unless degraded"""
+    cache_key: Optional[str] = None
+    if settings.REVIEW_CACHE_ENABLED:
+        cache_key = review_cache.make_key(code, filename, review_type)
+        cached = await review_cache.get(cache_key)
+        if cached is not None:
+            CACHE_HITS.inc(cache="review", review_type=review_type)
+            return cached
+        CACHE_MISSES.inc(cache="review", review_type=review_type)
+
+    result = await fetch()
+    if cache_key and not result["metadata"].get("degraded"):
+        await review_cache.set(cache_key, result)
+    return result
+
+
+async def review_file(code: str, filename: str, review_types: List[str]) -> Dict[str, Any]:
+    """
+    Review one file for every requested review type
+
+    Args:
+        code: The code to review
+        filename: Name of the file
+        review_types: Review types to cover
+
+    Returns:
+        A merged review result dict, static analysis findings first
+    """
+    report = await static_analyzer.analyze(code, filename, review_types)
+    if not report.needs_model:
+        return static_result(report, filename, ",".join(review_types))
+
+    if len(review_types) > 1 and estimate_tokens(code) >= settings.BATCH_COMBINE_MIN_TOKENS:
+        # Big file: sending the code once beats sending it once per type
+        label = ",".join(review_types)
+        result = await _cached_review(
+            code, filename, label,
+            lambda: gemini_client.review_code_combined(code, filename, review_types)
+        )
+        return fold_findings(result, report.findings)
+
+    results = await asyncio.gather(*(
+        _cached_review(
+            code, filename, review_type,
+            lambda review_type=review_type: gemini_client.review_code(code, filename, review_type)
+        )
+        for review_type in review_types
+    ))
+    return fold_findings(merge_reviews(list(zip(review_types, results)), filename), report.findings)
+
+
+async def review_batch(files: List[Dict[str, str]], review_types: List[str]) -> List[Dict[str, Any]]:
+    """
+    Review several files, each for several review types, concurrently
+
+    Args:
+        files: Dicts with "code" and "filename"
+        review_types: Review types to run on every file (duplicates ignored)
+
+    Returns:
+        One merged review result dict per file, in the order given
+    """
+    review_types = list(dict.fromkeys(review_types))
+    logger.info(f"Batch review of {len(files)} file(s) for {', '.join(review_types)}")
+    return await asyncio.gather(*(
+        review_file(file["code"], file["filename"], review_types) for file in files
+    ))
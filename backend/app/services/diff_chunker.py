@@ -0,0 +1,210 @@
+"""
+Pack parsed diff hunks into token-budgeted chunks
+
+Each chunk is small enough to review in a single model call, so a PR of any
+size is covered by several calls running side by side instead of being cut
+off at a fixed length. Source files are packed first and lockfiles and
+generated files last, and where something has to give, unchanged context
+lines are dropped before changed ones.
+"""
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterable, List
+
+from app.core.tokens import estimate_tokens
+from app.services.diff_parser import FileDiff, Hunk
+from app.services.file_filter import PRIORITY_GENERATED, file_priority
+
+# Context kept around changes when an oversized hunk has to be split anyway
+SPLIT_CONTEXT_LINES = 1
+
+
+@dataclass
+class DiffChunk:
+    """A slice of the PR diff that fits in one review request"""
+    files: List[FileDiff] = field(default_factory=list)
+    tokens: int = 0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(file_diff.text for file_diff in self.files)
+
+    @property
+    def paths(self) -> List[str]:
+        return [file_diff.path for file_diff in self.files]
+
+    @property
+    def hunk_count(self) -> int:
+        return sum(len(file_diff.hunks) for file_diff in self.files)
+
+    @property
+    def original_hunks(self) -> List[Hunk]:
+        """Hunks as they appear in the diff, before any splitting"""
+        seen = {}
+        for file_diff in self.files:
+            for hunk in file_diff.hunks:
+                original = hunk.origin or hunk
+                seen.setdefault(id(original), original)
+        return list(seen.values())
+
+
+def split_hunk(hunk: Hunk, max_tokens: int) -> List[Hunk]:
+    """
+    Split a hunk that is too big for one chunk into consecutive smaller hunks
+
+    Line numbers in each piece's header are recomputed so the pieces are
+    still valid hunks on their own, and each piece points back at the
+    original through `origin`.
+    """
+    if estimate_tokens(hunk.text) <= max_tokens:
+        return [hunk]
+
+    pieces: List[Hunk] = []
+    origin = hunk.origin or hunk
+    old_line, new_line = hunk.old_start, hunk.new_start
+    piece = Hunk(old_start=old_line, old_count=0, new_start=new_line, new_count=0, section=hunk.section, origin=origin)
+    piece_tokens = estimate_tokens(piece.header)
+
+    for line in hunk.lines:
+        line_tokens = estimate_tokens(line)
+        if piece.lines and piece_tokens + line_tokens > max_tokens:
+            pieces.append(piece)
+            piece = Hunk(old_start=old_line, old_count=0, new_start=new_line, new_count=0, section=hunk.section, origin=origin)
+            piece_tokens = estimate_tokens(piece.header)
+
+        piece.lines.append(line)
+        piece_tokens += line_tokens
+        prefix = line[:1]
+        if prefix in (" ", "-", ""):
+            piece.old_count += 1
+            old_line += 1
+        if prefix in (" ", "+", ""):
+            piece.new_count += 1
+            new_line += 1
+
+    if piece.lines:
+        pieces.append(piece)
+    return pieces
+
+
+def trim_context(hunk: Hunk, keep: int) -> List[Hunk]:
+    """
+    Drop context lines more than `keep` lines away from any change
+
+    Runs of context longer than that split the hunk, and each piece gets a
+    recomputed header and points back at the original through `origin`.
+    A hunk with no changed lines is returned as is.
+    """
+    changed = [index for index, line in enumerate(hunk.lines) if line[:1] in ("+", "-")]
+    if not changed:
+        return [hunk]
+
+    # Distance from each line to the nearest change, in one pass each way
+    distance = [len(hunk.lines)] * len(hunk.lines)
+    last = None
+    for index, line in enumerate(hunk.lines):
+        if line[:1] in ("+", "-"):
+            last = index
+        if last is not None:
+            distance[index] = index - last
+    last = None
+    for index in range(len(hunk.lines) - 1, -1, -1):
+        if hunk.lines[index][:1] in ("+", "-"):
+            last = index
+        if last is not None:
+            distance[index] = min(distance[index], last - index)
+
+    if all(d <= keep for d in distance):
+        return [hunk]
+
+    pieces: List[Hunk] = []
+    origin = hunk.origin or hunk
+    old_line, new_line = hunk.old_start, hunk.new_start
+    piece = None
+    kept_previous = False
+
+    for index, line in enumerate(hunk.lines):
+        prefix = line[:1]
+        # "\ No newline at end of file" belongs to the line before it
+        kept = kept_previous if prefix == "\\" else distance[index] <= keep
+        if kept:
+            if piece is None:
+                piece = Hunk(old_start=old_line, old_count=0, new_start=new_line, new_count=0,
+                             section=hunk.section, origin=origin)
+            piece.lines.append(line)
+        elif piece is not None:
+            pieces.append(piece)
+            piece = None
+
+        if prefix in (" ", "-", ""):
+            if kept:
+                piece.old_count += 1
+            old_line += 1
+        if prefix in (" ", "+", ""):
+            if kept:
+                piece.new_count += 1
+            new_line += 1
+        kept_previous = kept
+
+    if piece is not None:
+        pieces.append(piece)
+    return pieces
+
+
+def pack_chunks(files: Iterable[FileDiff], budget_tokens: int) -> List[DiffChunk]:
+    """
+    Pack hunks into as few chunks of at most budget_tokens as they fit in
+
+    Files are taken in priority order (source first, lockfiles and generated
+    files last; diff order otherwise) and each hunk goes into the chunk that
+    already holds its file if there is room, else the first chunk with room,
+    so small hunks fill the space larger ones left behind. Each chunk
+    repeats the file header so the model knows which file a hunk belongs
+    to. Generated files only send their changed lines, and an oversized
+    hunk sheds far-off context before it is split. Binary files and files
+    without hunks are skipped.
+    """
+    chunks: List[DiffChunk] = []
+    reviewable = [file_diff for file_diff in files if not file_diff.is_binary and file_diff.hunks]
+
+    for file_diff in sorted(reviewable, key=lambda file_diff: file_priority(file_diff.path)):
+        priority = file_priority(file_diff.path)
+        header_tokens = estimate_tokens(file_diff.header)
+        hunk_budget = max(budget_tokens - header_tokens, 1)
+        # Chunk index -> this file's entry in that chunk
+        targets: Dict[int, FileDiff] = {}
+        latest = None
+
+        for original in file_diff.hunks:
+            if priority == PRIORITY_GENERATED:
+                hunks = trim_context(original, 0)
+            elif estimate_tokens(original.text) > hunk_budget:
+                hunks = trim_context(original, SPLIT_CONTEXT_LINES)
+            else:
+                hunks = [original]
+
+            for hunk in (piece for trimmed in hunks for piece in split_hunk(trimmed, hunk_budget)):
+                hunk_tokens = estimate_tokens(hunk.text)
+                index = None
+                if latest is not None and chunks[latest].tokens + hunk_tokens <= budget_tokens:
+                    index = latest
+                else:
+                    for candidate, chunk in enumerate(chunks):
+                        cost = hunk_tokens if candidate in targets else header_tokens + hunk_tokens
+                        if chunk.tokens + cost <= budget_tokens:
+                            index = candidate
+                            break
+                if index is None:
+                    index = len(chunks)
+                    chunks.append(DiffChunk())
+
+                chunk = chunks[index]
+                target = targets.get(index)
+                if target is None:
+                    target = targets[index] = replace(file_diff, hunks=[])
+                    chunk.files.append(target)
+                    chunk.tokens += header_tokens
+                target.hunks.append(hunk)
+                chunk.tokens += hunk_tokens
+                latest = index
+
+    return chunks
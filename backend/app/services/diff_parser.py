@@ -0,0 +1,171 @@
+"""
+Streaming parser for unified diffs
+
+Splits a `git diff` (as returned by the GitHub diff media type) into files
+and hunks so a PR can be reviewed piece by piece instead of as one blob.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$")
+
+
+@dataclass
+class Hunk:
+    """One @@ block of a file diff"""
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    section: str = ""
+    lines: List[str] = field(default_factory=list)
+    # Set on pieces produced by splitting a larger hunk
+    origin: Optional["Hunk"] = field(default=None, repr=False, compare=False)
+
+    @property
+    def header(self) -> str:
+        return f"@@ -{self.old_start},{self.old_count} +{self.new_start},{self.new_count} @@{self.section}"
+
+    @property
+    def text(self) -> str:
+        return "\n".join([self.header, *self.lines])
+
+    @property
+    def added_lines(self) -> int:
+        return sum(1 for line in self.lines if line.startswith("+"))
+
+    @property
+    def removed_lines(self) -> int:
+        return sum(1 for line in self.lines if line.startswith("-"))
+
+
+@dataclass
+class FileDiff:
+    """All hunks for one file, plus the git header lines that introduce it"""
+    path: str
+    old_path: Optional[str] = None
+    status: str = "modified"  # added | deleted | modified | renamed
+    is_binary: bool = False
+    header_lines: List[str] = field(default_factory=list)
+    hunks: List[Hunk] = field(default_factory=list)
+
+    @property
+    def header(self) -> str:
+        return "\n".join(self.header_lines)
+
+    @property
+    def text(self) -> str:
+        return "\n".join([self.header, *(hunk.text for hunk in self.hunks)])
+
+
+def _strip_prefix(path: str) -> Optional[str]:
+    """Turn '--- a/foo.py' style paths into 'foo.py' ('/dev/null' -> None)"""
+    path = path.split("\t", 1)[0]
+    if path == "/dev/null":
+        return None
+    if path[:2] in ("a/", "b/"):
+        return path[2:]
+    return path
+
+
+def _parse_git_header(line: str) -> str:
+    """Best-effort path from 'diff --git a/x b/x' (used when there is no ---/+++ pair)"""
+    rest = line[len("diff --git "):]
+    if " b/" in rest:
+        return rest.rsplit(" b/", 1)[1]
+    return rest
+
+
+def iter_file_diffs(lines: Iterable[str]) -> Iterator[FileDiff]:
+    """
+    Parse a unified diff lazily, yielding each file once it is complete
+
+    Args:
+        lines: Diff lines without trailing newlines (any iterable, so a
+               response body can be fed in as it arrives)
+
+    Yields:
+        FileDiff objects in the order they appear in the diff
+    """
+    current: Optional[FileDiff] = None
+    hunk: Optional[Hunk] = None
+
+    for line in lines:
+        if line.startswith("diff --git "):
+            if current is not None:
+                yield current
+            current = FileDiff(path=_parse_git_header(line), header_lines=[line])
+            hunk = None
+            continue
+
+        if current is None:
+            # Preamble before the first file (e.g. a format-patch header)
+            continue
+
+        if hunk is None:
+            match = HUNK_HEADER_RE.match(line)
+            if match:
+                hunk = _new_hunk(match)
+                current.hunks.append(hunk)
+            else:
+                _apply_header_line(current, line)
+            continue
+
+        match = HUNK_HEADER_RE.match(line)
+        if match:
+            hunk = _new_hunk(match)
+            current.hunks.append(hunk)
+        elif line[:1] in (" ", "+", "-", "\\") or line == "":
+            hunk.lines.append(line)
+        else:
+            # Unknown line inside a hunk: treat it as more header for safety
+            _apply_header_line(current, line)
+
+    if current is not None:
+        yield current
+
+
+def parse_diff(diff: str) -> List[FileDiff]:
+    """Parse a whole diff string into a list of FileDiff"""
+    return list(iter_file_diffs(diff.splitlines()))
+
+
+def _new_hunk(match: "re.Match") -> Hunk:
+    old_start, old_count, new_start, new_count, section = match.groups()
+    return Hunk(
+        old_start=int(old_start),
+        old_count=int(old_count) if old_count is not None else 1,
+        new_start=int(new_start),
+        new_count=int(new_count) if new_count is not None else 1,
+        section=section
+    )
+
+
+def _apply_header_line(file_diff: FileDiff, line: str):
+    file_diff.header_lines.append(line)
+
+    if line.startswith("--- "):
+        old_path = _strip_prefix(line[4:])
+        file_diff.old_path = old_path
+        if old_path is None:
+            file_diff.status = "added"
+    elif line.startswith("+++ "):
+        new_path = _strip_prefix(line[4:])
+        if new_path is None:
+            file_diff.status = "deleted"
+            file_diff.path = file_diff.old_path or file_diff.path
+        else:
+            file_diff.path = new_path
+    elif line.startswith("new file mode"):
+        file_diff.status = "added"
+    elif line.startswith("deleted file mode"):
+        file_diff.status = "deleted"
+    elif line.startswith("rename from "):
+        file_diff.old_path = line[len("rename from "):]
+        file_diff.status = "renamed"
+    elif line.startswith("rename to "):
+        file_diff.path = line[len("rename to "):]
+        file_diff.status = "renamed"
+    elif line.startswith("Binary files ") or line == "GIT binary patch":
+        file_diff.is_binary = True
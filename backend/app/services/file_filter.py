@@ -0,0 +1,241 @@
+"""
+Decide which files of a pull request are worth reviewing, and in what order
+
+Works from the PR files listing (path, status, additions/deletions, patch),
+before the diff is fetched, so a PR that only bumps dependencies is settled
+without downloading its diff or calling the model. Lockfiles, minified
+bundles, snapshots, vendored and generated code are dropped (or only
+down-ranked, with REVIEW_SKIP_GENERATED=False); REVIEW_EXCLUDE_PATHS and
+REVIEW_INCLUDE_PATHS adjust that with globs. What is left is ranked so the
+riskiest changes are reviewed first.
+"""
+import fnmatch
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Pattern
+
+from app.core.config import settings
+from app.services.diff_parser import FileDiff
+
+# Packing order: lower goes first
+PRIORITY_SOURCE = 0
+PRIORITY_OTHER = 1
+PRIORITY_GENERATED = 2
+
+SOURCE_EXTENSIONS = {
+    ".py", ".pyi", ".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".vue", ".svelte",
+    ".go", ".rs", ".java", ".kt", ".kts", ".scala", ".rb", ".php", ".cs", ".swift",
+    ".c", ".h", ".cc", ".cpp", ".hpp", ".m", ".mm", ".sh", ".bash", ".sql", ".lua",
+    ".dart", ".ex", ".exs", ".erl", ".hs", ".clj", ".r", ".pl", ".tf",
+}
+
+LOCKFILES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lock",
+    "poetry.lock", "pipfile.lock", "uv.lock", "pdm.lock", "cargo.lock", "gemfile.lock",
+    "composer.lock", "go.sum", "flake.lock", "podfile.lock", "packages.lock.json", "mix.lock",
+}
+
+GENERATED_SUFFIXES = (
+    ".min.js", ".min.css", ".js.map", ".css.map", ".snap", "_pb2.py", "_pb2_grpc.py",
+    ".pb.go", ".g.dart", ".freezed.dart", ".designer.cs", ".generated.ts", ".generated.cs",
+)
+
+GENERATED_DIRS = {"dist", "build", "vendor", "node_modules", "__generated__", "generated", "third_party"}
+
+# Paths where a bug tends to cost the most
+SENSITIVE_PATH_RE = re.compile(
+    r"auth|login|passw|secret|token|crypt|secur|permission|session|payment|billing|"
+    r"webhook|migration|sql|admin|config|settings",
+    re.IGNORECASE
+)
+TEST_PATH_RE = re.compile(r"(^|/)(tests?|__tests__|spec)/|(^|/)test_|_test\.|\.(test|spec)\.", re.IGNORECASE)
+
+# Average patch line length beyond which a file is taken to be minified
+MINIFIED_LINE_LENGTH = 500
+
+SKIP_LOCKFILE = "lockfile"
+SKIP_GENERATED = "generated"
+SKIP_EXCLUDED = "excluded"
+SKIP_NO_PATCH = "binary or too large"
+SKIP_REMOVED = "removed"
+SKIP_UNCHANGED = "renamed without changes"
+SKIP_OVER_LIMIT = "over file limit"
+
+
+def file_priority(path: str) -> int:
+    """Where a file goes in the packing order: source, then other text, then generated"""
+    lowered = path.lower()
+    name = os.path.basename(lowered)
+    if name in LOCKFILES or lowered.endswith(GENERATED_SUFFIXES):
+        return PRIORITY_GENERATED
+    if GENERATED_DIRS.intersection(lowered.split("/")[:-1]):
+        return PRIORITY_GENERATED
+    if os.path.splitext(name)[1] in SOURCE_EXTENSIONS:
+        return PRIORITY_SOURCE
+    return PRIORITY_OTHER
+
+
+def compile_globs(patterns: Iterable[str]) -> Optional[Pattern]:
+    """
+    One regex for a list of globs
+
+    A glob without a slash matches the file name anywhere ("*.lock"); one
+    with a slash matches the path from the root of the repo or of any
+    directory in it ("fixtures/*" matches "tests/fixtures/a.json").
+    """
+    parts = []
+    for pattern in (p.strip() for p in patterns):
+        if not pattern:
+            continue
+        parts.append(f"(?:^|/){fnmatch.translate(pattern.lstrip('/'))}")
+    return re.compile("|".join(parts), re.IGNORECASE | re.DOTALL) if parts else None
+
+
+_exclude_re = compile_globs(settings.REVIEW_EXCLUDE_PATHS)
+_include_re = compile_globs(settings.REVIEW_INCLUDE_PATHS)
+
+
+@dataclass
+class FileDecision:
+    """What the filter made of one file in the PR"""
+    path: str
+    status: str = "modified"
+    additions: int = 0
+    deletions: int = 0
+    skip_reason: Optional[str] = None
+    risk: float = 0.0
+
+    @property
+    def reviewed(self) -> bool:
+        return self.skip_reason is None
+
+
+@dataclass
+class ReviewPlan:
+    """Files to review, riskiest first, and the files left out"""
+    files: List[FileDecision] = field(default_factory=list)
+    skipped: List[FileDecision] = field(default_factory=list)
+
+    @property
+    def paths(self) -> List[str]:
+        return [decision.path for decision in self.files]
+
+    def skipped_by_reason(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for decision in self.skipped:
+            counts[decision.skip_reason] = counts.get(decision.skip_reason, 0) + 1
+        return counts
+
+    def apply(self, files: Iterable[FileDiff]) -> List[FileDiff]:
+        """The parsed diffs of the planned files, in plan order"""
+        rank = {path: index for index, path in enumerate(self.paths)}
+        kept = [file_diff for file_diff in files if file_diff.path in rank]
+        return sorted(kept, key=lambda file_diff: rank[file_diff.path])
+
+
+def _skip_reason(path: str, status: str, changes: int, patch: Optional[str]) -> Optional[str]:
+    if _include_re is not None and _include_re.search(path):
+        return None
+    if _exclude_re is not None and _exclude_re.search(path):
+        return SKIP_EXCLUDED
+    if status == "removed":
+        return SKIP_REMOVED
+    if status == "renamed" and changes == 0:
+        return SKIP_UNCHANGED
+    if patch is None:
+        # GitHub leaves out the patch for binary files and very large diffs
+        return SKIP_NO_PATCH
+    if settings.REVIEW_SKIP_GENERATED:
+        if os.path.basename(path.lower()) in LOCKFILES:
+            return SKIP_LOCKFILE
+        if file_priority(path) == PRIORITY_GENERATED:
+            return SKIP_GENERATED
+        lines = patch.count("\n") + 1
+        if len(patch) / lines > MINIFIED_LINE_LENGTH:
+            return SKIP_GENERATED
+    return None
+
+
+def _risk(path: str, status: str, additions: int, deletions: int) -> float:
+    """Higher is reviewed first; a rough guess at where the bugs in a PR are"""
+    risk = {PRIORITY_SOURCE: 3.0, PRIORITY_OTHER: 1.0, PRIORITY_GENERATED: 0.0}[file_priority(path)]
+    if SENSITIVE_PATH_RE.search(path):
+        risk += 2.0
+    if TEST_PATH_RE.search(path):
+        risk -= 1.0
+    if additions == 0 and status != "added":
+        risk -= 1.0  # Only deletions
+    # Bigger changes hide more, with diminishing returns
+    return risk + min(math.log10(1 + additions + deletions), 3.0)
+
+
+def classify(entry: Dict[str, Any]) -> FileDecision:
+    """
+    Decide on one entry of the PR files listing
+
+    Args:
+        entry: Item from GET /pulls/{n}/files (filename, status, additions,
+               deletions, changes and, unless GitHub left it out, patch)
+    """
+    path = entry["filename"]
+    status = entry.get("status", "modified")
+    additions = int(entry.get("additions", 0))
+    deletions = int(entry.get("deletions", 0))
+    changes = int(entry.get("changes", additions + deletions))
+    return FileDecision(
+        path=path,
+        status=status,
+        additions=additions,
+        deletions=deletions,
+        skip_reason=_skip_reason(path, status, changes, entry.get("patch")),
+        risk=_risk(path, status, additions, deletions),
+    )
+
+
+def plan_review(entries: Iterable[Dict[str, Any]], max_files: Optional[int] = None) -> ReviewPlan:
+    """
+    Filter and rank the files of a PR
+
+    Args:
+        entries: The PR files listing (or listing_from_diff for a parsed diff)
+        max_files: Review at most this many files, dropping the lowest ranked;
+                   defaults to REVIEW_MAX_FILES
+
+    Returns:
+        ReviewPlan with the files to review, riskiest first
+    """
+    max_files = settings.REVIEW_MAX_FILES if max_files is None else max_files
+    plan = ReviewPlan()
+    for entry in entries:
+        decision = classify(entry)
+        (plan.files if decision.reviewed else plan.skipped).append(decision)
+
+    plan.files.sort(key=lambda decision: -decision.risk)
+    if max_files and len(plan.files) > max_files:
+        for decision in plan.files[max_files:]:
+            decision.skip_reason = SKIP_OVER_LIMIT
+        plan.skipped.extend(plan.files[max_files:])
+        del plan.files[max_files:]
+    return plan
+
+
+def listing_from_diff(files: Iterable[FileDiff]) -> List[Dict[str, Any]]:
+    """Files-listing entries built from a parsed diff, for when the listing is unavailable"""
+    status = {"deleted": "removed"}
+    entries = []
+    for file_diff in files:
+        additions = sum(hunk.added_lines for hunk in file_diff.hunks)
+        deletions = sum(hunk.removed_lines for hunk in file_diff.hunks)
+        entry = {
+            "filename": file_diff.path,
+            "status": status.get(file_diff.status, file_diff.status),
+            "additions": additions,
+            "deletions": deletions,
+            "changes": additions + deletions,
+        }
+        if file_diff.hunks and not file_diff.is_binary:
+            entry["patch"] = "\n".join(hunk.text for hunk in file_diff.hunks)
+        entries.append(entry)
+    return entries
@@ -0,0 +1,203 @@
+"""
+GitHub App authentication
+
+With GITHUB_APP_ID set, BroCode calls GitHub as an installation of the app
+instead of with one personal GITHUB_TOKEN. Every installation (an org or
+account that installed the app) has its own token and its own hourly quota,
+so API capacity grows with the number of installations.
+
+The app signs a short-lived RS256 JWT with its private key and trades it for
+an installation token, valid for an hour. Tokens are cached per installation
+and minted again GITHUB_APP_TOKEN_REFRESH_SECONDS before they expire; a lock
+per installation keeps a burst of reviews from minting one token each.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import jwk, jwt
+
+from app.core.config import settings
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# GitHub rejects app JWTs that live longer than 10 minutes; iat is backdated for clock drift
+JWT_LIFETIME_SECONDS = 540
+JWT_CLOCK_DRIFT_SECONDS = 60
+
+# A repo found without the app is looked up again after this long (it may get installed)
+NOT_INSTALLED_TTL_SECONDS = 300
+
+
+class GitHubAppError(Exception):
+    """An installation or its token could not be obtained"""
+
+
+class AppNotInstalledError(GitHubAppError):
+    """The app has no installation on the repo; retrying won't change that"""
+
+
+@dataclass
+class AccessToken:
+    """A bearer credential and when it stops working"""
+    token: str
+    expires_at: float  # Epoch seconds
+
+
+def _parse_expiry(value: str) -> float:
+    """GitHub's expires_at, e.g. 2024-01-01T12:00:00Z, as epoch seconds"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class GitHubAppAuth:
+    """App JWTs, per-installation tokens, and which installation covers a repo"""
+
+    def __init__(self, app_id: str, private_key: str, private_key_path: str, refresh_margin: float):
+        self.app_id = app_id
+        self.refresh_margin = refresh_margin
+        self._private_key = private_key
+        self._private_key_path = private_key_path
+        self._signing_key = None
+        self._jwt: Optional[AccessToken] = None
+        self._tokens: Dict[int, AccessToken] = {}
+        self._installations: Dict[str, int] = {}  # owner/repo -> installation id
+        self._not_installed: Dict[str, float] = {}  # owner/repo -> when to look it up again
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._minted = 0
+        self._mint_failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.app_id)
+
+    def _key(self):
+        """The private key, parsed once: parsing an RSA key costs far more than signing with it"""
+        if self._signing_key is None:
+            pem = self._private_key.replace("\\n", "\n")
+            if self._private_key_path:
+                with open(self._private_key_path) as f:
+                    pem = f.read()
+            self._signing_key = jwk.construct(pem, "RS256")
+        return self._signing_key
+
+    def app_jwt(self) -> str:
+        """A JWT authenticating as the app itself, reused until shortly before it expires"""
+        now = time.time()
+        if self._jwt is None or self._jwt.expires_at - now < JWT_CLOCK_DRIFT_SECONDS:
+            issued = int(now) - JWT_CLOCK_DRIFT_SECONDS
+            expires = int(now) + JWT_LIFETIME_SECONDS
+            claims = {"iat": issued, "exp": expires, "iss": self.app_id}
+            self._jwt = AccessToken(jwt.encode(claims, self._key(), algorithm="RS256"), expires)
+        return self._jwt.token
+
+    def _app_headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.app_jwt()}", "Accept": "application/vnd.github.v3+json"}
+
+    def _fresh(self, installation_id: int) -> Optional[str]:
+        cached = self._tokens.get(installation_id)
+        if cached is not None and cached.expires_at - time.time() > self.refresh_margin:
+            return cached.token
+        return None
+
+    async def token(self, client: httpx.AsyncClient, base_url: str, installation_id: int) -> str:
+        """
+        The installation's access token, minted when missing or about to expire
+
+        Args:
+            client: Connection pool to mint through
+            base_url: GitHub API root
+            installation_id: The installation, as sent in webhook payloads
+
+        Returns:
+            The token
+
+        Raises:
+            GitHubAppError: If GitHub refused to mint one and no unexpired token is cached
+        """
+        token = self._fresh(installation_id)
+        if token is not None:
+            CACHE_HITS.inc(cache="github_installation_token")
+            return token
+
+        lock = self._locks.setdefault(installation_id, asyncio.Lock())
+        async with lock:
+            # Whoever held the lock may have minted it already
+            token = self._fresh(installation_id)
+            if token is not None:
+                return token
+            CACHE_MISSES.inc(cache="github_installation_token")
+            response = await client.post(
+                f"{base_url}/app/installations/{installation_id}/access_tokens", headers=self._app_headers()
+            )
+            if response.status_code != 201:
+                self._mint_failures += 1
+                cached = self._tokens.get(installation_id)
+                if cached is not None and cached.expires_at > time.time():
+                    # Still valid for a while; try minting again on the next call
+                    logger.warning(f"⚠️ Could not refresh the token of installation {installation_id} "
+                                   f"({response.status_code}); using the current one")
+                    return cached.token
+                raise GitHubAppError(
+                    f"Could not get a token for installation {installation_id}: HTTP {response.status_code}"
+                )
+            data = response.json()
+            minted = AccessToken(data["token"], _parse_expiry(data["expires_at"]))
+            self._tokens[installation_id] = minted
+            self._minted += 1
+            logger.info(f"🔑 Token for installation {installation_id} minted, "
+                        f"valid for {minted.expires_at - time.time():.0f}s")
+            return minted.token
+
+    def invalidate(self, installation_id: int):
+        """Forget a token GitHub no longer accepts, so the next call mints a new one"""
+        self._tokens.pop(installation_id, None)
+
+    async def installation_for(self, client: httpx.AsyncClient, base_url: str, owner: str, repo: str) -> int:
+        """
+        The installation covering a repo, for calls that didn't come with one from a webhook
+
+        Raises:
+            AppNotInstalledError: If the app is not installed on the repo
+            GitHubAppError: If the lookup failed otherwise
+        """
+        repo_full = f"{owner}/{repo}"
+        installation_id = self._installations.get(repo_full)
+        if installation_id is not None:
+            return installation_id
+        if self._not_installed.get(repo_full, 0) > time.time():
+            raise AppNotInstalledError(f"The GitHub App is not installed on {repo_full}")
+        response = await client.get(f"{base_url}/repos/{repo_full}/installation", headers=self._app_headers())
+        if response.status_code == 404:
+            self._not_installed[repo_full] = time.time() + NOT_INSTALLED_TTL_SECONDS
+            raise AppNotInstalledError(f"The GitHub App is not installed on {repo_full}")
+        if response.status_code != 200:
+            raise GitHubAppError(f"Could not look up the installation of {repo_full}: HTTP {response.status_code}")
+        installation_id = response.json()["id"]
+        self._installations[repo_full] = installation_id
+        return installation_id
+
+    def reset_locks(self):
+        """Drop the locks, which belong to the event loop that created them"""
+        self._locks = {}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "installations": len(self._tokens),
+            "tokens_minted": self._minted,
+            "mint_failures": self._mint_failures,
+        }
+
+
+# Global GitHub App credentials
+github_app = GitHubAppAuth(
+    settings.GITHUB_APP_ID,
+    settings.GITHUB_APP_PRIVATE_KEY,
+    settings.GITHUB_APP_PRIVATE_KEY_PATH,
+    settings.GITHUB_APP_TOKEN_REFRESH_SECONDS
+)
@@ -1,57 +1,416 @@
+import asyncio
 import httpx
+import json
 import os
-from typing import Optional
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+from app.core.tracing import SPAN_KIND_CLIENT, tracer
+from app.services.github_app import AppNotInstalledError, github_app
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# GitHub rejects comment and review bodies longer than this
+MAX_BODY_CHARS = 65536
+
+# Response headers kept with a cached body, so a 304 can be replayed as the original 200
+_REPLAYED_HEADERS = ("content-type", "link", "etag")
+
+
+def split_review_comments(
+    comments: List[Dict[str, Any]], max_comments: int, max_bytes: int
+) -> List[List[Dict[str, Any]]]:
+    """
+    Split review comments into batches GitHub will accept in one review
+
+    Args:
+        comments: Review comments (path, line, side, body)
+        max_comments: Most comments per batch
+        max_bytes: Most bytes of JSON-encoded comments per batch
+
+    Returns:
+        Batches in the original order; always at least one (possibly empty)
+    """
+    batches: List[List[Dict[str, Any]]] = [[]]
+    size = 0
+    for comment in comments:
+        comment_size = len(json.dumps(comment).encode("utf-8"))
+        batch = batches[-1]
+        if batch and (len(batch) >= max_comments or size + comment_size > max_bytes):
+            batches.append([])
+            size = 0
+        batches[-1].append(comment)
+        size += comment_size
+    return batches
+
+
+@dataclass
+class RateBudget:
+    """GitHub's quota for one token, from the X-RateLimit-* headers of its latest response"""
+    remaining: Optional[int] = None  # None until a response reports it
+    reset: float = 0.0
+    waits: int = 0
+
+
+def _clip(body: str) -> str:
+    if len(body) <= MAX_BODY_CHARS:
+        return body
+    note = "\n\n*…truncated to fit GitHub's size limit*"
+    return body[:MAX_BODY_CHARS - len(note)] + note
+
 
 class GitHubService:
-    """Service for interacting with GitHub API."""
-    
+    """
+    Service for interacting with GitHub API.
+
+    Calls authenticate with GITHUB_TOKEN, or as a GitHub App installation when
+    one is configured (see github_app); every token has its own rate budget.
+    """
+
     def __init__(self):
         self.token = os.getenv("GITHUB_TOKEN")
-        self.base_url = "https://api.github.com"
+        self.base_url = settings.GITHUB_API_URL
+        # Authorization is added per request, for the token the call is made with
         self.headers = {
-            "Authorization": f"token {self.token}",
             "Accept": "application/vnd.github.v3+json",
         }
-    
-    async def get_pr_diff(self, owner: str, repo: str, pr_number: int) -> Optional[str]:
+        self._client: Optional[httpx.AsyncClient] = None
+        # (url, accept) -> (etag, body, replayed headers), least recently used first
+        self._etags: "OrderedDict[Tuple[str, str], Tuple[str, bytes, Dict[str, str]]]" = OrderedDict()
+        self._etag_bytes = 0
+        # Installation id -> its quota; None is GITHUB_TOKEN's
+        self._budgets: Dict[Optional[int], RateBudget] = {}
+        self._requests = 0
+        self._not_modified = 0
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """Build the shared keep-alive connection pool."""
+        return httpx.AsyncClient(
+            http2=settings.GITHUB_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.GITHUB_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GITHUB_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.GITHUB_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.GITHUB_TIMEOUT_SECONDS,
+                connect=settings.GITHUB_CONNECT_TIMEOUT_SECONDS,
+            ),
+        )
+
+    async def start(self):
+        """Open the connection pool. Called from the app startup hook."""
+        if self._client is None:
+            self._client = self._create_client()
+
+    async def close(self):
+        """Close the connection pool. Called from the app shutdown hook."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        github_app.reset_locks()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client, opened lazily when used outside the app lifecycle."""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def stats(self) -> Dict[str, Any]:
+        token = self._budgets.get(None, RateBudget())
+        return {
+            "requests": self._requests,
+            "not_modified": self._not_modified,
+            "rate_limit_remaining": token.remaining,
+            "rate_limit_waits": sum(budget.waits for budget in self._budgets.values()),
+            "installations": {
+                str(installation): budget.remaining
+                for installation, budget in self._budgets.items() if installation is not None
+            },
+            "app": github_app.stats(),
+            "etag_entries": len(self._etags),
+            "etag_bytes": self._etag_bytes,
+        }
+
+    def _budget(self, installation: Optional[int]) -> RateBudget:
+        budget = self._budgets.get(installation)
+        if budget is None:
+            budget = self._budgets[installation] = RateBudget()
+        return budget
+
+    @staticmethod
+    def _record_rate_limit(budget: RateBudget, response: httpx.Response):
+        remaining = response.headers.get("x-ratelimit-remaining")
+        if remaining is not None and remaining.isdigit():
+            budget.remaining = int(remaining)
+            reset = response.headers.get("x-ratelimit-reset", "")
+            budget.reset = float(reset) if reset.isdigit() else 0.0
+
+    @staticmethod
+    def _retry_delay(budget: RateBudget, response: httpx.Response) -> Optional[float]:
+        """Seconds to wait before retrying a rate-limited response, or None to give up"""
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("retry-after", "")
+        if retry_after.isdigit():
+            # Secondary rate limit
+            delay = float(retry_after)
+        elif response.headers.get("x-ratelimit-remaining") == "0":
+            delay = budget.reset - time.time()
+        else:
+            return None
+        return max(delay, 0.0) if delay <= settings.GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS else None
+
+    @staticmethod
+    async def _wait_for_quota(budget: RateBudget):
+        """Hold off while the quota is down to the reserve and resets soon enough to wait for"""
+        if budget.remaining is None or budget.remaining > settings.GITHUB_RATE_LIMIT_RESERVE:
+            return
+        delay = budget.reset - time.time()
+        if 0 < delay <= settings.GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS:
+            budget.waits += 1
+            logger.warning(f"⏳ GitHub quota at {budget.remaining}; waiting {delay:.0f}s for the reset")
+            await asyncio.sleep(delay)
+            budget.remaining = None
+
+    async def _installation(self, owner: str, repo: str, installation_id: Optional[int]) -> Optional[int]:
+        """
+        The installation to call as (None = GITHUB_TOKEN), looked up when the caller doesn't know it
+
+        Raises:
+            AppNotInstalledError: If the app is not installed on the repo and there is no GITHUB_TOKEN
+        """
+        if not github_app.enabled:
+            return None
+        if installation_id:
+            return installation_id
+        try:
+            return await github_app.installation_for(self.client, self.base_url, owner, repo)
+        except AppNotInstalledError:
+            if not self.token:
+                raise
+            logger.info(f"GitHub App not installed on {owner}/{repo}; using GITHUB_TOKEN")
+            return None
+
+    async def _send(
+        self, method: str, url: str, installation: Optional[int], budget: RateBudget,
+        headers: Dict[str, str], **kwargs
+    ) -> httpx.Response:
+        if installation is None:
+            token = self.token
+        else:
+            token = await github_app.token(self.client, self.base_url, installation)
+        response = await self.client.request(
+            method, url, headers={**headers, "Authorization": f"token {token}"}, **kwargs
+        )
+        self._requests += 1
+        self._record_rate_limit(budget, response)
+        return response
+
+    async def _request(
+        self, method: str, url: str, installation: Optional[int] = None, headers: Optional[Dict[str, str]] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request as GITHUB_TOKEN or an installation, minding that token's
+        rate limit and retrying once after a rate-limit response
+        """
+        headers = headers or self.headers
+        budget = self._budget(installation)
+        await self._wait_for_quota(budget)
+        response = await self._send(method, url, installation, budget, headers, **kwargs)
+        if response.status_code == 401 and installation is not None:
+            # Revoked or expired early: mint a new token and try once more
+            github_app.invalidate(installation)
+            response = await self._send(method, url, installation, budget, headers, **kwargs)
+        delay = self._retry_delay(budget, response)
+        if delay is not None:
+            logger.warning(f"⏳ GitHub rate limit on {method} {url}; retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            response = await self._send(method, url, installation, budget, headers, **kwargs)
+        return response
+
+    async def _get(
+        self, url: str, headers: Dict[str, str], params: Optional[Dict[str, Any]] = None,
+        installation: Optional[int] = None
+    ) -> httpx.Response:
+        """
+        Conditional GET: revalidate a cached body with If-None-Match
+
+        A 304 doesn't count against GitHub's rate limit; it is replayed here
+        as the cached 200 so callers never see the difference.
+        """
+        key = (str(httpx.URL(url, params=params)) if params else url, headers.get("Accept", ""))
+        cached = self._etags.get(key)
+        if cached is not None:
+            headers = {**headers, "If-None-Match": cached[0]}
+
+        response = await self._request("GET", url, installation, headers=headers, params=params)
+        if response.status_code == 304 and cached is not None:
+            self._not_modified += 1
+            CACHE_HITS.inc(cache="github_etag")
+            self._etags.move_to_end(key)
+            return httpx.Response(200, content=cached[1], headers=cached[2], request=response.request)
+
+        CACHE_MISSES.inc(cache="github_etag")
+        if response.status_code == 200 and response.headers.get("etag"):
+            self._remember(key, response)
+        return response
+
+    def _remember(self, key: Tuple[str, str], response: httpx.Response):
+        budget = settings.GITHUB_ETAG_CACHE_MB * 1024 * 1024
+        body = response.content
+        previous = self._etags.pop(key, None)
+        if previous is not None:
+            self._etag_bytes -= len(previous[1])
+        if settings.GITHUB_ETAG_CACHE_ENTRIES <= 0 or len(body) > budget // 4:
+            return
+        replayed = {name: response.headers[name] for name in _REPLAYED_HEADERS if name in response.headers}
+        self._etags[key] = (response.headers["etag"], body, replayed)
+        self._etag_bytes += len(body)
+        while len(self._etags) > settings.GITHUB_ETAG_CACHE_ENTRIES or self._etag_bytes > budget:
+            _, (_, evicted, _) = self._etags.popitem(last=False)
+            self._etag_bytes -= len(evicted)
+
+    async def get_pr_diff(
+        self, owner: str, repo: str, pr_number: int, installation_id: Optional[int] = None
+    ) -> Optional[str]:
         """Fetch the diff for a pull request."""
         url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}"
         headers = {**self.headers, "Accept": "application/vnd.github.v3.diff"}
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
+
+        with tracer.span("github.get_pr_diff", kind=SPAN_KIND_CLIENT, **{"pr.number": pr_number}) as span:
+            installation = await self._installation(owner, repo, installation_id)
+            response = await self._get(url, headers, installation=installation)
+            span.set_attributes(**{"http.status_code": response.status_code, "diff.bytes": len(response.content)})
             if response.status_code == 200:
                 return response.text
-            print(f"Failed to fetch diff: {response.status_code}")
-            return None
-    
-    async def get_pr_files(self, owner: str, repo: str, pr_number: int) -> list:
-        """Fetch list of files changed in a PR."""
+            span.error = f"HTTP {response.status_code}"
+        logger.error(f"Failed to fetch diff: {response.status_code}")
+        return None
+
+    async def get_pr_files(
+        self, owner: str, repo: str, pr_number: int, installation_id: Optional[int] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Fetch the files changed in a PR (every page), or None if the listing failed."""
         url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}/files"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers)
-            if response.status_code == 200:
-                return response.json()
-            return []
-    
+        params = {"per_page": 100}
+        files: List[Dict[str, Any]] = []
+
+        with tracer.span("github.get_pr_files", kind=SPAN_KIND_CLIENT, **{"pr.number": pr_number}) as span:
+            installation = await self._installation(owner, repo, installation_id)
+            while url:
+                response = await self._get(url, self.headers, params=params, installation=installation)
+                if response.status_code != 200:
+                    span.error = f"HTTP {response.status_code}"
+                    logger.error(f"Failed to fetch PR files: {response.status_code}")
+                    return None
+                files.extend(response.json())
+                # The next link already carries the query string
+                url, params = response.links.get("next", {}).get("url"), None
+            span.set_attribute("pr.files", len(files))
+        return files
+
     async def post_pr_comment(
-        self, owner: str, repo: str, pr_number: int, body: str
+        self, owner: str, repo: str, pr_number: int, body: str, installation_id: Optional[int] = None
     ) -> bool:
         """Post a comment on a pull request."""
         url = f"{self.base_url}/repos/{owner}/{repo}/issues/{pr_number}/comments"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url, 
-                headers=self.headers, 
+        body = _clip(body)
+
+        with tracer.span("github.post_pr_comment", kind=SPAN_KIND_CLIENT, **{"pr.number": pr_number}) as span:
+            response = await self._request(
+                "POST",
+                url,
+                await self._installation(owner, repo, installation_id),
+                headers=self.headers,
                 json={"body": body}
             )
-            if response.status_code == 201:
-                print(f"✅ Comment posted on PR #{pr_number}")
+            span.set_attributes(**{"http.status_code": response.status_code, "comment.bytes": len(body)})
+            if response.status_code != 201:
+                span.error = f"HTTP {response.status_code}"
+        if response.status_code == 201:
+            logger.info(f"✅ Comment posted on PR #{pr_number}")
+            return True
+        logger.error(f"❌ Failed to post comment: {response.status_code}")
+        return False
+
+    async def create_pr_review(
+        self,
+        owner: str,
+        repo: str,
+        pr_number: int,
+        body: str,
+        comments: List[Dict[str, Any]],
+        commit_id: Optional[str] = None,
+        installation_id: Optional[int] = None
+    ) -> bool:
+        """
+        Submit a pull request review: a body plus inline comments, in one write
+
+        Args:
+            body: Review body (markdown)
+            comments: Inline comments, each {"path", "line", "side", "body"}
+            commit_id: Commit the comments refer to; defaults to the PR head
+            installation_id: GitHub App installation to post as; looked up if None
+
+        Returns:
+            True if GitHub accepted the review
+        """
+        url = f"{self.base_url}/repos/{owner}/{repo}/pulls/{pr_number}/reviews"
+        payload: Dict[str, Any] = {"body": _clip(body), "event": "COMMENT", "comments": comments}
+        if commit_id:
+            payload["commit_id"] = commit_id
+
+        with tracer.span("github.create_pr_review", kind=SPAN_KIND_CLIENT, **{"pr.number": pr_number}) as span:
+            installation = await self._installation(owner, repo, installation_id)
+            response = await self._request("POST", url, installation, headers=self.headers, json=payload)
+            span.set_attributes(**{"http.status_code": response.status_code, "review.comments": len(comments)})
+            if response.status_code != 200:
+                span.error = f"HTTP {response.status_code}"
+        if response.status_code == 200:
+            return True
+        logger.error(f"❌ Failed to submit review: {response.status_code} {response.text[:200]}")
+        return False
+
+    async def submit_pr_review(
+        self,
+        owner: str,
+        repo: str,
+        pr_number: int,
+        body: str,
+        comments: List[Dict[str, Any]],
+        commit_id: Optional[str] = None,
+        installation_id: Optional[int] = None
+    ) -> bool:
+        """
+        Submit a review with its inline comments, split into as few reviews as
+        GitHub's payload limits allow (usually one)
+
+        Returns:
+            True if the first review (the one with the body) was accepted;
+            later parts that fail are logged
+        """
+        batches = split_review_comments(
+            comments, settings.GITHUB_REVIEW_MAX_COMMENTS,
+            max(settings.GITHUB_REVIEW_MAX_BYTES - len(body.encode("utf-8")), 1)
+        )
+        installation = await self._installation(owner, repo, installation_id)
+        for index, batch in enumerate(batches):
+            part_body = body if index == 0 else f"Inline comments, part {index + 1} of {len(batches)}"
+            if not await self.create_pr_review(owner, repo, pr_number, part_body, batch, commit_id, installation):
+                if index == 0:
+                    return False
+                logger.error(f"❌ Review part {index + 1}/{len(batches)} for PR #{pr_number} was not posted")
                 return True
-            print(f"❌ Failed to post comment: {response.status_code}")
-            return False
+        logger.info(f"✅ Review posted on PR #{pr_number}: {len(comments)} inline comment(s) "
+                    f"in {len(batches)} review(s)")
+        return True
 
 
 github_service = GitHubService()
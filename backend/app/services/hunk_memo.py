@@ -0,0 +1,139 @@
+"""
+Per-hunk memoization of PR review findings
+
+Each hunk is keyed on a normalized hash of its content (line numbers and
+whitespace runs ignored), so when a PR is pushed again only hunks that
+actually changed go back to the model. Findings are stored with line numbers
+relative to the hunk, which lets them be replayed when the hunk moves.
+"""
+import hashlib
+import re
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.diff_parser import FileDiff, Hunk
+from app.services.review_cache import ReviewCache
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Bump whenever PR_CHUNK_PROMPT in pr_review_service changes so stale findings are not replayed
+PR_PROMPT_VERSION = "1"
+
+hunk_review_cache = ReviewCache(
+    ttl_seconds=settings.HUNK_CACHE_TTL_SECONDS,
+    max_entries=settings.HUNK_CACHE_MAX_ENTRIES,
+    max_bytes=settings.HUNK_CACHE_MAX_MB * 1024 * 1024,
+    path=settings.REVIEW_CACHE_PATH,
+    namespace="hunk",
+    path_max_entries=settings.HUNK_CACHE_PATH_MAX_ENTRIES
+)
+
+
+def hunk_key(repo_full_name: str, path: str, hunk: Hunk) -> str:
+    """Stable key for a hunk's content, independent of where it sits in the file"""
+    digest = hashlib.sha256()
+    for part in (settings.model_name, PR_PROMPT_VERSION, repo_full_name, path):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    for line in hunk.lines:
+        if line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        digest.update(line[:1].encode("utf-8"))
+        digest.update(_WHITESPACE_RE.sub(" ", line[1:].strip()).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+@dataclass
+class MemoSplit:
+    """Result of checking a diff against the memo"""
+    pending: List[FileDiff] = field(default_factory=list)  # hunks that still need review
+    carried_issues: List[Dict[str, Any]] = field(default_factory=list)
+    carried_hunks: int = 0
+    keys: Dict[int, str] = field(default_factory=dict)  # id(hunk) -> memo key
+    paths: Dict[int, str] = field(default_factory=dict)  # id(hunk) -> file path
+
+
+async def split_memoized(repo_full_name: str, files: List[FileDiff]) -> MemoSplit:
+    """
+    Separate hunks with memoized findings from those that need a model call
+
+    Args:
+        repo_full_name: "owner/repo", so memo entries never cross repositories
+        files: Parsed diff
+
+    Returns:
+        MemoSplit with the files/hunks still to review and the replayed findings
+    """
+    split = MemoSplit()
+
+    for file_diff in files:
+        if file_diff.is_binary or not file_diff.hunks:
+            continue
+
+        pending_hunks = []
+        for hunk in file_diff.hunks:
+            key = hunk_key(repo_full_name, file_diff.path, hunk)
+            cached = await hunk_review_cache.get(key) if settings.REVIEW_CACHE_ENABLED else None
+            if cached is None:
+                split.keys[id(hunk)] = key
+                split.paths[id(hunk)] = file_diff.path
+                pending_hunks.append(hunk)
+                continue
+
+            split.carried_hunks += 1
+            for issue in cached["issues"]:
+                offset = issue.pop("line_offset", None)
+                issue["line"] = hunk.new_start + offset if offset is not None else None
+                issue["file"] = file_diff.path
+                split.carried_issues.append(issue)
+
+        if pending_hunks:
+            split.pending.append(replace(file_diff, hunks=pending_hunks))
+
+    return split
+
+
+def _owning_hunk(issue: Dict[str, Any], hunks: List[Hunk], paths: Dict[int, str]) -> Optional[Hunk]:
+    """
+    Find the hunk an issue refers to, by file and new-side line range
+
+    None when no reviewed hunk of the issue's file covers its line: such an
+    issue is posted this time but not memoized, as replaying it under another
+    hunk would move it to the wrong line or file.
+    """
+    line = issue.get("line")
+    if not isinstance(line, int):
+        return None
+    for hunk in hunks:
+        if paths.get(id(hunk)) != issue.get("file"):
+            continue
+        if hunk.new_start <= line < hunk.new_start + max(hunk.new_count, 1):
+            return hunk
+    return None
+
+
+async def remember(split: MemoSplit, hunks: List[Hunk], issues: List[Dict[str, Any]]):
+    """
+    Store findings for hunks that were reviewed successfully
+
+    Every hunk is stored, including those without findings, so an unchanged
+    clean hunk is not sent to the model again either.
+    """
+    if not settings.REVIEW_CACHE_ENABLED:
+        return
+
+    per_hunk: Dict[int, List[Dict[str, Any]]] = {id(hunk): [] for hunk in hunks}
+    for issue in issues:
+        hunk = _owning_hunk(issue, hunks, split.paths)
+        if hunk is None:
+            continue
+        stored = {k: v for k, v in issue.items() if k not in ("line", "file")}
+        stored["line_offset"] = issue["line"] - hunk.new_start
+        per_hunk[id(hunk)].append(stored)
+
+    for hunk in hunks:
+        key = split.keys.get(id(hunk))
+        if key:
+            await hunk_review_cache.set(key, {"issues": per_hunk[id(hunk)]})
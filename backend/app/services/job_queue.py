@@ -0,0 +1,356 @@
+"""
+Durable job queue backed by SQLite
+
+Jobs survive restarts and can be claimed by workers in any process on the
+host. Claiming is fair across repositories: the next job comes from the repo
+with the fewest running jobs, then the one served least recently, so one busy
+repo cannot starve the rest. Failed jobs are retried with exponential backoff.
+
+Jobs enqueued with a dedupe key supersede any queued or running job with the
+same key, so only the newest request for e.g. a given PR is acted on.
+
+A claimed job is leased to its worker for JOB_LEASE_SECONDS and the worker
+renews the lease while it runs. A job whose lease lapsed (its worker died or
+hung) is claimed again by another worker, and the old worker can no longer
+renew, complete or fail it.
+
+Finished jobs (succeeded, failed, superseded) are deleted once they are
+JOB_RETENTION_HOURS old, so the table only holds recent history.
+"""
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+
+# Statuses a job never leaves, and how often claims check for old ones to delete
+FINISHED = (SUCCEEDED, FAILED, SUPERSEDED)
+PURGE_INTERVAL_SECONDS = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker_id TEXT,
+    last_error TEXT,
+    dedupe_key TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_at ON jobs (status, run_at);
+CREATE INDEX IF NOT EXISTS ix_jobs_repo_status ON jobs (repo, status);
+CREATE INDEX IF NOT EXISTS ix_jobs_repo_started_at ON jobs (repo, started_at);
+"""
+
+# Columns added after the first release; created on startup if an older database lacks them
+_ADDED_COLUMNS = {
+    "dedupe_key": "TEXT",
+    "lease_expires_at": "REAL",
+}
+
+# Among runnable jobs: repo with fewest running jobs, then least recently served repo, then oldest job
+_CLAIM_SQL = """
+SELECT id FROM jobs AS j
+WHERE j.status = 'queued' AND j.run_at <= ?
+ORDER BY
+    (SELECT COUNT(*) FROM jobs AS r WHERE r.repo = j.repo AND r.status = 'running'),
+    COALESCE((SELECT MAX(r.started_at) FROM jobs AS r WHERE r.repo = j.repo), 0),
+    j.created_at
+LIMIT 1
+"""
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+class JobQueue:
+    """SQLite job queue. Blocking calls run on a thread so the event loop stays free."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._purged_at = 0.0
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        self._migrate(conn)
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection):
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_dedupe_key ON jobs (dedupe_key, status)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_finished_at ON jobs (status, finished_at)")
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Database connection, opened lazily when used outside the app lifecycle"""
+        if self._conn is None:
+            self._conn = self._open()
+        return self._conn
+
+    # Blocking implementations ------------------------------------------------
+
+    def _enqueue(
+        self,
+        kind: str,
+        repo: str,
+        payload: Dict[str, Any],
+        max_attempts: int,
+        delay: float,
+        dedupe_key: Optional[str]
+    ) -> Dict[str, Any]:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if dedupe_key:
+                    cursor = self.conn.execute(
+                        "UPDATE jobs SET status = ?, finished_at = ? WHERE dedupe_key = ? AND status IN (?, ?)",
+                        (SUPERSEDED, now, dedupe_key, QUEUED, RUNNING)
+                    )
+                    if cursor.rowcount:
+                        logger.info(f"Superseded {cursor.rowcount} job(s) for {dedupe_key}")
+                self.conn.execute(
+                    "INSERT INTO jobs (id, kind, repo, payload, status, max_attempts, run_at, created_at, dedupe_key)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, repo, json.dumps(payload), QUEUED, max_attempts, now + delay, now, dedupe_key)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return self._get(job_id)
+
+    def _supersede(self, dedupe_key: str) -> int:
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE dedupe_key = ? AND status IN (?, ?)",
+                (SUPERSEDED, time.time(), dedupe_key, QUEUED, RUNNING)
+            )
+            return cursor.rowcount
+
+    def _purge(self, now: float):
+        self._purged_at = now
+        if settings.JOB_RETENTION_HOURS <= 0:
+            return
+        cursor = self.conn.execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished_at < ?",
+            (*FINISHED, now - settings.JOB_RETENTION_HOURS * 3600)
+        )
+        if cursor.rowcount:
+            logger.info(f"Deleted {cursor.rowcount} finished job(s) older than {settings.JOB_RETENTION_HOURS:g}h")
+
+    def _claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            # Workers poll claim constantly, so old finished jobs go without a timer of their own
+            if now - self._purged_at >= PURGE_INTERVAL_SECONDS:
+                self._purge(now)
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A lapsed lease means the worker died; jobs from before leases fall back to the timeout.
+                # The lapsed attempt counts, so a job that keeps killing its worker stops at max_attempts
+                lapsed = (
+                    " WHERE status = ? AND (lease_expires_at < ? OR (lease_expires_at IS NULL AND started_at < ?))"
+                )
+                lapsed_args = (RUNNING, now, now - settings.JOB_TIMEOUT_SECONDS * 2)
+                self.conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ?, worker_id = NULL, last_error = ?"
+                    + lapsed + " AND attempts >= max_attempts",
+                    (FAILED, now, "Lease lapsed on the last attempt") + lapsed_args
+                )
+                self.conn.execute(
+                    "UPDATE jobs SET status = ?, worker_id = NULL" + lapsed, (QUEUED,) + lapsed_args
+                )
+                row = self.conn.execute(_CLAIM_SQL, (now,)).fetchone()
+                if row is None:
+                    self.conn.execute("COMMIT")
+                    return None
+                self.conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, worker_id = ?,"
+                    " lease_expires_at = ? WHERE id = ?",
+                    (RUNNING, now, worker_id, now + settings.JOB_LEASE_SECONDS, row["id"])
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return self._get(row["id"])
+
+    def _renew(self, job_id: str, worker_id: str) -> bool:
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = ? AND worker_id = ?",
+                (time.time() + settings.JOB_LEASE_SECONDS, job_id, RUNNING, worker_id)
+            )
+            return cursor.rowcount > 0
+
+    def _complete(self, job_id: str, worker_id: Optional[str]):
+        with self._lock:
+            # A superseded job keeps that status even if its handler got to finish,
+            # and a job claimed again after its lease lapsed belongs to the new worker
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, last_error = NULL"
+                " WHERE id = ? AND status = ? AND (? IS NULL OR worker_id = ?)",
+                (SUCCEEDED, time.time(), job_id, RUNNING, worker_id, worker_id)
+            )
+
+    def _fail(self, job_id: str, error: str, worker_id: Optional[str], retry: bool) -> str:
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT status, attempts, max_attempts, worker_id FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return FAILED
+            if row["status"] != RUNNING or (worker_id is not None and row["worker_id"] != worker_id):
+                return row["status"]
+            if retry and row["attempts"] < row["max_attempts"]:
+                delay = min(
+                    settings.JOB_RETRY_BASE_SECONDS * 2 ** (row["attempts"] - 1),
+                    settings.JOB_RETRY_MAX_SECONDS
+                )
+                delay *= random.uniform(0.8, 1.2)
+                self.conn.execute(
+                    "UPDATE jobs SET status = ?, run_at = ?, worker_id = NULL, last_error = ? WHERE id = ?",
+                    (QUEUED, now + delay, error, job_id)
+                )
+                return QUEUED
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, last_error = ? WHERE id = ?",
+                (FAILED, now, error, job_id)
+            )
+            return FAILED
+
+    def _release(self, job_id: str, delay: float):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), worker_id = NULL, run_at = ?"
+                " WHERE id = ? AND status = ?",
+                (QUEUED, time.time() + delay, job_id, RUNNING)
+            )
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def _counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0, SUPERSEDED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    # Async API ---------------------------------------------------------------
+
+    async def start(self):
+        """Open and migrate the database. Called from the app startup hook."""
+        if self._conn is None:
+            self._conn = await asyncio.to_thread(self._open)
+
+    async def enqueue(
+        self,
+        kind: str,
+        repo: str,
+        payload: Dict[str, Any],
+        max_attempts: Optional[int] = None,
+        delay: float = 0.0,
+        dedupe_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Add a job to the queue
+
+        Args:
+            kind: Handler name, e.g. "pr_review"
+            repo: "owner/repo", used for fair scheduling
+            payload: JSON-serializable handler arguments
+            max_attempts: Tries before the job is marked failed
+            delay: Seconds before the job becomes runnable
+            dedupe_key: Queued or running jobs with the same key are superseded
+
+        Returns:
+            The stored job
+        """
+        return await asyncio.to_thread(
+            self._enqueue, kind, repo, payload, max_attempts or settings.JOB_MAX_ATTEMPTS, delay, dedupe_key
+        )
+
+    async def supersede(self, dedupe_key: str) -> int:
+        """Supersede every queued or running job with this key; returns how many"""
+        return await asyncio.to_thread(self._supersede, dedupe_key)
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically take the next runnable job, or None if there is none"""
+        return await asyncio.to_thread(self._claim, worker_id)
+
+    async def renew(self, job_id: str, worker_id: str) -> bool:
+        """
+        Extend a running job's lease
+
+        Returns:
+            False if the worker no longer holds the job: it was superseded,
+            or its lease lapsed and it was claimed again
+        """
+        return await asyncio.to_thread(self._renew, job_id, worker_id)
+
+    async def complete(self, job_id: str, worker_id: Optional[str] = None):
+        """Mark a job as succeeded (only if worker_id, when given, still holds it)"""
+        await asyncio.to_thread(self._complete, job_id, worker_id)
+
+    async def fail(self, job_id: str, error: str, worker_id: Optional[str] = None, retry: bool = True) -> str:
+        """Record a failure; returns the new status (queued for a retry, or failed; always failed without retry)"""
+        return await asyncio.to_thread(self._fail, job_id, error, worker_id, retry)
+
+    async def release(self, job_id: str, delay: float = 0.0):
+        """Put a running job back without counting the attempt (worker shutting down, PR locked)"""
+        await asyncio.to_thread(self._release, job_id, delay)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a job by id"""
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def stats(self) -> Dict[str, int]:
+        """Job counts by status"""
+        return await asyncio.to_thread(self._counts)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+job_queue = JobQueue(settings.JOB_QUEUE_PATH)
@@ -1,10 +1,31 @@
-from app.services.github_service import github_service
+import asyncio
+from dataclasses import replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
 from app.core.gemini_client import gemini_client as gemini # Use the existing global instance
+from app.core.metrics import (
+    CACHE_HITS, CACHE_MISSES, COMMENT_POST_SECONDS, DIFF_FETCH_SECONDS, FAILURES, FILES_SKIPPED,
+    PARSE_SECONDS, PROMPT_BUILD_SECONDS, TRUNCATIONS
+)
+from app.core.stream_parser import parse_review
+from app.core.tracing import Span, tracer
+from app.core.tokens import estimate_tokens, token_counter
+from app.services.diff_chunker import DiffChunk, pack_chunks
+from app.services.diff_parser import FileDiff, Hunk, iter_file_diffs
+from app.services.file_filter import ReviewPlan, listing_from_diff, plan_review
+from app.services.github_service import github_service
+from app.services.hunk_memo import MemoSplit, remember, split_memoized
+from app.services.review_store import record_review
+from app.services.static_analysis import static_analyzer
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
 
-PR_REVIEW_PROMPT = """You are BroCode, an AI code reviewer. Review this pull request diff and provide helpful feedback.
+PR_CHUNK_PROMPT = """You are BroCode, an AI code reviewer. Review part {part} of {total} of the diff for the pull request "{title}" and provide helpful feedback.
 
 ## PR Diff:
-```
+```diff
 {diff}
 ```
 
@@ -13,58 +34,492 @@ PR_REVIEW_PROMPT = """You are BroCode, an AI code reviewer. Review this pull req
 2. Suggest improvements for code quality
 3. Point out any best practices that could be applied
 4. Be constructive and helpful
+5. Only comment on lines added or changed in this diff
 
 ## Response Format:
-Use this exact format for your review:
+Respond in JSON format:
+{{
+  "summary": "Brief 1-2 sentence summary of the changes in this part",
+  "issues": [
+    {{
+      "file": "path/of/the/file",
+      "line": <line number in the new file or null>,
+      "type": "bug|security|performance|style",
+      "severity": "high|medium|low",
+      "title": "Brief title",
+      "description": "Detailed explanation",
+      "suggestion": "How to fix it"
+    }}
+  ]
+}}
+"""
 
-## 🤖 BroCode Review
+SEVERITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+SEVERITY_ICONS = {"high": "🔴", "medium": "🟠", "low": "🟡"}
 
-### Summary
-[Brief 1-2 sentence summary of the changes]
+# Leave room for the prompt itself inside the per-request budget
+MIN_DIFF_TOKENS = 500
 
-### Issues Found
-[List any issues, or "No critical issues found!" if none]
 
-### Suggestions
-[List improvement suggestions with specific line references if possible]
+def _diff_budget(pr_title: str) -> int:
+    """Tokens of diff that fit in one request alongside the prompt, within the model's context window"""
+    overhead = estimate_tokens(PR_CHUNK_PROMPT.format(part=999, total=999, title=pr_title, diff=""))
+    budget = min(settings.TOKEN_BUDGET_PER_REQUEST, settings.MAX_TOKENS)
+    return max(budget - overhead, MIN_DIFF_TOKENS)
 
-### Overall
-[Give a brief overall assessment: ✅ Looks good / ⚠️ Needs attention / ❌ Needs fixes]
 
----
-*Automated review by BroCode - AI-Powered Code Review*
-"""
+def calibration_sample(diff: str) -> str:
+    """About one request's worth of diff lines, taken evenly across the whole diff"""
+    size = int(settings.TOKEN_BUDGET_PER_REQUEST * token_counter.chars_per_token)
+    if len(diff) <= size:
+        return diff
+    lines = diff.splitlines()
+    stride = -(-len(diff) // size)  # ceil
+    return "\n".join(lines[::stride])
+
+
+async def review_chunk(
+    chunk: DiffChunk,
+    part: int,
+    total: int,
+    pr_title: str,
+    semaphore: asyncio.Semaphore,
+    repo: str = ""
+) -> Optional[Dict[str, Any]]:
+    """Review one chunk of the diff. Returns None if the model call failed."""
+    with tracer.span("review_chunk", **{"chunk.part": part, "chunk.total": total}) as span:
+        with PROMPT_BUILD_SECONDS.time(review_type="general", repo=repo):
+            prompt = PR_CHUNK_PROMPT.format(part=part, total=total, title=pr_title, diff=chunk.text)
+        tokens_in = token_counter.count(prompt)
+        span.set_attribute("tokens.in", tokens_in)
+
+        async with semaphore:
+            try:
+                text = await gemini.generate_review(prompt, repo=repo)
+            except Exception as e:
+                span.error = str(e) or type(e).__name__
+                logger.error(f"❌ Gemini error on part {part}/{total}: {e}")
+                return None
+        tokens_out = estimate_tokens(text)
+        span.set_attribute("tokens.out", tokens_out)
+
+        with PARSE_SECONDS.time(review_type="general", repo=repo):
+            parsed = parse_review(text, model=None)
+        span.set_attributes(**{"parse.truncated": parsed.truncated, "parse.repaired": parsed.repaired})
+        if parsed.truncated:
+            TRUNCATIONS.inc(review_type="general", repo=repo)
+        if parsed.data is None:
+            FAILURES.inc(stage="parse", review_type="general", repo=repo)
+            # Keep the prose so the findings for this part are not lost
+            return {"summary": text.strip(), "issues": [], "degraded": True, "tokens": (tokens_in, tokens_out)}
+
+        span.set_attribute("issues", len(parsed.data["issues"]))
+        # Findings recovered from a cut-off answer are posted but not memoized
+        return {
+            "summary": parsed.data["summary"],
+            "issues": parsed.data["issues"],
+            "degraded": parsed.truncated,
+            "tokens": (tokens_in, tokens_out),
+        }
+
+
+def _format_issue(issue: Dict[str, Any]) -> str:
+    severity = str(issue.get("severity", "low")).lower()
+    location = issue.get("file") or ""
+    if location and issue.get("line"):
+        location = f"{location}:{issue['line']}"
+
+    text = f"- {SEVERITY_ICONS.get(severity, '🟡')} **{issue.get('title', 'Issue')}**"
+    if location:
+        text += f" (`{location}`)"
+    if issue.get("description"):
+        text += f" — {issue['description']}"
+    if issue.get("suggestion"):
+        text += f"\n  💡 {issue['suggestion']}"
+    return text
+
 
+def _format_inline(issue: Dict[str, Any]) -> str:
+    severity = str(issue.get("severity", "low")).lower()
+    text = f"{SEVERITY_ICONS.get(severity, '🟡')} **{issue.get('title', 'Issue')}**"
+    if issue.get("description"):
+        text += f"\n\n{issue['description']}"
+    if issue.get("suggestion"):
+        text += f"\n\n💡 {issue['suggestion']}"
+    if issue.get("rule"):
+        text += f"\n\n<sub>Static check `{issue['rule']}`</sub>"
+    return text
 
-async def review_pull_request(owner: str, repo: str, pr_number: int, pr_title: str):
-    """Fetch PR diff, review with Gemini, and post comment."""
+
+def merge_issues(
+    results: List[Optional[Dict[str, Any]]],
+    carried_issues: Optional[List[Dict[str, Any]]] = None,
+    static_issues: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """All findings for the PR, de-duplicated, most severe first"""
+    # A model finding of the same kind on a line a static rule already flagged says the same thing
+    seen = {(issue.get("file"), issue.get("line"), issue.get("title")) for issue in static_issues or []}
+    covered = {(issue.get("file"), issue.get("line"), issue.get("type")) for issue in static_issues or []}
+    issues = list(static_issues or [])
+    for batch in [carried_issues or [], *(result["issues"] for result in results if result is not None)]:
+        for issue in batch:
+            key = (issue.get("file"), issue.get("line"), issue.get("title"))
+            if key not in seen and (issue.get("file"), issue.get("line"), issue.get("type")) not in covered:
+                seen.add(key)
+                issues.append(issue)
+    issues.sort(key=lambda issue: (
+        SEVERITY_ORDER.get(str(issue.get("severity", "low")).lower(), 2),
+        str(issue.get("file") or ""),
+        issue.get("line") or 0
+    ))
+    return issues
+
+
+def commentable_lines(files: List[FileDiff]) -> Dict[str, Set[int]]:
+    """New-file line numbers GitHub accepts review comments on (added and context lines), by path"""
+    lines: Dict[str, Set[int]] = {}
+    for file_diff in files:
+        numbers = lines.setdefault(file_diff.path, set())
+        for hunk in file_diff.hunks:
+            line_number = hunk.new_start
+            for line in hunk.lines:
+                if line[:1] in (" ", "+", ""):
+                    numbers.add(line_number)
+                    line_number += 1
+    return lines
+
+
+def inline_comments(
+    issues: List[Dict[str, Any]], files: List[FileDiff]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Review comments for the findings that sit on a line of the diff
+
+    Findings on the same line share one comment.
+
+    Args:
+        issues: Findings with "file" and "line"
+        files: The parsed diff the findings refer to
+
+    Returns:
+        (review comments, the findings they cover)
+    """
+    lines = commentable_lines(files)
+    by_line: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+    for issue in issues:
+        path, line = issue.get("file"), issue.get("line")
+        if isinstance(line, int) and line in lines.get(path, ()):
+            by_line.setdefault((path, line), []).append(issue)
+
+    comments = [
+        {"path": path, "line": line, "side": "RIGHT", "body": "\n\n---\n\n".join(map(_format_inline, group))}
+        for (path, line), group in by_line.items()
+    ]
+    return comments, [issue for group in by_line.values() for issue in group]
+
+
+def render_review_comment(
+    results: List[Optional[Dict[str, Any]]],
+    file_count: int,
+    carried_issues: Optional[List[Dict[str, Any]]] = None,
+    carried_hunks: int = 0,
+    skipped_files: Optional[Dict[str, int]] = None,
+    static_issues: Optional[List[Dict[str, Any]]] = None,
+    static_skipped_hunks: int = 0,
+    inline_issues: Optional[List[Dict[str, Any]]] = None,
+    posted_issues: Optional[List[Dict[str, Any]]] = None
+) -> str:
+    """
+    Merge per-chunk results into one markdown PR comment (or review body)
     
-    print(f"🔍 Reviewing PR #{pr_number}: {pr_title}")
+    Args:
+        results: One entry per reviewed chunk (None if that chunk failed)
+        file_count: Number of files in the diff
+        carried_issues: Memoized findings for hunks unchanged since the last review
+        carried_hunks: How many hunks those findings came from
+        skipped_files: Files left out by the file filter, counted by reason
+        static_issues: Findings from the local static analysis rules
+        static_skipped_hunks: Comment- or whitespace-only hunks not sent to the model
+        inline_issues: Findings posted as inline comments; counted, not listed
+        posted_issues: Findings already posted on an earlier push; counted, not listed
+    """
+    reviewed = [result for result in results if result is not None]
+    failed = len(results) - len(reviewed)
+
+    summaries = [result["summary"] for result in reviewed if result["summary"]]
+    if carried_hunks:
+        summaries.append(f"{carried_hunks} hunk(s) unchanged since the last review; their findings are carried over.")
+    if len(summaries) == 1:
+        summary = summaries[0]
+    else:
+        summary = "\n".join(f"- {text}" for text in summaries) or "No summary available."
+
+    issues = merge_issues(results, carried_issues, static_issues)
+    inline = {id(issue) for issue in inline_issues or []}
+    posted = {id(issue) for issue in posted_issues or []}
+    listed = [issue for issue in issues if id(issue) not in inline and id(issue) not in posted]
+
+    problems = [issue for issue in listed if str(issue.get("severity", "")).lower() in ("high", "medium")]
+    suggestions = [issue for issue in listed if str(issue.get("severity", "")).lower() not in ("high", "medium")]
+    problems_text = "\n".join(map(_format_issue, problems))
+    notes = []
+    if inline:
+        notes.append(f"{len(inline)} finding(s) are posted as comments on the changed lines.")
+    carried_posted = sum(1 for issue in issues if id(issue) in posted)
+    if carried_posted:
+        notes.append(f"{carried_posted} finding(s) in unchanged hunks were posted on an earlier push.")
+    if notes:
+        problems_text = "\n".join(filter(None, [*notes, problems_text]))
+
+    severities = {str(issue.get("severity", "")).lower() for issue in issues}
+    if "high" in severities:
+        overall = "❌ Needs fixes"
+    elif "medium" in severities:
+        overall = "⚠️ Needs attention"
+    else:
+        overall = "✅ Looks good"
+    if failed:
+        overall += f"\n\n⚠️ {failed} of {len(results)} parts of this diff could not be reviewed."
+
+    footer = (f"---\n*Automated review by BroCode - AI-Powered Code Review* · "
+              f"{file_count} file(s) reviewed in {len(results)} new part(s)")
+    if skipped_files:
+        reasons = ", ".join(f"{count} {reason}" for reason, count in sorted(skipped_files.items()))
+        footer += f" · {sum(skipped_files.values())} file(s) skipped ({reasons})"
+    if static_skipped_hunks:
+        footer += f" · {static_skipped_hunks} comment/whitespace-only hunk(s) skipped"
+
+    sections = [
+        "## 🤖 BroCode Review",
+        "### Summary\n" + summary,
+        "### Issues Found\n" + (problems_text or "No critical issues found!"),
+        "### Suggestions\n" + ("\n".join(map(_format_issue, suggestions)) or "No suggestions."),
+        "### Overall\n" + overall,
+        footer,
+    ]
+    return "\n\n".join(sections)
+
+
+async def review_pull_request(
+    owner: str,
+    repo: str,
+    pr_number: int,
+    pr_title: str,
+    is_current: Optional[Callable[[], Awaitable[bool]]] = None,
+    head_sha: str = "",
+    installation_id: Optional[int] = None
+):
+    """
+    Fetch PR diff, review it in parallel chunks with Gemini, and post one review.
     
-    # 1. Fetch the diff
-    diff = await github_service.get_pr_diff(owner, repo, pr_number)
+    Findings on changed lines become inline comments of a single pull request
+    review (GITHUB_INLINE_COMMENTS), anchored to `head_sha` when given; the
+    rest go in the review body. `is_current` is checked right before posting,
+    so a review overtaken by a newer push never posts a stale comment.
+    With a GitHub App, every call is made as `installation_id` (the
+    webhook's installation), or the installation looked up for the repo.
+    """
+    with tracer.span("review_pull_request", **{"repo": f"{owner}/{repo}", "pr.number": pr_number}) as span:
+        success = await _review_pull_request(
+            span, owner, repo, pr_number, pr_title, is_current, head_sha, installation_id
+        )
+        span.set_attribute("review.succeeded", bool(success))
+        return success
+
+
+def _plan(span: Span, listing: List[Dict[str, Any]]) -> ReviewPlan:
+    plan = plan_review(listing)
+    for reason, count in plan.skipped_by_reason().items():
+        FILES_SKIPPED.inc(count, reason=reason)
+    span.set_attributes(**{"files.planned": len(plan.files), "files.skipped": len(plan.skipped)})
+    return plan
+
+
+async def _static_pass(memo: MemoSplit) -> Tuple[int, List[Tuple[Hunk, Dict[str, Any]]]]:
+    """
+    Run the local rules on the pending hunks and drop those that only change
+    comments or whitespace from memo.pending
+
+    Returns:
+        How many hunks were dropped, and each finding with the hunk it is in
+    """
+    trivial, findings = await static_analyzer.analyze_diff(memo.pending)
+    located = [(memo.pending[file_index].hunks[hunk_index], finding) for file_index, hunk_index, finding in findings]
+    if trivial:
+        skipped = {(file_index, hunk_index) for file_index, hunk_index, _ in trivial}
+        pending = []
+        for file_index, file_diff in enumerate(memo.pending):
+            hunks = [hunk for hunk_index, hunk in enumerate(file_diff.hunks) if (file_index, hunk_index) not in skipped]
+            if hunks:
+                pending.append(replace(file_diff, hunks=hunks))
+        memo.pending = pending
+    return len(trivial), located
+
+
+async def _review_pull_request(
+    span: Span,
+    owner: str,
+    repo: str,
+    pr_number: int,
+    pr_title: str,
+    is_current: Optional[Callable[[], Awaitable[bool]]],
+    head_sha: str,
+    installation_id: Optional[int]
+):
+    repo_full = f"{owner}/{repo}"
+    logger.info(f"🔍 Reviewing PR #{pr_number}: {pr_title}")
+
+    # 1. Pick and rank the files worth reviewing from the files listing, so a PR
+    #    that only touches lockfiles or generated code never downloads its diff
+    listing = await github_service.get_pr_files(owner, repo, pr_number, installation_id)
+    plan = _plan(span, listing) if listing else None
+    if plan is not None and not plan.files:
+        logger.info(f"ℹ️ Nothing to review in PR #{pr_number}: skipped {plan.skipped_by_reason()}")
+        return True
+
+    # 2. Fetch the diff
+    with DIFF_FETCH_SECONDS.time(repo=repo_full):
+        diff = await github_service.get_pr_diff(owner, repo, pr_number, installation_id)
     if not diff:
-        print("❌ Could not fetch PR diff")
+        FAILURES.inc(stage="diff_fetch", review_type="general", repo=repo_full)
+        logger.error("❌ Could not fetch PR diff")
+        span.error = "Could not fetch PR diff"
         return False
-    
-    # Truncate if too long (Gemini has limits)
-    if len(diff) > 15000:
-        diff = diff[:15000] + "\n... (truncated)"
-    
-    print(f"📄 Got diff: {len(diff)} characters")
-    
-    # 2. Send to Gemini for review
-    prompt = PR_REVIEW_PROMPT.format(diff=diff)
-    
-    try:
-        # Use existing client method if possible, or add generate_review to it
-        review = await gemini.generate_review(prompt) 
-        print(f"✨ Gemini review generated: {len(review)} characters")
-    except Exception as e:
-        print(f"❌ Gemini error: {e}")
+
+    # 3. Split into files/hunks, keep the planned files (riskiest first) and skip
+    #    hunks already reviewed on an earlier push
+    files = list(iter_file_diffs(diff.splitlines()))
+    if plan is None:
+        plan = _plan(span, listing_from_diff(files))
+    files = plan.apply(files)
+    memo = await split_memoized(repo_full, files)
+    CACHE_HITS.inc(memo.carried_hunks, cache="hunk", review_type="general", repo=repo_full)
+    CACHE_MISSES.inc(len(memo.keys), cache="hunk", review_type="general", repo=repo_full)
+
+    # 4. Run the local rules; hunks that only touch comments or whitespace need no model call
+    static_skipped, static_findings = await _static_pass(memo)
+    static_issues = [finding for _, finding in static_findings]
+
+    # 5. Pack what's left into token-budgeted chunks, calibrating the estimator on
+    #    the first few PRs so chunks come out as full as the budget allows
+    if memo.pending and not token_counter.calibrated:
+        await gemini.count_tokens(calibration_sample(diff))
+    chunks = pack_chunks(memo.pending, _diff_budget(pr_title))
+    if not chunks and not static_issues:
+        # Everything was reviewed on an earlier push (or is trivial): nothing new to post
+        if memo.carried_hunks:
+            logger.info(f"ℹ️ No new changes in PR #{pr_number}: {memo.carried_hunks} hunk(s) already reviewed")
+        else:
+            logger.info("ℹ️ No reviewable changes in diff")
+        span.set_attribute("diff.hunks_reused", memo.carried_hunks)
+        return True
+
+    file_count = len({file_diff.path for file_diff in files if file_diff.hunks and not file_diff.is_binary})
+    span.set_attributes(**{
+        "diff.bytes": len(diff),
+        "diff.files": file_count,
+        "diff.chunks": len(chunks),
+        "diff.hunks_reused": memo.carried_hunks,
+        "diff.hunks_static_skipped": static_skipped,
+    })
+    logger.info(f"📄 Got diff: {len(diff)} characters, {file_count} files, {len(chunks)} chunk(s) to review, "
+                f"{memo.carried_hunks} hunk(s) reused")
+
+    # 6. Review every chunk concurrently, capped so one PR can't hog the model
+    semaphore = asyncio.Semaphore(settings.PR_REVIEW_CONCURRENCY)
+    results = await asyncio.gather(*(
+        review_chunk(chunk, index, len(chunks), pr_title, semaphore, repo=repo_full)
+        for index, chunk in enumerate(chunks, start=1)
+    ))
+
+    reviewed = [result for result in results if result is not None]
+    span.set_attributes(**{
+        "chunks.failed": len(results) - len(reviewed),
+        "tokens.in": sum(result["tokens"][0] for result in reviewed),
+        "tokens.out": sum(result["tokens"][1] for result in reviewed),
+    })
+    if results and not reviewed:
+        logger.error("❌ Gemini failed on every chunk")
+        span.error = "Gemini failed on every chunk"
         return False
-    
-    # 3. Post comment on PR
-    success = await github_service.post_pr_comment(owner, repo, pr_number, review)
-    
+
+    # Hunks from failed or degraded (prose) parts are not memoized, so they are retried next push
+    reviewed_hunks, retry, new_issues = {}, set(), []
+    for chunk, result in zip(chunks, results):
+        ok = result is not None and not result["degraded"]
+        for hunk in chunk.original_hunks:
+            if ok:
+                reviewed_hunks[id(hunk)] = hunk
+            else:
+                retry.add(id(hunk))
+        if ok:
+            new_issues.extend(result["issues"])
+    # Static findings are memoized with their hunk, so they come back with it on a later push
+    memoized_static = [
+        finding for hunk, finding in static_findings if id(hunk) in reviewed_hunks and id(hunk) not in retry
+    ]
+    await remember(
+        memo, [hunk for key, hunk in reviewed_hunks.items() if key not in retry], new_issues + memoized_static
+    )
+
+    render_args = (
+        results, file_count, memo.carried_issues, memo.carried_hunks, plan.skipped_by_reason(),
+        static_issues, static_skipped
+    )
+    issues = merge_issues(results, memo.carried_issues, static_issues)
+    if settings.GITHUB_INLINE_COMMENTS:
+        # Only findings from hunks reviewed this run; carried ones were commented on an earlier push
+        carried = {id(issue) for issue in memo.carried_issues}
+        comments, inline_issues = inline_comments([issue for issue in issues if id(issue) not in carried], files)
+        review = render_review_comment(*render_args, inline_issues=inline_issues, posted_issues=memo.carried_issues)
+    else:
+        comments = []
+        review = render_review_comment(*render_args)
+    logger.info(f"✨ Gemini review generated: {len(review)} characters, {len(comments)} inline comment(s)")
+
+    # 7. Post the review on the PR, unless a newer push has superseded it
+    if is_current is not None and not await is_current():
+        logger.info(f"⏭️ PR #{pr_number} review superseded by a newer push; not posting")
+        span.set_attribute("review.superseded", True)
+        return True
+
+    with COMMENT_POST_SECONDS.time(repo=repo_full):
+        if settings.GITHUB_INLINE_COMMENTS:
+            # One write for the body and every inline comment
+            success = await github_service.submit_pr_review(
+                owner, repo, pr_number, review, comments, commit_id=head_sha or None,
+                installation_id=installation_id
+            )
+            if not success:
+                # e.g. the head moved and GitHub rejected the comment positions
+                logger.warning(f"⚠️ Review submission failed for PR #{pr_number}; posting one comment instead")
+                success = await github_service.post_pr_comment(
+                    owner, repo, pr_number, render_review_comment(*render_args), installation_id
+                )
+        else:
+            success = await github_service.post_pr_comment(owner, repo, pr_number, review, installation_id)
+    if not success:
+        FAILURES.inc(stage="comment_post", review_type="general", repo=repo_full)
+    span.set_attributes(**{
+        "review.issues": len(issues),
+        "review.inline_comments": len(comments),
+        "review.posted": success,
+    })
+
+    record_review(
+        {
+            "summary": "\n\n".join(result["summary"] for result in results if result and result["summary"]),
+            "issues": issues,
+            "metadata": {
+                "filename": f"{owner}/{repo}#{pr_number}",
+                "review_type": "general",
+                "degraded": any(result is None or result["degraded"] for result in results),
+            },
+        },
+        diff,
+        source="pull_request",
+        repository=repo_full,
+        pr_number=pr_number
+    )
+
     return success
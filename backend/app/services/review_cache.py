@@ -0,0 +1,234 @@
+"""
+Content-addressed cache for code reviews
+
+Reviews are keyed on a hash of everything that shapes the model output
+(code, filename, review type, model and prompt version), so a repeat request
+for the same file is answered without another Gemini call.
+
+Two tiers:
+- An in-process LRU with TTL, bounded by entry count and total size
+- An optional SQLite file shared by every process on the host, or else the
+  shared state when it is shared (e.g. Redis, for every host)
+
+The SQLite tier deletes expired rows and caps its row count every few
+hundred writes, dropping the rows closest to expiry first.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.prompts import PROMPT_VERSION
+from app.core.shared_state import SharedState, shared_state
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# The SQLite tier is trimmed on the first write and then once per this many writes
+PURGE_EVERY_WRITES = 256
+
+
+class _PersistentTier:
+    """SQLite-backed second tier, one table per namespace. Calls are blocking and run on a thread."""
+
+    def __init__(self, path: str, namespace: str, max_entries: int):
+        self.max_entries = max_entries
+        self._table = f"{namespace}_cache"
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table} ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{self._table}_expires_at ON {self._table} (expires_at)"
+        )
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str, expires_at: float):
+        await asyncio.to_thread(self._set, key, value, expires_at)
+
+    def _get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self._table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] <= time.time():
+                self._conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+                return None
+            return row
+
+    def _set(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+            if self._writes % PURGE_EVERY_WRITES == 0:
+                self._purge()
+            self._writes += 1
+
+    def _purge(self):
+        """Delete expired rows, then the rows closest to expiry beyond max_entries"""
+        expired = self._conn.execute(f"DELETE FROM {self._table} WHERE expires_at <= ?", (time.time(),)).rowcount
+        over = self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0] - self.max_entries
+        if over > 0:
+            self._conn.execute(
+                f"DELETE FROM {self._table} WHERE key IN"
+                f" (SELECT key FROM {self._table} ORDER BY expires_at LIMIT ?)",
+                (over,)
+            )
+        if expired or over > 0:
+            logger.info(f"Trimmed {self._table}: {expired} expired, {max(over, 0)} over the cap")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _SharedTier:
+    """Second tier in the shared state, under a namespace"""
+
+    def __init__(self, state: SharedState, namespace: str):
+        self._state = state
+        self._namespace = namespace
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        stored = await self._state.get(f"{self._namespace}:{key}")
+        if stored is None:
+            return None
+        expires_at, _, value = stored.partition(":")
+        return value, float(expires_at)
+
+    async def set(self, key: str, value: str, expires_at: float):
+        # The expiry travels with the value, so a hit expires on time in the first tier too
+        await self._state.set(f"{self._namespace}:{key}", f"{expires_at:.3f}:{value}", expires_at - time.time())
+
+    def close(self):
+        pass
+
+
+class ReviewCache:
+    """Two-tier cache of parsed ReviewResponse payloads"""
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        max_entries: int,
+        max_bytes: int,
+        path: str = "",
+        namespace: str = "review",
+        path_max_entries: int = 100000
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (expires_at, serialized review)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._bytes = 0
+        if path:
+            self._persistent = _PersistentTier(path, namespace, path_max_entries)
+        elif shared_state.shared:
+            self._persistent = _SharedTier(shared_state, f"cache:{namespace}")
+        else:
+            self._persistent = None
+        self._counters = {
+            "hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    @staticmethod
+    def make_key(code: str, filename: str, review_type: str) -> str:
+        """Hash everything that affects the review output"""
+        digest = hashlib.sha256()
+        for part in (code, filename, review_type, settings.model_name, PROMPT_VERSION):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached review for key, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return json.loads(value)
+            self._remove(key)
+            self._counters["expirations"] += 1
+
+        if self._persistent is not None:
+            row = await self._persistent.get(key)
+            if row is not None:
+                value, expires_at = row
+                self._store(key, value, expires_at)
+                self._counters["persistent_hits"] += 1
+                return json.loads(value)
+
+        self._counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, review: Dict[str, Any]):
+        """Cache a review under key in every tier"""
+        value = json.dumps(review)
+        expires_at = time.time() + self.ttl_seconds
+        self._store(key, value, expires_at)
+        if self._persistent is not None:
+            await self._persistent.set(key, value, expires_at)
+
+    def _store(self, key: str, value: str, expires_at: float):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._counters["evictions"] += 1
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        hits = self._counters["hits"] + self._counters["persistent_hits"]
+        lookups = hits + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "persistent": self._persistent is not None,
+        }
+
+    def close(self):
+        """Close the persistent tier, if any"""
+        if self._persistent is not None:
+            self._persistent.close()
+            self._persistent = None
+
+
+review_cache = ReviewCache(
+    ttl_seconds=settings.REVIEW_CACHE_TTL_SECONDS,
+    max_entries=settings.REVIEW_CACHE_MAX_ENTRIES,
+    max_bytes=settings.REVIEW_CACHE_MAX_MB * 1024 * 1024,
+    path=settings.REVIEW_CACHE_PATH,
+    path_max_entries=settings.REVIEW_CACHE_PATH_MAX_ENTRIES
+)
@@ -0,0 +1,160 @@
+"""
+Read side of stored reviews
+
+Listings page with a keyset cursor on (created_at, id) rather than OFFSET,
+so the hundredth page costs the same as the first, and select only the
+summary columns: the code and issues blobs are never read for a listing.
+Severity and review type filters use the issue counts and type flags stored
+with each review, each backed by a partial (created_at, id) index, so a rare
+filter costs about the same as a common one.
+"""
+import base64
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+
+from app.models.repository import Repository
+from app.models.review import REVIEW_TYPES, Review
+
+SEVERITY_COUNTS = {
+    "high": Review.high_count,
+    "medium": Review.medium_count,
+    "low": Review.low_count,
+}
+
+REVIEW_TYPE_FLAGS = {name: getattr(Review, f"covers_{name}") for name in REVIEW_TYPES}
+
+# Everything a listing shows; code, issues and positive_aspects are left out
+SUMMARY_COLUMNS = (
+    Review.id,
+    Review.filename,
+    Repository.full_name.label("repository"),
+    Review.pr_number,
+    Review.source,
+    Review.review_type,
+    Review.model,
+    Review.degraded,
+    Review.summary,
+    Review.issue_count,
+    Review.high_count,
+    Review.medium_count,
+    Review.low_count,
+    Review.created_at,
+)
+
+
+def encode_cursor(created_at: datetime, review_id: int) -> str:
+    """Opaque cursor pointing just past the given review"""
+    raw = f"{created_at.isoformat()}|{review_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Inverse of encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, review_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(review_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+async def list_reviews(
+    session: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None,
+    repository: Optional[str] = None,
+    severity: Optional[str] = None,
+    review_type: Optional[str] = None,
+    source: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    One page of review summaries, newest first
+
+    Args:
+        session: Database session
+        limit: Page size
+        cursor: next_cursor from the previous page
+        repository: Only reviews of this owner/repo
+        severity: Only reviews with at least one issue of this severity
+        review_type: Only reviews that covered this review type
+        source: Only reviews from this source (analyze, stream, batch, pull_request)
+
+    Returns:
+        Dict with the page's reviews and the cursor for the next page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    query = select(*SUMMARY_COLUMNS).outerjoin(Repository, Review.repository_id == Repository.id)
+
+    if repository:
+        # Resolve the name first so the (repository_id, created_at, id) index drives the scan
+        repository_id = (await session.execute(
+            select(Repository.id).where(Repository.full_name == repository)
+        )).scalar_one_or_none()
+        if repository_id is None:
+            return {"reviews": [], "next_cursor": None}
+        query = query.where(Review.repository_id == repository_id)
+    # Literal predicates, so they match the partial indexes' (a bound 0 would not)
+    if severity:
+        query = query.where(SEVERITY_COUNTS[severity] > literal_column("0"))
+    if review_type:
+        query = query.where(REVIEW_TYPE_FLAGS[review_type])
+    if source:
+        query = query.where(Review.source == source)
+    if cursor:
+        query = query.where(tuple_(Review.created_at, Review.id) < decode_cursor(cursor))
+
+    query = query.order_by(Review.created_at.desc(), Review.id.desc()).limit(limit + 1)
+    rows = (await session.execute(query)).all()
+
+    reviews = [row._asdict() for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = reviews[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return {"reviews": reviews, "next_cursor": next_cursor}
+
+
+async def get_review(session: AsyncSession, review_id: int, include_code: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    A single stored review with its issues
+
+    Args:
+        session: Database session
+        review_id: Review id
+        include_code: Also load the reviewed code
+
+    Returns:
+        The review, or None if there is no review with that id
+    """
+    query = (
+        select(Review, Repository.full_name)
+        .outerjoin(Repository, Review.repository_id == Repository.id)
+        .where(Review.id == review_id)
+    )
+    if not include_code:
+        query = query.options(defer(Review.code))
+    row = (await session.execute(query)).first()
+    if row is None:
+        return None
+
+    review, repository = row
+    result = {column.key: getattr(review, column.key) for column in SUMMARY_COLUMNS if column.key != "repository"}
+    result.update(
+        repository=repository,
+        content_hash=review.content_hash,
+        issues=review.issues or [],
+        positive_aspects=review.positive_aspects or [],
+        code=review.code if include_code else None,
+    )
+    return result
@@ -0,0 +1,243 @@
+"""
+Buffered writer that stores finished reviews in the database
+
+Routes hand a review to record_review() and return right away; a
+background task drains the buffer and inserts rows in batches (one
+transaction per batch). If the buffer fills up because the database is
+down or slow, new reviews are dropped and counted rather than slowing
+requests down.
+"""
+import asyncio
+import hashlib
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core import database
+from app.core.config import settings
+from app.models.repository import Repository
+from app.models.review import REVIEW_TYPES, Review
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Queued by stop() so the flusher finishes its batch and exits
+_STOP = object()
+
+
+def content_hash(text: str) -> str:
+    """sha256 of the reviewed code, for finding earlier reviews of the same content"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ReviewWriter:
+    """Batches review inserts on a background task"""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._repository_ids: Dict[str, int] = {}
+        self._counters = {"written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return database.SessionLocal is not None
+
+    async def start(self):
+        """Start the background flusher (no-op when the database is disabled)"""
+        if not self.enabled or self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name="review-writer")
+
+    async def stop(self):
+        """Write whatever is still buffered, then stop"""
+        if self._task is None:
+            return
+        # The flusher writes its current batch and exits when it reaches the marker
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        while True:
+            rows = self._drain(self.batch_size)
+            if not rows:
+                break
+            await self._write(rows)
+        self._queue = None
+
+    def record(self, row: Dict[str, Any]) -> bool:
+        """
+        Queue one review row for writing; never blocks
+
+        Returns:
+            False if the row was dropped (writer not running or buffer full)
+        """
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self._counters["dropped"] += 1
+            return False
+        return True
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        rows = []
+        while self._queue is not None and len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return rows
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            # Give the batch a moment to fill before writing
+            deadline = time.monotonic() + self.flush_interval
+            rows = [row]
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                rows.append(row)
+            await self._write(rows)
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        try:
+            async with database.SessionLocal() as session:
+                repository_ids = await self._resolve_repositories(
+                    session, {row["repository"] for row in rows if row.get("repository")}
+                )
+                for row in rows:
+                    row["repository_id"] = repository_ids.get(row.pop("repository", None))
+                await session.execute(insert(Review), rows)
+                await session.commit()
+        except Exception as e:
+            self._counters["failed"] += len(rows)
+            logger.error(f"Failed to store {len(rows)} review(s): {str(e)}")
+            return
+        self._counters["written"] += len(rows)
+        self._counters["batches"] += 1
+
+    async def _resolve_repositories(self, session, full_names: set) -> Dict[str, int]:
+        """Map owner/repo names to repository ids, creating rows for new repositories"""
+        ids = {name: self._repository_ids[name] for name in full_names if name in self._repository_ids}
+        for _ in range(2):
+            missing = full_names - ids.keys()
+            if not missing:
+                break
+            result = await session.execute(
+                select(Repository.full_name, Repository.id).where(Repository.full_name.in_(missing))
+            )
+            ids.update(dict(result.all()))
+            new = full_names - ids.keys()
+            if not new:
+                break
+            try:
+                await session.execute(insert(Repository), [
+                    {"full_name": name, "name": name.split("/")[-1], "url": f"https://github.com/{name}"}
+                    for name in new
+                ])
+                await session.commit()
+            except IntegrityError:
+                # Another process added one first; look them up again
+                await session.rollback()
+        self._repository_ids.update(ids)
+        return ids
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "enabled": self.enabled,
+            "buffered": self._queue.qsize() if self._queue else 0,
+        }
+
+
+review_writer = ReviewWriter(
+    batch_size=settings.REVIEW_WRITER_BATCH_SIZE,
+    flush_interval=settings.REVIEW_WRITER_FLUSH_SECONDS,
+    max_queue=settings.REVIEW_WRITER_MAX_QUEUE
+)
+
+
+def review_row(
+    result: Dict[str, Any],
+    code: str,
+    source: str,
+    repository: Optional[str] = None,
+    pr_number: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Build the row stored for a finished review
+
+    Args:
+        result: Review result dict (issues, summary, positive_aspects, metadata)
+        code: The reviewed code (a PR's diff is hashed but not stored)
+        source: Where the review came from: analyze, stream, batch or pull_request
+        repository: "owner/repo" for PR reviews
+        pr_number: Pull request number for PR reviews
+
+    Returns:
+        Column values for the reviews table, plus the repository name
+    """
+    metadata = result.get("metadata") or {}
+    issues = result.get("issues") or []
+    severities = Counter(str(issue.get("severity", "")).lower() for issue in issues)
+    review_type = metadata.get("review_type", "general")
+    covered = set(review_type.split(","))
+    return {
+        "filename": metadata.get("filename") or (f"{repository}#{pr_number}" if repository else ""),
+        "code": None if source == "pull_request" else code,
+        "content_hash": content_hash(code),
+        "source": source,
+        "review_type": review_type,
+        **{f"covers_{name}": name in covered for name in REVIEW_TYPES},
+        "summary": result.get("summary"),
+        "issues": issues,
+        "positive_aspects": result.get("positive_aspects") or [],
+        "issue_count": len(issues),
+        "high_count": severities["high"],
+        "medium_count": severities["medium"],
+        "low_count": severities["low"],
+        "model": metadata.get("model", settings.model_name),
+        "degraded": bool(metadata.get("degraded")),
+        "pr_number": pr_number,
+        "repository": repository,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+def record_review(
+    result: Dict[str, Any],
+    code: str,
+    source: str,
+    repository: Optional[str] = None,
+    pr_number: Optional[int] = None
+) -> bool:
+    """
+    Queue a finished review for storage; arguments as for review_row
+
+    Returns:
+        False if the review was not queued (database disabled or buffer full)
+    """
+    if not review_writer.enabled:
+        return False
+    return review_writer.record(review_row(result, code, source, repository, pr_number))
@@ -0,0 +1,188 @@
+"""
+Async worker pool that runs jobs from the job queue
+
+The pool runs inside the API process (JOB_WORKERS > 0) or on its own via
+`python -m app.worker`, so review throughput can be scaled by starting more
+worker processes without touching the API.
+
+Each worker renews its job's lease while the handler runs and stops the
+handler as soon as the job is superseded or the lease is lost. Jobs with a
+dedupe key (one per PR) also hold a lock in the shared state, so a PR is
+never reviewed by two workers at once, in any process on any host.
+"""
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.shared_state import shared_state
+from app.core.tracing import tracer
+from app.services.github_app import AppNotInstalledError
+from app.services.job_queue import RUNNING, SUCCEEDED, SUPERSEDED, JobQueue, job_queue
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Handlers get the job payload and a check for whether the job is still wanted
+IsCurrent = Callable[[], Awaitable[bool]]
+JobHandler = Callable[[Dict[str, Any], IsCurrent], Awaitable[Any]]
+
+# A job whose PR is locked by an earlier review still winding down is retried after this long
+LOCKED_RETRY_SECONDS = 2.0
+
+# Failures another attempt can't fix: the job fails at once instead of retrying
+PERMANENT_ERRORS = (AppNotInstalledError,)
+
+
+async def _run_pr_review(payload: Dict[str, Any], is_current: IsCurrent) -> bool:
+    # Import here to avoid circular imports
+    from app.services.pr_review_service import review_pull_request
+    return await review_pull_request(
+        payload["owner"], payload["repo"], payload["pr_number"], payload["pr_title"],
+        is_current=is_current, head_sha=payload.get("head_sha", ""),
+        installation_id=payload.get("installation_id")
+    )
+
+
+HANDLERS: Dict[str, JobHandler] = {
+    "pr_review": _run_pr_review,
+}
+
+
+class ReviewWorkerPool:
+    """A fixed number of async workers polling the job queue"""
+
+    def __init__(self, queue: JobQueue, concurrency: int, poll_interval: float):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, str] = {}  # worker id -> job id
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def start(self):
+        """Spawn the workers"""
+        if self._tasks:
+            return
+        for index in range(self.concurrency):
+            worker_id = f"{self._prefix}:{index}"
+            self._tasks.append(asyncio.create_task(self._work(worker_id), name=worker_id))
+        logger.info(f"Started {self.concurrency} review worker(s)")
+
+    async def stop(self):
+        """Cancel the workers, handing any in-progress jobs back to the queue"""
+        in_flight = list(self._running.values())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job_id in in_flight:
+            await self.queue.release(job_id)
+
+    async def _work(self, worker_id: str):
+        while True:
+            try:
+                job = await self.queue.claim(worker_id)
+            except Exception as e:
+                logger.error(f"Failed to claim job: {str(e)}")
+                job = None
+
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            self._running[worker_id] = job["id"]
+            try:
+                await self._run(job)
+            finally:
+                self._running.pop(worker_id, None)
+
+    async def _is_current(self, job_id: str, worker_id: str) -> bool:
+        job = await self.queue.get(job_id)
+        return job is not None and job["status"] == RUNNING and job["worker_id"] == worker_id
+
+    async def _watch(self, job: Dict[str, Any], task: asyncio.Task, lock: Optional[str]):
+        """
+        Renew the job's lease (and PR lock) while the handler runs; cancel the
+        handler as soon as the job is superseded, from any process, or lost
+        """
+        renewed = time.monotonic()
+        while not task.done():
+            await asyncio.sleep(self.poll_interval)
+            if not await self.queue.renew(job["id"], job["worker_id"]):
+                task.cancel()
+                return
+            if lock is not None and time.monotonic() - renewed > settings.JOB_LEASE_SECONDS / 3:
+                if not await shared_state.renew(lock, job["id"], settings.JOB_LEASE_SECONDS):
+                    logger.warning(f"Job {job['id']} lost its lock {lock}; stopping")
+                    task.cancel()
+                    return
+                renewed = time.monotonic()
+
+    async def _run(self, job: Dict[str, Any]):
+        handler = HANDLERS.get(job["kind"])
+        if handler is None:
+            await self.queue.fail(job["id"], f"Unknown job kind: {job['kind']}", job["worker_id"])
+            return
+
+        lock = f"job-lock:{job['dedupe_key']}" if job.get("dedupe_key") else None
+        if lock is not None and not await shared_state.add(lock, settings.JOB_LEASE_SECONDS, job["id"]):
+            # A superseded review of the same PR hasn't stopped yet
+            logger.info(f"Job {job['id']} waiting for {lock}")
+            await self.queue.release(job["id"], delay=LOCKED_RETRY_SECONDS)
+            return
+        try:
+            await self._run_locked(job, handler, lock)
+        finally:
+            if lock is not None:
+                await shared_state.delete(lock, job["id"])
+
+    async def _run_locked(self, job: Dict[str, Any], handler: JobHandler, lock: Optional[str]):
+        worker_id = job["worker_id"]
+
+        # Continue the trace of whatever queued the job (e.g. the webhook)
+        with tracer.span(
+            f"job.{job['kind']}",
+            parent=job["payload"].get("traceparent"),
+            **{"job.id": job["id"], "job.attempt": job["attempts"], "repo": job["repo"]}
+        ) as span:
+            logger.info(f"Running job {job['id']} ({job['kind']} for {job['repo']}, attempt {job['attempts']})")
+            task = asyncio.create_task(handler(job["payload"], lambda: self._is_current(job["id"], worker_id)))
+            watcher = asyncio.create_task(self._watch(job, task, lock))
+            try:
+                result = await asyncio.wait_for(task, timeout=settings.JOB_TIMEOUT_SECONDS)
+                if result is False:
+                    raise RuntimeError("Handler reported failure")
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                # The watcher cancelled the handler: a newer job replaced this one, or the lease was lost
+                span.set_attribute("job.outcome", SUPERSEDED)
+                logger.info(f"Job {job['id']} superseded; stopped")
+                return
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                retry = not isinstance(e, PERMANENT_ERRORS)
+                status = await self.queue.fail(job["id"], error, worker_id, retry=retry)
+                span.set_attribute("job.outcome", status)
+                span.error = error
+                logger.warning(f"Job {job['id']} failed ({error}); now {status}")
+                return
+            finally:
+                watcher.cancel()
+
+            await self.queue.complete(job["id"], worker_id)
+            span.set_attribute("job.outcome", SUCCEEDED)
+            logger.info(f"Job {job['id']} succeeded")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": len(self._tasks), "busy": len(self._running)}
+
+
+review_workers = ReviewWorkerPool(
+    job_queue,
+    concurrency=settings.JOB_WORKERS,
+    poll_interval=settings.JOB_POLL_INTERVAL_SECONDS
+)
@@ -0,0 +1,79 @@
+"""
+Recently seen GitHub webhook deliveries
+
+GitHub redelivers a webhook (same X-GitHub-Delivery) when a delivery timed
+out or someone clicks "Redeliver". Handling it twice would queue the same
+review again and supersede the one already running, so deliveries seen
+within the TTL are dropped.
+
+Entries go in with the same TTL, so the oldest one is always the next to
+expire: expiry and the entry bound are both a pop from the front. With a
+shared state backend, a delivery new to this process is also claimed there,
+since GitHub's redelivery may reach a different API worker.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+from app.core.config import settings
+from app.core.shared_state import SharedState, shared_state
+
+
+class DeliveryLog:
+    """Bounded in-process set of delivery IDs, each kept for ttl seconds"""
+
+    def __init__(self, max_entries: int, ttl: float, state: SharedState):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.state = state
+        self._seen: "OrderedDict[str, float]" = OrderedDict()  # delivery id -> expires at (monotonic)
+        self.duplicates = 0
+
+    def _expire(self, now: float):
+        seen = self._seen
+        while seen:
+            oldest = next(iter(seen))
+            if seen[oldest] > now:
+                break
+            del seen[oldest]
+
+    async def claim(self, delivery_id: str) -> bool:
+        """
+        Record a delivery
+
+        Args:
+            delivery_id: The X-GitHub-Delivery header
+
+        Returns:
+            True the first time an ID is seen within the TTL, False for a redelivery
+        """
+        if not delivery_id or self.max_entries <= 0:
+            return True
+        now = time.monotonic()
+        self._expire(now)
+        if delivery_id in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen[delivery_id] = now + self.ttl
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        if self.state.shared and not await self.state.add(f"delivery:{delivery_id}", self.ttl):
+            # Another process took this one
+            self.duplicates += 1
+            return False
+        return True
+
+    async def forget(self, delivery_id: str):
+        """Drop a claimed delivery whose handling failed, so a redelivery is processed"""
+        self._seen.pop(delivery_id, None)
+        if self.state.shared and delivery_id:
+            await self.state.delete(f"delivery:{delivery_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tracked": len(self._seen), "duplicates": self.duplicates}
+
+
+# Global delivery log
+webhook_deliveries = DeliveryLog(
+    settings.WEBHOOK_DEDUP_MAX_ENTRIES, settings.WEBHOOK_DEDUP_TTL_SECONDS, shared_state
+)
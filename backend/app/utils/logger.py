@@ -4,6 +4,16 @@ Logging configuration for BroCode
 import logging
 import sys
 from app.core.config import settings
+from app.core.span_context import current_span
+
+
+class TraceContextFilter(logging.Filter):
+    """Tag records logged inside a span with its trace id"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = current_span()
+        record.trace = f"[trace {span.trace_id}] " if span is not None else ""
+        return True
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -25,10 +35,11 @@ def get_logger(name: str) -> logging.Logger:
         # Console handler
         handler = logging.StreamHandler(sys.stdout)
         handler.setLevel(getattr(logging, settings.LOG_LEVEL))
+        handler.addFilter(TraceContextFilter())
         
         # Formatter
         formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            '%(asctime)s - %(name)s - %(levelname)s - %(trace)s%(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         handler.setFormatter(formatter)
@@ -0,0 +1,70 @@
+"""
+Standalone review worker process
+
+Runs the job queue worker pool without the API, so review throughput can be
+scaled independently:
+
+    python -m app.worker
+"""
+import asyncio
+import signal
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from app.core.config import settings
+from app.core.database import close_db, init_db
+from app.core.gemini_client import gemini_client
+from app.core.shared_state import shared_state
+from app.core.tracing import tracer
+from app.services.github_service import github_service
+from app.services.job_queue import job_queue
+from app.services.review_store import review_writer
+from app.services.review_worker import review_workers
+from app.services.static_analysis import static_analyzer
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info(f"Starting BroCode worker ({settings.JOB_WORKERS} concurrent jobs)")
+    settings.validate()
+    if not shared_state.shared:
+        # The API is another process; with per-process state both would take the full Gemini quota
+        # and could review the same PR at once
+        raise SystemExit("python -m app.worker runs beside the API: set SHARED_STATE_BACKEND to sqlite or redis")
+    await tracer.start()
+    await shared_state.start()
+    await job_queue.start()
+    await github_service.start()
+    await static_analyzer.start()
+    if settings.DATABASE_ENABLED:
+        await init_db()
+        await review_writer.start()
+    await review_workers.start()
+
+    await stop.wait()
+
+    logger.info("Shutting down BroCode worker")
+    await review_workers.stop()
+    await github_service.close()
+    gemini_client.shutdown()
+    static_analyzer.shutdown()
+    await review_writer.stop()
+    await close_db()
+    job_queue.close()
+    await shared_state.stop()
+    shared_state.close()
+    await tracer.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""
+Benchmark a full audit: four /api/review/analyze calls vs one /api/review/batch
+
+Uses a fake model with a fixed latency that reports one issue per review
+type plus one issue every type finds, so the merged response can be checked
+for duplicates.
+
+Usage:
+    python benchmarks/bench_batch_review.py --latency 1.0 --files 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+os.environ["REVIEW_CACHE_ENABLED"] = "False"
+os.environ["JOB_WORKERS"] = "0"
+
+import httpx
+
+from app.main import app
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import StubProvider
+
+REVIEW_TYPES = ["general", "security", "performance", "style"]
+
+# Words from each type's instructions, to tell which review a prompt asks for
+PROMPT_MARKERS = {
+    "general": "Analyze this code comprehensively",
+    "security": "Focus specifically on security",
+    "performance": "Focus on performance",
+    "style": "Focus on code style",
+}
+
+
+def _issue(line: int, title: str, issue_type: str, severity: str = "medium") -> dict:
+    return {
+        "type": issue_type, "severity": severity, "line": line, "title": title,
+        "description": "...", "suggestion": "...", "code_snippet": None
+    }
+
+
+class AuditModel(StubProvider):
+    """Stands in for the Gemini model: blocks for a fixed time, then answers"""
+
+    def __init__(self, latency: float):
+        super().__init__(latency=f"fixed:{latency}")
+
+    def respond(self, prompt, rng):
+        types = [name for name, marker in PROMPT_MARKERS.items() if marker in prompt]
+        issues = [_issue(10 + REVIEW_TYPES.index(name), f"{name} finding", name) for name in types]
+        # Every review type spots the same unchecked input
+        title = "Unvalidated user input in query" if "security" in types else "Unvalidated user input"
+        issues.append(_issue(3, title, "security", "high" if "security" in types else "low"))
+        return json.dumps({"issues": issues, "summary": "ok", "positive_aspects": ["Readable"]})
+
+
+async def run(latency: float, files: int):
+    model = AuditModel(latency)
+    gemini_client.provider = model
+    code = "const q = req.query.id;\ndb.run(`SELECT * FROM t WHERE id = ${q}`);"
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        start = time.perf_counter()
+        for review_type in REVIEW_TYPES:
+            response = await client.post("/api/review/analyze", json={
+                "code": code, "filename": "query.js", "review_type": review_type
+            })
+            response.raise_for_status()
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = await client.post("/api/review/batch", json={
+            "files": [{"code": code, "filename": "query.js"}], "review_types": REVIEW_TYPES
+        })
+        response.raise_for_status()
+        batch = time.perf_counter() - start
+        merged = response.json()["reviews"][0]
+
+        model.calls = 0
+        start = time.perf_counter()
+        response = await client.post("/api/review/batch", json={
+            "files": [{"code": f"{code}\n// {i}", "filename": f"query{i}.js"} for i in range(files)],
+            "review_types": REVIEW_TYPES
+        })
+        response.raise_for_status()
+        multi = time.perf_counter() - start
+
+    shared = [issue for issue in merged["issues"] if issue["line"] == 3]
+    print(f"📊 Full audit ({len(REVIEW_TYPES)} review types), {latency:.2f}s model latency")
+    print(f"   4 x /analyze:       {sequential:.2f}s")
+    print(f"   1 x /batch:         {batch:.2f}s ({sequential / batch:.1f}x faster)")
+    print(f"   {files} files x 4 types: {multi:.2f}s ({model.calls} model calls)")
+    print(f"   Merged issues:      {len(merged['issues'])} "
+          f"(shared finding kept {len(shared)}x at severity {shared[0]['severity']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--files", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.latency, args.files))
@@ -0,0 +1,127 @@
+"""
+Benchmark the whole webhook → review → comment path offline
+
+Runs the API with in-process workers against the stub GitHub server and the
+stub model (LLM_PROVIDER=stub, so no Gemini key or network is needed),
+delivers one pull_request webhook per PR and waits for every review to be
+posted. Reports webhook acknowledgement latency, webhook-to-review latency
+percentiles, throughput, and how many reviews had parts left unreviewed.
+
+Model latency is drawn from a distribution and the stub answers are seeded
+by the prompt, so the same arguments post the same reviews on every run;
+the printed output digest makes that easy to check.
+
+Usage:
+    python benchmarks/bench_end_to_end.py --prs 20 --workers 4 --latency lognormal:0.4,0.5
+    python benchmarks/bench_end_to_end.py --malformed-rate 0.3 --error-rate 0.1
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prs", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent review jobs")
+    parser.add_argument("--lines", type=int, default=600, help="Changed lines per PR")
+    parser.add_argument("--latency", default="lognormal:0.4,0.5", help="Stub time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=400)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+args = parse_args()
+_tmp = tempfile.mkdtemp(prefix="brocode-bench-")
+os.environ["LLM_PROVIDER"] = "stub"
+os.environ["LLM_STUB_LATENCY"] = args.latency
+os.environ["LLM_STUB_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+os.environ["LLM_STUB_MALFORMED_RATE"] = str(args.malformed_rate)
+os.environ["LLM_STUB_ERROR_RATE"] = str(args.error_rate)
+os.environ["LLM_STUB_SEED"] = str(args.seed)
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("TOKENS_PER_MINUTE", "0")
+os.environ["GEMINI_RATE_LIMIT_BACKOFF_SECONDS"] = "0.2"
+os.environ["REVIEW_CACHE_ENABLED"] = "False"
+os.environ["JOB_QUEUE_PATH"] = os.path.join(_tmp, "jobs.db")
+os.environ["JOB_WORKERS"] = str(args.workers)
+os.environ["JOB_POLL_INTERVAL_SECONDS"] = "0.05"
+os.environ["PR_REVIEW_DEBOUNCE_SECONDS"] = "0"
+os.environ["GITHUB_WEBHOOK_SECRET"] = ""
+
+import httpx
+
+from app.core.gemini_client import gemini_client
+from app.main import app
+from app.services.github_service import github_service
+from benchmarks.stub_github import create_app, serve
+from benchmarks.synthetic_diff import make_diff
+
+
+def percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def posted(stub) -> dict:
+    """PR number -> body of what was posted for it"""
+    bodies = {comment["pr_number"]: comment["body"] for comment in stub.state.comments}
+    for review in stub.state.reviews:
+        bodies[review["pr_number"]] = review["body"] + json.dumps(review.get("comments", []), sort_keys=True)
+    return bodies
+
+
+def run():
+    stub = create_app(diff=make_diff(args.lines, files=max(args.lines // 200, 1), seed=args.seed))
+    with serve(stub) as github_url:
+        github_service.base_url = github_url
+        with serve(app) as base_url, httpx.Client(base_url=base_url, timeout=None) as client:
+            # Each PR in its own repo with its own title, so no memo hits and distinct prompts
+            sent, acks, done = {}, [], {}
+            start = time.perf_counter()
+            for number in range(1, args.prs + 1):
+                webhook = {
+                    "action": "opened",
+                    "number": number,
+                    "pull_request": {"number": number, "title": f"Benchmark PR {number}",
+                                     "head": {"sha": f"{number:040d}"}},
+                    "repository": {"full_name": f"octo/repo-{number}"},
+                }
+                sent[number] = time.perf_counter()
+                client.post("/api/webhooks/github", json=webhook, headers={
+                    "X-GitHub-Event": "pull_request", "X-GitHub-Delivery": f"bench-{number}"
+                }).raise_for_status()
+                acks.append(time.perf_counter() - sent[number])
+            while len(done) < args.prs:
+                now = time.perf_counter()
+                for number in posted(stub):
+                    done.setdefault(number, now - sent[number])
+                time.sleep(0.01)
+            elapsed = time.perf_counter() - start
+
+    bodies = posted(stub)
+    latencies = list(done.values())
+    incomplete = sum("could not be reviewed" in body for body in bodies.values())
+    digest = hashlib.sha256(json.dumps(sorted(bodies.items())).encode("utf-8")).hexdigest()[:12]
+    print(f"📊 {args.prs} PRs x {args.lines} changed lines, {args.workers} workers, stub latency {args.latency}, "
+          f"{args.tokens_per_second:.0f} tokens/s")
+    print(f"   Webhook ack:     p50 {statistics.median(acks) * 1000:6.1f}ms  p95 {percentile(acks, 0.95) * 1000:6.1f}ms")
+    print(f"   Webhook→review:  p50 {statistics.median(latencies):6.2f}s  p95 {percentile(latencies, 0.95):6.2f}s  "
+          f"max {max(latencies):6.2f}s")
+    print(f"   Throughput:      {args.prs / elapsed:.2f} PRs/s ({elapsed:.2f}s, {gemini_client.provider.calls} model calls)")
+    print(f"   Incomplete:      {incomplete}/{args.prs} reviews (malformed rate {args.malformed_rate}, "
+          f"429 rate {args.error_rate})")
+    print(f"   Output digest:   {digest} (same arguments, same digest)")
+
+
+if __name__ == "__main__":
+    run()
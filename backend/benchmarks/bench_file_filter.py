@@ -0,0 +1,127 @@
+"""
+Benchmark the PR file filter on dependency updates and a mixed PR
+
+Reviews synthetic PRs against the stub GitHub server with a fake model, with
+the filter on (the default) and with REVIEW_SKIP_GENERATED off (every text
+file reviewed, generated files packed last): a lockfile refresh, a
+dependency bump (package.json plus a large package-lock.json) and a feature
+PR that also touches a lockfile, a minified bundle and vendored code.
+Reports model calls, diff downloads, wall time and which files the model
+saw first.
+
+Usage:
+    python benchmarks/bench_file_filter.py --lock-lines 40000 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("TOKENS_PER_MINUTE", "0")
+os.environ["REVIEW_CACHE_ENABLED"] = "False"
+
+from app.core.config import settings
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import StubProvider
+from app.services.file_filter import plan_review
+from app.services.github_service import github_service
+from app.services.pr_review_service import review_pull_request
+from benchmarks.bench_prompt_packing import lockfile_diff
+from benchmarks.stub_github import create_app, files_listing, serve
+from benchmarks.synthetic_diff import make_diff
+
+_PATH_RE = re.compile(r"^diff --git a/\S+ b/(\S+)$", re.MULTILINE)
+
+
+class BlockingModel(StubProvider):
+    def __init__(self, latency: float):
+        super().__init__(latency=f"fixed:{latency}")
+        self.prompts = []
+
+    def respond(self, prompt, rng):
+        self.prompts.append(prompt)
+        return json.dumps({"summary": "Part reviewed", "issues": []})
+
+
+def renamed(diff: str, old: str, new: str) -> str:
+    return diff.replace(old, new)
+
+
+def dependency_bump(lock_lines: int) -> str:
+    manifest = "\n".join([
+        "diff --git a/package.json b/package.json",
+        "--- a/package.json",
+        "+++ b/package.json",
+        "@@ -10,3 +10,3 @@",
+        '   "dependencies": {',
+        '-    "express": "^4.18.2",',
+        '+    "express": "^4.19.2",',
+    ]) + "\n"
+    return manifest + lockfile_diff(lock_lines)
+
+
+def feature_pr(lock_lines: int) -> str:
+    tests = make_diff(600, files=3, seed=4).replace("src/", "tests/")
+    source = make_diff(1500, files=6, seed=5)
+    auth = renamed(make_diff(200, files=1, seed=6), "src/module_0/service_0.py", "src/auth/session.py")
+    vendored = renamed(make_diff(3000, files=1, seed=7), "src/module_0/service_0.py", "vendor/lib/vendored.py")
+    bundle = renamed(make_diff(2000, files=1, seed=8), "src/module_0/service_0.py", "static/app.min.js")
+    return lockfile_diff(lock_lines) + bundle + tests + source + vendored + auth
+
+
+async def review(diff: str, latency: float, skip_generated: bool) -> dict:
+    settings.REVIEW_SKIP_GENERATED = skip_generated
+    model = BlockingModel(latency)
+    gemini_client.provider = model
+    stub = create_app(diff=diff)
+
+    with serve(stub) as base_url:
+        github_service.base_url = base_url
+        await github_service.start()
+        start = time.perf_counter()
+        await review_pull_request("octo", "repo", 1, "Benchmark PR")
+        elapsed = time.perf_counter() - start
+        await github_service.close()
+
+    first = _PATH_RE.findall(model.prompts[0]) if model.prompts else []
+    return {
+        "calls": len(model.prompts),
+        "tokens": sum(len(prompt) for prompt in model.prompts) // 4,
+        "diffs": stub.state.requests["diff"],
+        "elapsed": elapsed,
+        "first": first[:3],
+    }
+
+
+async def run(lock_lines: int, latency: float):
+    scenarios = (
+        ("lockfile refresh", lockfile_diff(lock_lines)),
+        ("dependency bump", dependency_bump(lock_lines)),
+        ("feature PR", feature_pr(lock_lines)),
+    )
+    for name, diff in scenarios:
+        listing = files_listing(diff)
+        start = time.perf_counter()
+        plan = plan_review(listing)
+        planned = (time.perf_counter() - start) * 1000
+        print(f"📊 {name}: {len(listing)} files, {len(diff):,} characters of diff; "
+              f"plan in {planned:.2f}ms, skipping {plan.skipped_by_reason() or 'nothing'}")
+        for label, skip_generated in (("filter off", False), ("filter on", True)):
+            result = await review(diff, latency, skip_generated)
+            print(f"   {label:<11} {result['calls']:>3} model calls  ~{result['tokens']:>7,} tokens  "
+                  f"{result['diffs']} diff download(s)  {result['elapsed']:6.2f}s  "
+                  f"first part: {', '.join(result['first']) or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lock-lines", type=int, default=40000)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(run(args.lock_lines, args.latency))
@@ -0,0 +1,102 @@
+"""
+Benchmark GitHub API calls: fresh client per call vs the shared pool
+
+Runs GitHubService against a local stub server twice: once opening a new
+httpx.AsyncClient for every call (the old behaviour) and once through the
+shared keep-alive pool, then prints per-call latency for each.
+
+Usage:
+    python benchmarks/bench_github_client.py --calls 200 --burst 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import httpx
+
+from app.services.github_service import GitHubService
+from benchmarks.stub_github import serve
+
+
+class FreshClientGitHubService(GitHubService):
+    """Opens a new client per call, like the service did before pooling"""
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return _OneShotClient(self._create_client())
+
+
+class _OneShotClient:
+    def __init__(self, client: httpx.AsyncClient):
+        self._client = client
+
+    async def get(self, *args, **kwargs):
+        async with self._client as client:
+            return await client.get(*args, **kwargs)
+
+    async def post(self, *args, **kwargs):
+        async with self._client as client:
+            return await client.post(*args, **kwargs)
+
+    async def request(self, *args, **kwargs):
+        async with self._client as client:
+            return await client.request(*args, **kwargs)
+
+
+def _report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"   {label:<8} mean {statistics.mean(timings) * 1000:7.2f}ms   "
+          f"p50 {statistics.median(timings) * 1000:7.2f}ms   p95 {p95 * 1000:7.2f}ms")
+
+
+async def _timed_calls(service: GitHubService, calls: int, burst: int) -> list:
+    timings = []
+
+    async def one():
+        start = time.perf_counter()
+        diff = await service.get_pr_diff("octo", "repo", 1)
+        assert diff
+        timings.append(time.perf_counter() - start)
+
+    for _ in range(0, calls, burst):
+        await asyncio.gather(*(one() for _ in range(burst)))
+    return timings
+
+
+async def run(calls: int, burst: int):
+    with serve() as base_url:
+        fresh = FreshClientGitHubService()
+        fresh.base_url = base_url
+
+        pooled = GitHubService()
+        pooled.base_url = base_url
+        await pooled.start()
+
+        # Warm up both paths once so imports and server start-up don't count
+        await _timed_calls(fresh, burst, burst)
+        await _timed_calls(pooled, burst, burst)
+
+        fresh_timings = await _timed_calls(fresh, calls, burst)
+        pooled_timings = await _timed_calls(pooled, calls, burst)
+        await pooled.close()
+
+    print(f"📊 {calls} diff fetches in bursts of {burst}")
+    _report("fresh", fresh_timings)
+    _report("pooled", pooled_timings)
+    speedup = statistics.mean(fresh_timings) / statistics.mean(pooled_timings)
+    print(f"   Pooled client is {speedup:.1f}x faster per call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--burst", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.burst))
@@ -0,0 +1,162 @@
+"""
+Benchmark posting PR feedback and GitHub API quota use
+
+Against the stub GitHub server, which like GitHub throttles bursts of
+writes (secondary rate limit, 403 with Retry-After):
+
+* Inline feedback: posts N findings as inline comments one API call each,
+  then as a single pull request review with batched comments, and reports
+  writes, secondary-limit hits and wall time.
+* End to end: reviews a synthetic PR with a fake model that flags every
+  tenth added line, and reports the writes and inline comments it produced.
+* Conditional requests: reviews the same PR head three times (as a retry or
+  a re-run would) and reports how many GETs were served as free 304s.
+* Quota reserve: starts with the quota just above GITHUB_RATE_LIMIT_RESERVE
+  and shows requests waiting for the reset instead of spending the rest.
+
+Usage:
+    python benchmarks/bench_github_review.py --findings 120 --write-limit 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("TOKENS_PER_MINUTE", "0")
+os.environ["REVIEW_CACHE_ENABLED"] = "False"
+
+from app.core.config import settings
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import StubProvider
+from app.services.diff_parser import iter_file_diffs
+from app.services.github_service import GitHubService, github_service
+from app.services.pr_review_service import commentable_lines, review_pull_request
+from benchmarks.stub_github import create_app, serve
+from benchmarks.synthetic_diff import make_diff
+
+_CHUNK_RE = re.compile(r"```diff\n(.*?)\n```", re.DOTALL)
+
+
+class FlaggingModel(StubProvider):
+    """Flags every tenth added line of the diff it is shown"""
+
+    def respond(self, prompt, rng):
+        issues = []
+        for file_diff in iter_file_diffs(_CHUNK_RE.search(prompt).group(1).splitlines()):
+            for hunk in file_diff.hunks:
+                line_number = hunk.new_start
+                for line in hunk.lines:
+                    if line.startswith("+") and line_number % 10 == 0:
+                        issues.append({
+                            "file": file_diff.path, "line": line_number, "type": "bug", "severity": "medium",
+                            "title": f"Check retries on line {line_number}", "description": "d", "suggestion": "s",
+                        })
+                    if line[:1] in (" ", "+", ""):
+                        line_number += 1
+        return json.dumps({"summary": "Part reviewed", "issues": issues})
+
+
+def findings_on_diff(diff: str, count: int) -> list:
+    lines = commentable_lines(list(iter_file_diffs(diff.splitlines())))
+    spots = [(path, line) for path, numbers in lines.items() for line in sorted(numbers)]
+    step = max(len(spots) // count, 1)
+    return [
+        {"path": path, "line": line, "side": "RIGHT", "body": f"🟠 **Finding {index}**\n\nExplanation and a fix."}
+        for index, (path, line) in enumerate(spots[::step][:count])
+    ]
+
+
+async def inline_feedback(diff: str, findings: int, write_limit: int):
+    comments = findings_on_diff(diff, findings)
+    print(f"📊 {len(comments)} inline findings, stub allows {write_limit} writes/s")
+
+    stub = create_app(diff=diff, write_limit=write_limit)
+    with serve(stub) as base_url:
+        service = GitHubService()
+        service.base_url = base_url
+        url = f"{base_url}/repos/octo/repo/pulls/1/comments"
+        start = time.perf_counter()
+        for comment in comments:
+            await service._request("POST", url, headers=service.headers, json=comment)
+        one_by_one = time.perf_counter() - start
+        per_comment = dict(stub.state.requests)
+
+        stub.state.requests.update(writes=0, rate_limited=0)
+        stub.state.write_times = []
+        start = time.perf_counter()
+        ok = await service.submit_pr_review("octo", "repo", 1, "## 🤖 BroCode Review", comments)
+        batched = time.perf_counter() - start
+        await service.close()
+
+    print(f"   one call each  {per_comment['writes']:>4} writes  {per_comment['rate_limited']:>3} rate limited  "
+          f"{one_by_one:6.2f}s")
+    print(f"   one review     {stub.state.requests['writes']:>4} writes  {stub.state.requests['rate_limited']:>3} "
+          f"rate limited  {batched:6.2f}s  ({len(stub.state.reviews)} review(s), {'accepted' if ok else 'rejected'})")
+
+
+async def end_to_end(diff: str, write_limit: int):
+    gemini_client.provider = FlaggingModel()
+    stub = create_app(diff=diff, write_limit=write_limit, quota={"remaining": 5000, "reset": time.time() + 3600})
+
+    with serve(stub) as base_url:
+        github_service.base_url = base_url
+        await github_service.start()
+        print(f"📊 PR review of a {len(diff):,}-character diff, reviewed three times at the same head")
+        for attempt in range(1, 4):
+            before = dict(stub.state.requests)
+            reviews_before = len(stub.state.reviews)
+            quota_before = stub.state.quota["remaining"]
+            start = time.perf_counter()
+            await review_pull_request("octo", "repo", 1, "Benchmark PR", head_sha="a" * 40)
+            elapsed = time.perf_counter() - start
+            gets = (stub.state.requests["diff"] - before["diff"]) + (stub.state.requests["files"] - before["files"])
+            not_modified = stub.state.requests["not_modified"] - before["not_modified"]
+            reviews = stub.state.reviews[reviews_before:]
+            print(f"   run {attempt}: {gets} GETs ({not_modified} answered 304), "
+                  f"{stub.state.requests['writes'] - before['writes']} write(s) for {len(reviews)} review(s) "
+                  f"with {sum(len(review['comments']) for review in reviews)} inline comments, "
+                  f"quota spent {quota_before - stub.state.quota['remaining']}  {elapsed:5.2f}s")
+        await github_service.close()
+
+
+async def quota_reserve(diff: str):
+    reset_in = 2.0
+    stub = create_app(diff=diff, quota={
+        "remaining": settings.GITHUB_RATE_LIMIT_RESERVE + 1, "reset": time.time() + reset_in
+    })
+    with serve(stub) as base_url:
+        service = GitHubService()
+        service.base_url = base_url
+        timings = []
+        for number in range(1, 4):
+            start = time.perf_counter()
+            await service.get_pr_diff("octo", "repo", number)
+            timings.append(time.perf_counter() - start)
+            # A different PR each time, so no 304s
+            stub.state.diff += "\n"
+        await service.close()
+    print(f"📊 Quota {settings.GITHUB_RATE_LIMIT_RESERVE + 1} with GITHUB_RATE_LIMIT_RESERVE="
+          f"{settings.GITHUB_RATE_LIMIT_RESERVE}, reset in {reset_in:.0f}s")
+    print("   " + "  ".join(f"GET {index}: {timing:5.2f}s" for index, timing in enumerate(timings, start=1))
+          + f"  ({service.stats()['rate_limit_waits']} wait(s) for the reset)")
+
+
+async def run(findings: int, write_limit: int):
+    diff = make_diff(3000, files=12, seed=3)
+    await inline_feedback(diff, findings, write_limit)
+    await end_to_end(diff, write_limit)
+    await quota_reserve(diff)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--findings", type=int, default=120)
+    parser.add_argument("--write-limit", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.findings, args.write_limit))
@@ -0,0 +1,102 @@
+"""
+Benchmark metrics overhead, and show the stage breakdown of a PR review
+
+Times the primitives the hot path uses (a labelled histogram observation,
+a timed block, a counter increment) and rendering /metrics. Then reviews a
+synthetic PR against the stub GitHub server with a fake model and prints
+where the time went, as read back from the metrics.
+
+Usage:
+    python benchmarks/bench_metrics.py --ops 200000 --lines 3000 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("TOKENS_PER_MINUTE", "0")
+os.environ["REVIEW_CACHE_ENABLED"] = "False"
+
+from app.core import metrics
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import StubProvider
+from app.services.github_service import github_service
+from app.services.pr_review_service import review_pull_request
+from benchmarks.stub_github import create_app, serve
+from benchmarks.synthetic_diff import make_diff
+
+STAGES = [
+    ("diff fetch", metrics.DIFF_FETCH_SECONDS),
+    ("prompt build", metrics.PROMPT_BUILD_SECONDS),
+    ("quota wait", metrics.RATE_LIMIT_WAIT_SECONDS),
+    ("gemini", metrics.GEMINI_SECONDS),
+    ("parse", metrics.PARSE_SECONDS),
+    ("comment post", metrics.COMMENT_POST_SECONDS),
+]
+
+
+def per_op_ns(fn, ops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(ops):
+        fn()
+    return (time.perf_counter() - start) / ops * 1e9
+
+
+def bench_primitives(ops: int):
+    histogram = metrics.Histogram("bench_seconds", "Benchmark histogram", ["review_type", "repo"])
+    counter = metrics.Counter("bench_total", "Benchmark counter", ["review_type", "repo"])
+
+    def timed_block():
+        with histogram.time(review_type="general", repo="octo/repo"):
+            pass
+
+    print(f"📊 Cost per call, {ops:,} calls")
+    print(f"   Histogram.observe:  {per_op_ns(lambda: histogram.observe(0.2, review_type='general', repo='octo/repo'), ops):6.0f}ns")
+    print(f"   Histogram.time:     {per_op_ns(timed_block, ops):6.0f}ns")
+    print(f"   Counter.inc:        {per_op_ns(lambda: counter.inc(120, review_type='general', repo='octo/repo'), ops):6.0f}ns")
+
+    # A busy instance: a few hundred repos across every metric
+    for repo in range(300):
+        for review_type in ("general", "security", "performance", "style"):
+            histogram.observe(0.1, review_type=review_type, repo=f"org/repo{repo}")
+    start = time.perf_counter()
+    text = metrics.registry.render()
+    print(f"   Render /metrics:    {(time.perf_counter() - start) * 1000:6.1f}ms for "
+          f"{text.count(chr(10)):,} lines ({len(text) // 1024}KB)")
+
+
+async def bench_pr_review(lines: int, latency: float):
+    diff = make_diff(lines, files=max(lines // 250, 1))
+    gemini_client.provider = StubProvider(latency=f"fixed:{latency}", issues=0)
+
+    with serve(create_app(diff=diff)) as base_url:
+        github_service.base_url = base_url
+        await github_service.start()
+        start = time.perf_counter()
+        await review_pull_request("octo", "repo", 1, "Big refactor")
+        elapsed = time.perf_counter() - start
+        await github_service.close()
+
+    print(f"📊 PR review of a {lines}-line diff, {latency:.2f}s model latency: {elapsed:.2f}s wall")
+    print(f"   {'stage':<14} {'calls':>6} {'total':>9} {'mean':>9}")
+    for name, histogram in STAGES:
+        series = histogram.labels(review_type="general", repo="octo/repo")
+        if series.count:
+            print(f"   {name:<14} {series.count:>6} {series.sum:>8.3f}s {series.sum / series.count * 1000:>7.1f}ms")
+    tokens_in = metrics.TOKENS.labels(direction="in", review_type="general", repo="octo/repo").value
+    tokens_out = metrics.TOKENS.labels(direction="out", review_type="general", repo="octo/repo").value
+    print(f"   tokens: {tokens_in:,.0f} in, {tokens_out:,.0f} out")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--lines", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    bench_primitives(args.ops)
+    asyncio.run(bench_pr_review(args.lines, args.latency))
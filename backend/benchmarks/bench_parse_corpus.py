@@ -0,0 +1,109 @@
+"""
+Benchmark review parsing over a corpus of recorded model responses
+
+For every response in benchmarks/corpus, compares the old parse (strip the
+code fence, json.loads, give up on any error) with parse_review: how many
+issues each recovers, and how long each takes. Then times the streaming
+path on the largest response, fed in small chunks, against a single
+json.loads of the finished text.
+
+Usage:
+    python benchmarks/bench_parse_corpus.py --runs 200 --chunk 64
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.core.gemini_client import strip_code_fence
+from app.core.stream_parser import IssueStreamParser, parse_review
+from app.models.schemas import ReviewIssue
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def old_parse(text: str) -> int:
+    """Issues the parser found before: all of them, or none on any JSON error"""
+    try:
+        result = json.loads(strip_code_fence(text))
+    except json.JSONDecodeError:
+        return 0
+    return len([ReviewIssue(**issue) for issue in result.get("issues", [])])
+
+
+def new_parse(text: str) -> int:
+    parsed = parse_review(text)
+    return len(parsed.data["issues"]) if parsed.data else 0
+
+
+def timed(fn, text: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            fn(text)
+        except Exception:
+            pass
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def load_whole(chunks):
+    result = json.loads(strip_code_fence("".join(chunks)))
+    return [ReviewIssue(**issue) for issue in result["issues"]]
+
+
+def stream_then_finish(chunks):
+    parser = IssueStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.finish()
+
+
+def run(runs: int, chunk_size: int):
+    with open(os.path.join(CORPUS, "expected.json")) as f:
+        expected = json.load(f)
+
+    print(f"📊 {len(expected)} recorded responses, median of {runs} runs")
+    print(f"   {'response':<26} {'expected':>8} {'old':>5} {'new':>5} {'old time':>10} {'new time':>10}  flags")
+    totals = [0, 0, 0]
+    for name, want in expected.items():
+        with open(os.path.join(CORPUS, name)) as f:
+            text = f.read()
+        try:
+            old = old_parse(text)
+        except Exception:
+            old = 0  # e.g. an issue failing validation took down the whole review
+        parsed = parse_review(text)
+        new = len(parsed.data["issues"]) if parsed.data else 0
+        flags = ",".join(flag for flag in ("repaired", "truncated") if getattr(parsed, flag))
+        if parsed.rejected:
+            flags += f"{',' if flags else ''}{parsed.rejected} rejected"
+        print(f"   {name:<26} {want:>8} {old:>5} {new:>5} "
+              f"{timed(old_parse, text, runs) * 1e6:>8.0f}us {timed(new_parse, text, runs) * 1e6:>8.0f}us  {flags}")
+        totals[0] += want
+        totals[1] += old
+        totals[2] += new
+    print(f"   Recovered: old {totals[1]}/{totals[0]}, new {totals[2]}/{totals[0]}")
+
+    with open(os.path.join(CORPUS, "large_valid.txt")) as f:
+        text = f.read()
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    whole = timed(load_whole, chunks, runs)
+    streamed = timed(stream_then_finish, chunks, runs)
+    print(f"📊 {len(text) // 1024}KB response in {len(chunks)} chunks of {chunk_size} chars")
+    print(f"   json.loads + validate at end:   {whole * 1000:.2f}ms (no issues until then)")
+    print(f"   feed() per chunk + finish():    {streamed * 1000:.2f}ms (issues validated as they close)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--chunk", type=int, default=64)
+    args = parser.parse_args()
+    run(args.runs, args.chunk)
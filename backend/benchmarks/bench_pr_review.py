@@ -0,0 +1,101 @@
+"""
+Benchmark chunked PR review on a large synthetic diff
+
+Serves a synthetic diff from the local stub GitHub server, replaces the model
+with a fake one that blocks for a fixed time, and runs review_pull_request.
+Reports how much of the diff reached the model and how long the review took
+compared with a single model call.
+
+Usage:
+    python benchmarks/bench_pr_review.py --lines 5000 --latency 1.0 --resync
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+
+from app.core.config import settings
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import StubProvider
+from app.services.github_service import github_service
+from app.services.pr_review_service import review_pull_request
+from benchmarks.stub_github import create_app, serve
+from benchmarks.synthetic_diff import make_diff
+
+
+class BlockingModel(StubProvider):
+    """Records every prompt and answers with an empty review after a delay"""
+
+    def __init__(self, latency: float):
+        super().__init__(latency=f"fixed:{latency}")
+        self.prompts = []
+
+    def respond(self, prompt, rng):
+        self.prompts.append(prompt)
+        return json.dumps({"summary": "Part reviewed", "issues": []})
+
+
+def _touch_one_hunk(diff: str) -> str:
+    """Change a single added line, as a follow-up commit would"""
+    lines = diff.splitlines()
+    for index, line in enumerate(lines):
+        if line.startswith("+") and not line.startswith("+++"):
+            lines[index] = line + "  # tweak"
+            break
+    return "\n".join(lines) + "\n"
+
+
+async def run(lines: int, latency: float, resync: bool):
+    diff = make_diff(lines, files=max(lines // 250, 1))
+    model = BlockingModel(latency)
+    gemini_client.provider = model
+    stub = create_app(diff=diff)
+
+    with serve(stub) as base_url:
+        github_service.base_url = base_url
+        await github_service.start()
+        start = time.perf_counter()
+        ok = await review_pull_request("octo", "repo", 1, "Big refactor")
+        elapsed = time.perf_counter() - start
+
+        if resync:
+            # Push a one-line change and review again, like a synchronize event
+            first_calls = len(model.prompts)
+            stub.state.diff = _touch_one_hunk(diff)
+            start = time.perf_counter()
+            await review_pull_request("octo", "repo", 1, "Big refactor")
+            resync_elapsed = time.perf_counter() - start
+            resync_calls = len(model.prompts) - first_calls
+            model.prompts = model.prompts[:first_calls]
+
+        await github_service.close()
+
+    changed = [line for line in diff.splitlines() if line[:1] in "+-" and line[:3] not in ("+++", "---")]
+    seen = "\n".join(model.prompts)
+    covered = sum(1 for line in changed if line in seen)
+    parallel = min(settings.PR_REVIEW_CONCURRENCY, settings.GEMINI_MAX_WORKERS)
+    rounds = -(-len(model.prompts) // parallel)
+
+    print(f"📊 {lines}-line diff, {latency:.2f}s per model call, "
+          f"{parallel} in parallel")
+    print(f"   Model calls:  {len(model.prompts)}")
+    print(f"   Coverage:     {covered}/{len(changed)} changed lines sent to the model")
+    print(f"   Wall time:    {elapsed:.2f}s (~{rounds} round(s) of {latency:.2f}s)")
+    print(f"   Review:       {'posted' if ok and (stub.state.reviews or stub.state.comments) else 'not posted'}")
+    if resync:
+        print(f"   Re-review after a one-line push: {resync_calls} model call(s), {resync_elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--resync", action="store_true", help="Also time a re-review after a one-line push")
+    args = parser.parse_args()
+    asyncio.run(run(args.lines, args.latency, args.resync))
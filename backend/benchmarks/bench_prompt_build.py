@@ -0,0 +1,100 @@
+"""
+Benchmark review prompt assembly per language
+
+Builds single-type and combined review prompts for small files in several
+languages through GeminiClient._build_prompt / _build_combined_prompt and
+reports the time per build and the prompt overhead: tokens spent on
+instructions rather than code. Also times language detection on its own.
+
+Usage:
+    python benchmarks/bench_prompt_build.py --ops 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.core.gemini_client import gemini_client
+from app.core.tokens import estimate_tokens
+
+SAMPLES = {
+    "service.py": '''import json
+
+def load(path, cache={}):
+    if path in cache:
+        return cache[path]
+    with open(path) as f:
+        cache[path] = json.load(f)
+    return cache[path]
+''',
+    "handler.go": '''package api
+
+func Load(path string) (map[string]any, error) {
+\tdata, _ := os.ReadFile(path)
+\tvar out map[string]any
+\treturn out, json.Unmarshal(data, &out)
+}
+''',
+    "app.js": '''const fs = require("fs");
+
+function load(path) {
+  return JSON.parse(fs.readFileSync(path));
+}
+module.exports = { load };
+''',
+    "types.ts": '''export interface Config { path: string; retries: number }
+
+export function load(config: Config): any {
+  return JSON.parse(require("fs").readFileSync(config.path));
+}
+''',
+    "deploy": '''#!/usr/bin/env bash
+cp $1 /srv/app && systemctl restart app
+''',
+}
+
+
+def per_op_us(fn, ops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(ops):
+        fn()
+    return (time.perf_counter() - start) / ops * 1e6
+
+
+def run(ops: int):
+    print(f"📊 Prompt build, {ops:,} builds per row")
+    print(f"   {'file':<12} {'single':>9} {'combined':>9} {'overhead':>9} {'combined':>9}  fence")
+    for filename, code in SAMPLES.items():
+        single = per_op_us(lambda: gemini_client._build_prompt(code, filename, "general"), ops)
+        combined = per_op_us(
+            lambda: gemini_client._build_combined_prompt(code, filename, ["security", "performance", "style"]), ops
+        )
+        prompt = gemini_client._build_prompt(code, filename, "general")
+        combined_prompt = gemini_client._build_combined_prompt(code, filename, ["security", "performance", "style"])
+        fence = prompt[prompt.rindex("```", 0, len(prompt) - 3):].split("\n", 1)[0]
+        # Overhead: prompt tokens that are not the code itself
+        code_tokens = estimate_tokens(code)
+        print(f"   {filename:<12} {single:>7.2f}us {combined:>7.2f}us "
+              f"{estimate_tokens(prompt) - code_tokens:>9} {estimate_tokens(combined_prompt) - code_tokens:>9}  {fence}")
+
+    try:
+        from app.core.prompts import detect_language
+    except ImportError:
+        return
+    for label, filename in (("by extension", "service.py"), ("by content", "deploy")):
+        code = SAMPLES[filename]
+        print(f"   detect_language {label}: {per_op_us(lambda: detect_language(filename, code), ops):.2f}us")
+    unnamed = SAMPLES["service.py"]
+    print(f"   detect_language sniffing an unnamed Python file: "
+          f"{per_op_us(lambda: detect_language('snippet', unnamed), ops):.2f}us "
+          f"-> {detect_language('snippet', unnamed).name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.ops)
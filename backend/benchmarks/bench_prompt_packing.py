@@ -0,0 +1,154 @@
+"""
+Benchmark token estimation and prompt packing
+
+Packs a mixed PR diff (source files with small and large hunks, a lockfile
+and a minified bundle) two ways: the previous packer (diff order, close a
+chunk as soon as the next hunk doesn't fit) and pack_chunks. Chunk sizes are
+measured with a stand-in tokenizer that is denser than the 4 chars/token
+default, as code usually is, so the run also shows what calibrating the
+estimator against exact counts does to chunks that overrun the budget.
+
+Usage:
+    python benchmarks/bench_prompt_packing.py --lines 6000 --budget 4000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from dataclasses import replace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.core.tokens import TokenCounter, estimate_tokens, token_counter
+from app.services.diff_chunker import DiffChunk, pack_chunks
+from app.services.file_filter import PRIORITY_SOURCE, file_priority
+from app.services.diff_parser import iter_file_diffs
+from app.services.pr_review_service import calibration_sample
+from benchmarks.synthetic_diff import make_diff
+
+_TOKEN_RE = re.compile(r"[A-Za-z]{1,4}|\d{1,3}|\s{2,}|\S")
+
+
+def exact_tokens(text: str) -> int:
+    """Stand-in for the model tokenizer: short word pieces, digits in threes, punctuation"""
+    return len(_TOKEN_RE.findall(text))
+
+
+def lockfile_diff(lines: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    body = []
+    for _ in range(lines // 3):
+        name = f"pkg-{rng.randint(0, 99999)}"
+        body += [
+            f'-    "node_modules/{name}": {{ "version": "1.{rng.randint(0, 9)}.0" }},',
+            f'+    "node_modules/{name}": {{ "version": "2.{rng.randint(0, 9)}.0" }},',
+            f'     "node_modules/{name}-peer": {{ "dev": true }},',
+        ]
+    count = len(body)
+    return "\n".join([
+        "diff --git a/package-lock.json b/package-lock.json",
+        "--- a/package-lock.json",
+        "+++ b/package-lock.json",
+        f"@@ -1,{count} +1,{count} @@",
+        *body,
+    ]) + "\n"
+
+
+def mixed_diff(lines: int) -> str:
+    small = make_diff(lines // 2, files=max(lines // 300, 1), hunk_size=6, seed=1)
+    large = make_diff(lines // 4, files=max(lines // 1000, 1), hunk_size=120, seed=2).replace("src/", "lib/")
+    bundle = make_diff(lines // 8, files=1, hunk_size=60, seed=3).replace(
+        "src/module_0/service_0.py", "static/app.min.js")
+    # Lockfile first, as it often is alphabetically
+    return lockfile_diff(lines // 8) + small + bundle + large
+
+
+def greedy_pack(files, budget_tokens: int):
+    """The previous packer: diff order, a new chunk whenever the next hunk doesn't fit"""
+    from app.services.diff_chunker import split_hunk
+    chunks, current = [], DiffChunk()
+    for file_diff in files:
+        if file_diff.is_binary or not file_diff.hunks:
+            continue
+        header_tokens = estimate_tokens(file_diff.header)
+        target = None
+        for original in file_diff.hunks:
+            for hunk in split_hunk(original, max(budget_tokens - header_tokens, 1)):
+                hunk_tokens = estimate_tokens(hunk.text)
+                cost = hunk_tokens if target is not None else header_tokens + hunk_tokens
+                if current.files and current.tokens + cost > budget_tokens:
+                    chunks.append(current)
+                    current, target, cost = DiffChunk(), None, header_tokens + hunk_tokens
+                if target is None:
+                    target = replace(file_diff, hunks=[])
+                    current.files.append(target)
+                target.hunks.append(hunk)
+                current.tokens += cost
+    if current.files:
+        chunks.append(current)
+    return chunks
+
+
+def report(label: str, chunks, budget: int, elapsed: float):
+    sizes = [exact_tokens(chunk.text) for chunk in chunks]
+    changed = context = 0
+    for chunk in chunks:
+        for file_diff in chunk.files:
+            for hunk in file_diff.hunks:
+                for line in hunk.lines:
+                    if line[:1] in ("+", "-"):
+                        changed += 1
+                    else:
+                        context += 1
+    # How many calls it takes before every source file has been sent
+    last_source = max(index for index, chunk in enumerate(chunks, start=1)
+                      if any(file_priority(path) == PRIORITY_SOURCE for path in chunk.paths))
+    print(f"   {label:<24} {len(chunks):>4} calls  {sum(sizes) / (len(chunks) * budget):6.1%} full  "
+          f"largest {max(sizes) / budget:6.1%}  {changed / (changed + context):6.1%} changed lines  "
+          f"source done by part {last_source}  ({elapsed * 1000:.1f}ms)")
+
+
+def run(lines: int, budget: int):
+    diff = mixed_diff(lines)
+    files = list(iter_file_diffs(diff.splitlines()))
+    print(f"📊 {len(diff):,} character diff, {len(files)} files, {budget}-token budget per call "
+          f"({exact_tokens(diff):,} exact tokens)")
+
+    for label, calibrate in (("uncalibrated", False), ("calibrated", True)):
+        if calibrate:
+            # What the first PRs do: count a budget's worth of diff with the model
+            sample = calibration_sample(diff)
+            token_counter.observe(sample, exact_tokens(sample))
+            print(f"   calibrated to {token_counter.chars_per_token:.2f} chars/token")
+        for name, pack in (("previous packer", greedy_pack), ("pack_chunks", pack_chunks)):
+            start = time.perf_counter()
+            chunks = pack(files, budget)
+            report(f"{name}, {label}", chunks, budget, time.perf_counter() - start)
+
+
+def bench_counter(ops: int):
+    counter = TokenCounter(chars_per_token=4, cache_size=4096, calibration_samples=3)
+    prompt = make_diff(300, files=2)
+    counter.observe(prompt, exact_tokens(prompt))
+    for label, fn in (("estimate", counter.estimate), ("count (cached)", counter.count)):
+        start = time.perf_counter()
+        for _ in range(ops):
+            fn(prompt)
+        print(f"   {label:<15} {(time.perf_counter() - start) / ops * 1e6:6.2f}us per {len(prompt):,}-char prompt")
+    start = time.perf_counter()
+    exact_tokens(prompt)
+    print(f"   {'tokenizer':<15} {(time.perf_counter() - start) * 1e6:6.0f}us (local stand-in; the real one is a network call)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=6000)
+    parser.add_argument("--budget", type=int, default=4000)
+    parser.add_argument("--ops", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.lines, args.budget)
+    print("📊 Token counting")
+    bench_counter(args.ops)
@@ -0,0 +1,110 @@
+"""
+Benchmark the Gemini rate limiter against a quota-enforcing fake model
+
+The fake model rejects calls with a 429 once more than --rpm calls land in
+any 60s window (scaled down by --speedup so the run takes seconds). A mix of
+interactive and background callers hammer it; the report shows achieved
+throughput, how many 429s got through, and queue wait per priority.
+
+Usage:
+    python benchmarks/bench_rate_limiter.py --rpm 60 --callers 40 --speedup 20
+"""
+import argparse
+import asyncio
+import collections
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rpm", type=int, default=60, help="Quota enforced by the fake model")
+    parser.add_argument("--callers", type=int, default=40)
+    parser.add_argument("--speedup", type=float, default=20, help="Compress one minute into 60/speedup seconds")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["GEMINI_RATE_LIMIT_BACKOFF_SECONDS"] = str(2 / args.speedup)
+
+from app.core import gemini_client as gemini_module
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import RateLimitError, StubProvider
+from app.core.rate_limiter import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RateLimiter
+
+# Same quota as the fake model, on the benchmark's compressed minute
+WINDOW = 60 / args.speedup
+gemini_rate_limiter = RateLimiter(
+    requests_per_minute=args.rpm,
+    tokens_per_minute=0,
+    backoff_base=2 / args.speedup,
+    backoff_max=60 / args.speedup,
+    period=WINDOW
+)
+gemini_module.gemini_rate_limiter = gemini_rate_limiter
+
+
+class QuotaModel(StubProvider):
+    """Accepts at most `limit` calls per sliding window, like the real API"""
+
+    def __init__(self, limit: int, window: float):
+        super().__init__(latency="fixed:0.02")
+        self.limit = limit
+        self.window = window
+        self.accepted = collections.deque()
+        self.rejected = 0
+
+    def generate(self, prompt):
+        now = time.monotonic()
+        with self._lock:
+            while self.accepted and self.accepted[0] <= now - self.window:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.limit:
+                self.rejected += 1
+                raise RateLimitError("429 Resource has been exhausted (e.g. check quota).")
+            self.accepted.append(now)
+        return super().generate(prompt)
+
+    def respond(self, prompt, rng):
+        return "{}"
+
+
+async def main():
+    window = WINDOW
+    model = QuotaModel(args.rpm, window)
+    gemini_client.provider = model
+    waits = {PRIORITY_INTERACTIVE: [], PRIORITY_BACKGROUND: []}
+    failures = 0
+
+    async def caller(index: int):
+        nonlocal failures
+        priority = PRIORITY_INTERACTIVE if index % 4 == 0 else PRIORITY_BACKGROUND
+        start = time.perf_counter()
+        try:
+            await gemini_client.generate_review("prompt", priority=priority)
+        except Exception:
+            failures += 1
+        waits[priority].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller(i) for i in range(args.callers)))
+    elapsed = time.perf_counter() - start
+
+    per_minute = args.callers / elapsed * window
+    print(f"📊 {args.callers} calls against a {args.rpm} rpm quota ({window:.1f}s = one minute)")
+    print(f"   Throughput:   {per_minute:.1f} calls/minute")
+    print(f"   429s seen:    {model.rejected} (failed calls: {failures})")
+    for priority, name in ((PRIORITY_INTERACTIVE, "interactive"), (PRIORITY_BACKGROUND, "background")):
+        if waits[priority]:
+            print(f"   {name:<12}  mean latency {statistics.mean(waits[priority]):.2f}s "
+                  f"({len(waits[priority])} calls)")
+    print(f"   Limiter:      {gemini_rate_limiter.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+Benchmark review history listings: OFFSET + full rows vs keyset + summary columns
+
+Seeds a throwaway SQLite database with reviews (each carrying code and a
+list of issues, like real ones), then times fetching a page of 50 at
+increasing depths both ways, at two table sizes. Keyset pages should cost
+the same at any depth and any table size, and so should a filter matching
+only 1% of reviews (review_type=security).
+
+Usage:
+    python benchmarks/bench_review_history.py --rows 20000 200000 --runs 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_dir = tempfile.mkdtemp(prefix="brocode-bench-")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ["DATABASE_ENABLED"] = "True"
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/reviews.db"
+
+from sqlalchemy import func, insert, select
+
+from app.core import database
+from app.models.review import Review
+from app.services.review_history import encode_cursor, list_reviews
+from app.services.review_store import review_row
+
+PAGE = 50
+CODE = "function handler(req, res) {\n  return res.json(req.body);\n}\n" * 20
+SEVERITIES = ["high", "medium", "low", "low"]
+
+
+def fake_review(i: int) -> dict:
+    issues = [
+        {
+            "type": "bug", "severity": random.choice(SEVERITIES), "line": n, "title": f"Issue {n}",
+            "description": "Explains what goes wrong and when " * 4, "suggestion": "Do it differently " * 4,
+        }
+        for n in range(random.randint(0, 12))
+    ]
+    row = review_row(
+        {"issues": issues, "summary": f"Review {i}", "positive_aspects": ["Readable"],
+         "metadata": {"model": "fake", "filename": f"src/file_{i}.js", "review_type": "security" if i % 100 == 0 else "general"}},
+        CODE, source="analyze"
+    )
+    row.pop("repository")
+    return row
+
+
+async def seed(total: int):
+    async with database.SessionLocal() as session:
+        have = (await session.execute(select(func.count()).select_from(Review))).scalar_one()
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for first in range(have, total, 5000):
+            rows = [fake_review(i) for i in range(first, min(first + 5000, total))]
+            for offset, row in enumerate(rows):
+                row["created_at"] = start + timedelta(seconds=first + offset)
+            await session.execute(insert(Review), rows)
+            await session.commit()
+
+
+async def median_ms(fn, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def bench(total: int, depths, runs: int):
+    await seed(total)
+    print(f"📊 {total:,} reviews, page of {PAGE}, median of {runs} runs")
+    print(f"   {'page':>6} {'OFFSET + full rows':>20} {'keyset + summary':>18}")
+    async with database.SessionLocal() as session:
+        for depth in depths:
+            offset = depth * PAGE
+            if offset >= total:
+                continue
+
+            async def by_offset():
+                query = select(Review).order_by(Review.created_at.desc(), Review.id.desc()).offset(offset).limit(PAGE)
+                (await session.execute(query)).scalars().all()
+                session.expunge_all()
+
+            # The cursor a client would hold after paging down to this depth
+            cursor = None
+            if offset:
+                row = (await session.execute(
+                    select(Review.created_at, Review.id)
+                    .order_by(Review.created_at.desc(), Review.id.desc()).offset(offset - 1).limit(1)
+                )).one()
+                cursor = encode_cursor(row.created_at, row.id)
+
+            async def by_cursor():
+                await list_reviews(session, limit=PAGE, cursor=cursor)
+
+            print(f"   {depth + 1:>6} {await median_ms(by_offset, runs):>18.2f}ms {await median_ms(by_cursor, runs):>16.2f}ms")
+
+        async def high_only():
+            await list_reviews(session, limit=PAGE, severity="high")
+
+        async def rare_type():
+            await list_reviews(session, limit=PAGE, review_type="security")
+
+        print(f"   severity=high, first page: {await median_ms(high_only, runs):.2f}ms")
+        print(f"   review_type=security (1% of reviews), first page: {await median_ms(rare_type, runs):.2f}ms")
+
+
+async def main(sizes, runs: int):
+    await database.init_db()
+    for total in sorted(sizes):
+        await bench(total, [0, 10, 100, 1000, 3000], runs)
+    await database.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000, 200000])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    random.seed(0)
+    asyncio.run(main(args.rows, args.runs))
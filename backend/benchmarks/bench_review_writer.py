@@ -0,0 +1,132 @@
+"""
+Benchmark storing reviews: one insert per review vs the batched writer
+
+Uses a throwaway SQLite database. First compares the cost of writing N
+review rows one transaction at a time against queueing them on the
+buffered writer. Then checks /api/review/analyze latency with storage off
+and on, using a model that answers instantly so any write cost would show.
+
+Usage:
+    python benchmarks/bench_review_writer.py --reviews 500 --requests 200 --rounds 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_dir = tempfile.mkdtemp(prefix="brocode-bench-")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("TOKENS_PER_MINUTE", "0")
+os.environ["DATABASE_ENABLED"] = "True"
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/reviews.db"
+os.environ["REVIEW_CACHE_ENABLED"] = "False"
+os.environ["JOB_WORKERS"] = "0"
+
+import httpx
+from sqlalchemy import func, select
+
+from app.main import app
+from app.core import database
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import StubProvider
+from app.models.review import Review
+from app.services.review_store import record_review, review_row, review_writer
+
+REVIEW = {
+    "issues": [{"type": "bug", "severity": "low", "line": 1, "title": "t", "description": "d", "suggestion": "s"}],
+    "summary": "Fine",
+    "positive_aspects": [],
+    "metadata": {"model": "fake", "filename": "a.js", "review_type": "general", "degraded": False},
+}
+
+
+class InstantModel(StubProvider):
+    def respond(self, prompt, rng):
+        return json.dumps({k: v for k, v in REVIEW.items() if k != "metadata"})
+
+
+async def count_rows() -> int:
+    async with database.SessionLocal() as session:
+        return (await session.execute(select(func.count()).select_from(Review))).scalar_one()
+
+
+async def bench_writes(reviews: int):
+    # One transaction per review, awaited by the caller
+    start = time.perf_counter()
+    for i in range(reviews):
+        await review_writer._write([review_row(REVIEW, f"code {i}", source="analyze")])
+    single = time.perf_counter() - start
+
+    before = await count_rows()
+    batches = review_writer.stats()["batches"]
+    start = time.perf_counter()
+    for i in range(reviews):
+        record_review(REVIEW, f"code {i}", source="analyze")
+    queued = time.perf_counter() - start
+    while await count_rows() < before + reviews:
+        await asyncio.sleep(0.01)
+    flushed = time.perf_counter() - start
+
+    print(f"📊 Storing {reviews} reviews in SQLite")
+    print(f"   One transaction each:  {single * 1000:8.1f}ms total, {single / reviews * 1e6:7.0f}us per review")
+    print(f"   Batched writer:        {queued * 1000:8.1f}ms to queue ({queued / reviews * 1e6:.0f}us per review), "
+          f"on disk after {flushed * 1000:.0f}ms in {review_writer.stats()['batches'] - batches} batch(es)")
+
+
+async def bench_requests(requests: int, rounds: int):
+    gemini_client.provider = InstantModel()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        async def timed(i: int) -> float:
+            start = time.perf_counter()
+            response = await client.post("/api/review/analyze", json={
+                "code": f"const x = {i};", "filename": f"f{i}.js", "review_type": "general"
+            })
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        async def run() -> list:
+            return sorted(await asyncio.gather(*(timed(i) for i in range(requests))))
+
+        # Alternate rounds so warm-up doesn't favour either side
+        off, on = [], []
+        for _ in range(rounds):
+            review_writer.record = lambda row: False  # storage off
+            off += await run()
+            del review_writer.record
+            on += await run()
+        off.sort()
+        on.sort()
+
+    def describe(timings):
+        return (f"p50 {statistics.median(timings) * 1000:6.2f}ms  "
+                f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:6.2f}ms")
+
+    print(f"📊 {requests} concurrent /analyze requests x {rounds} rounds, instant model")
+    print(f"   storage off: {describe(off)}")
+    print(f"   storage on:  {describe(on)}")
+
+
+async def main(reviews: int, requests: int, rounds: int):
+    await database.init_db()
+    await review_writer.start()
+    await bench_writes(reviews)
+    await bench_requests(requests, rounds)
+    await review_writer.stop()
+    print(f"   Rows stored: {await count_rows()} ({review_writer.stats()})")
+    await database.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reviews", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.reviews, args.requests, args.rounds))
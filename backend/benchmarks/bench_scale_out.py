@@ -0,0 +1,163 @@
+"""
+Benchmark scaling reviews out over worker processes
+
+Starts 1, 2, 4... `python -m app.worker` processes sharing one job queue and
+the sqlite shared state, against the stub GitHub server and the stub model,
+and queues one review per PR the way webhooks do. A share of the PRs get a
+second push while their first review is running, which supersedes it. Reports
+reviews/sec per process count and how many PRs got more than one review
+(there should be none: superseded reviews stop before posting, and the PR
+lock keeps the new review waiting until they have). Each process still
+parses diffs and builds prompts on its own CPU, so scaling past the machine's
+cores relies on the model latency dominating (raise --latency to see it).
+
+With --kill, one extra run SIGKILLs a worker process mid-run: its jobs'
+leases lapse (JOB_LEASE_SECONDS) and the other processes finish them.
+
+Usage:
+    python benchmarks/bench_scale_out.py --prs 48 --processes 1,2,4 --latency fixed:0.3
+    python benchmarks/bench_scale_out.py --kill
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND)
+os.environ.setdefault("LLM_PROVIDER", "stub")
+os.environ["LOG_LEVEL"] = "WARNING"
+
+from app.services.job_queue import QUEUED, RUNNING, JobQueue
+from benchmarks.stub_github import create_app, serve
+from benchmarks.synthetic_diff import make_diff
+
+# Lease short enough for the --kill run to recover within the benchmark
+LEASE_SECONDS = 3
+
+
+def worker_env(base_url: str, workdir: str, args) -> dict:
+    return {
+        **os.environ,
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY": args.latency,
+        "REQUESTS_PER_MINUTE": "0",
+        "TOKENS_PER_MINUTE": "0",
+        "REVIEW_CACHE_ENABLED": "False",
+        "GITHUB_API_URL": base_url,
+        "GITHUB_TOKEN": "benchmark",
+        "JOB_QUEUE_PATH": os.path.join(workdir, "jobs.db"),
+        "JOB_WORKERS": str(args.jobs_per_process),
+        "JOB_POLL_INTERVAL_SECONDS": "0.05",
+        "JOB_LEASE_SECONDS": str(LEASE_SECONDS),
+        "SHARED_STATE_BACKEND": "sqlite",
+        "SHARED_STATE_PATH": os.path.join(workdir, "state.db"),
+        "SHARED_STATE_HEARTBEAT_SECONDS": "0.5",
+        "LOG_LEVEL": "ERROR",
+    }
+
+
+def live_processes(state_path: str) -> int:
+    """Processes with a current heartbeat, read without joining the group"""
+    if not os.path.exists(state_path):
+        return 0
+    with sqlite3.connect(state_path, timeout=30) as conn:
+        try:
+            return conn.execute(
+                "SELECT COUNT(*) FROM shared_state WHERE key LIKE 'heartbeat:processes:%' AND expires_at > ?",
+                (time.time(),)
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            return 0
+
+
+async def enqueue(queue: JobQueue, number: int):
+    repo = f"octo/repo-{number}"
+    await queue.enqueue("pr_review", repo, {
+        "owner": "octo", "repo": f"repo-{number}", "pr_number": number,
+        "pr_title": f"Scale-out PR {number}", "head_sha": f"{number:040d}",
+    }, dedupe_key=f"{repo}#{number}")
+
+
+async def run_jobs(queue: JobQueue, prs: int, repushed: int, kill) -> float:
+    start = time.perf_counter()
+    for number in range(1, prs + 1):
+        await enqueue(queue, number)
+    await asyncio.sleep(0.5)
+    # New pushes to PRs whose reviews are likely running by now
+    for number in range(1, repushed + 1):
+        await enqueue(queue, number)
+    if kill is not None:
+        kill()
+    while True:
+        counts = await queue.stats()
+        if counts[QUEUED] + counts[RUNNING] == 0:
+            return time.perf_counter() - start
+        await asyncio.sleep(0.05)
+
+
+def scenario(processes: int, diff: str, args, kill: bool = False) -> tuple:
+    stub = create_app(diff=diff)
+    workdir = tempfile.mkdtemp(prefix="brocode-scale-")
+    with serve(stub) as base_url:
+        env = worker_env(base_url, workdir, args)
+        workers = [
+            subprocess.Popen([sys.executable, "-m", "app.worker"], cwd=BACKEND, env=env,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for _ in range(processes)
+        ]
+        try:
+            # Wait until every process is up, so start-up time isn't counted
+            while live_processes(env["SHARED_STATE_PATH"]) < processes:
+                time.sleep(0.1)
+            queue = JobQueue(env["JOB_QUEUE_PATH"])
+            victim = (lambda: workers[0].send_signal(signal.SIGKILL)) if kill else None
+            elapsed = asyncio.run(run_jobs(queue, args.prs, args.prs // 4, victim))
+            queue.close()
+        finally:
+            for worker in workers:
+                if worker.poll() is None:
+                    worker.send_signal(signal.SIGTERM)
+            for worker in workers:
+                worker.wait()
+    posted = Counter(review["pr_number"] for review in stub.state.reviews)
+    posted.update(comment["pr_number"] for comment in stub.state.comments)
+    duplicates = sum(1 for count in posted.values() if count > 1)
+    missing = args.prs - len(posted)
+    return elapsed, duplicates, missing
+
+
+def run(args):
+    diff = make_diff(args.lines, files=max(args.lines // 100, 1), seed=3)
+    levels = [int(level) for level in args.processes.split(",")]
+    print(f"📊 {args.prs} PRs ({args.prs // 4} pushed again mid-review), {args.jobs_per_process} jobs per "
+          f"process, stub latency {args.latency}, sqlite shared state")
+    baseline = None
+    for processes in levels:
+        elapsed, duplicates, missing = scenario(processes, diff, args)
+        rate = args.prs / elapsed
+        baseline = baseline or rate / processes
+        print(f"   {processes} process(es)  {elapsed:6.2f}s  {rate:6.2f} reviews/s  "
+              f"({rate / baseline:4.1f}x of one)  duplicates {duplicates}  missing {missing}")
+    if args.kill:
+        processes = max(levels[-1], 2)
+        elapsed, duplicates, missing = scenario(processes, diff, args, kill=True)
+        print(f"   {processes} process(es), one killed mid-run  {elapsed:6.2f}s  "
+              f"duplicates {duplicates}  missing {missing}  (lease {LEASE_SECONDS}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prs", type=int, default=48)
+    parser.add_argument("--processes", default="1,2,4")
+    parser.add_argument("--jobs-per-process", type=int, default=2)
+    parser.add_argument("--lines", type=int, default=300, help="Changed lines per PR")
+    parser.add_argument("--latency", default="fixed:0.3", help="Stub model latency")
+    parser.add_argument("--kill", action="store_true", help="Also kill a worker process mid-run")
+    run(parser.parse_args())
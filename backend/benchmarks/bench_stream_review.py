@@ -0,0 +1,104 @@
+"""
+Benchmark time-to-first-issue: /api/review/analyze vs /analyze/stream
+
+Serves the app on a local port with a fake model that writes its review a
+few characters at a time over a fixed generation time, then measures when
+the client first sees an issue on each endpoint.
+
+Usage:
+    python benchmarks/bench_stream_review.py --issues 8 --latency 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+os.environ["REVIEW_CACHE_ENABLED"] = "False"
+os.environ["JOB_WORKERS"] = "0"
+
+import httpx
+
+from app.main import app
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import StubProvider
+from benchmarks.stub_github import serve
+
+CHUNK_CHARS = 40
+
+
+def make_review(issue_count: int) -> str:
+    issues = [{
+        "type": "bug",
+        "severity": "medium",
+        "line": i + 1,
+        "title": f"Issue {i}",
+        "description": "Something on this line can fail at runtime under some inputs.",
+        "suggestion": "Guard the value before using it.",
+        "code_snippet": None
+    } for i in range(issue_count)]
+    return json.dumps({"issues": issues, "summary": "Needs work", "positive_aspects": []}, indent=2)
+
+
+class StreamingModel(StubProvider):
+    """Produces a fixed review at a steady rate, taking `latency` seconds in all"""
+
+    def __init__(self, text: str, latency: float):
+        super().__init__(tokens_per_second=len(text) / 4 / latency, chunk_chars=CHUNK_CHARS)
+        self.review = text
+
+    def respond(self, prompt, rng):
+        return self.review
+
+
+REQUEST = {"code": "const total = items.reduce((a, b) => a + b);", "filename": "cart.js", "review_type": "general"}
+
+
+def time_blocking(client: httpx.Client) -> float:
+    start = time.perf_counter()
+    response = client.post("/api/review/analyze", json=REQUEST)
+    response.raise_for_status()
+    assert response.json()["issues"]
+    return time.perf_counter() - start
+
+
+def time_streaming(client: httpx.Client):
+    start = time.perf_counter()
+    first_issue = None
+    issues = 0
+    event = None
+    with client.stream("POST", "/api/review/analyze/stream", json=REQUEST) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == "issue":
+                issues += 1
+                if first_issue is None:
+                    first_issue = time.perf_counter() - start
+            elif line.startswith("data: ") and event == "error":
+                raise RuntimeError(line)
+    return first_issue, time.perf_counter() - start, issues
+
+
+def run(issue_count: int, latency: float):
+    gemini_client.provider = StreamingModel(make_review(issue_count), latency)
+    with serve(app) as base_url, httpx.Client(base_url=base_url, timeout=None) as client:
+        blocking = time_blocking(client)
+        first_issue, total, streamed = time_streaming(client)
+
+    print(f"📊 {issue_count} issues, {latency:.1f}s generation time")
+    print(f"   /analyze         first issue after {blocking:.2f}s")
+    print(f"   /analyze/stream  first issue after {first_issue:.2f}s "
+          f"({streamed} issues streamed, done after {total:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--issues", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=8.0)
+    args = parser.parse_args()
+    run(args.issues, args.latency)
@@ -0,0 +1,121 @@
+"""
+Benchmark span overhead, and trace one PR review end to end
+
+Times opening and closing a span with export off and on. Then runs the API
+with an in-process worker against the stub GitHub server and a fake model,
+delivers a pull_request webhook, waits for the queued review to post its
+comment, and prints the exported trace: one tree from the webhook through
+the job, diff fetch, model calls and comment post.
+
+Usage:
+    python benchmarks/bench_tracing.py --spans 100000 --lines 1500 --latency 0.3
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix="brocode-bench-")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("TOKENS_PER_MINUTE", "0")
+os.environ["REVIEW_CACHE_ENABLED"] = "False"
+os.environ["JOB_QUEUE_PATH"] = os.path.join(_tmp, "jobs.db")
+os.environ["JOB_WORKERS"] = "1"
+os.environ["JOB_POLL_INTERVAL_SECONDS"] = "0.05"
+os.environ["PR_REVIEW_DEBOUNCE_SECONDS"] = "0"
+os.environ["GITHUB_WEBHOOK_SECRET"] = ""
+os.environ["TRACE_EXPORT_PATH"] = os.path.join(_tmp, "traces.jsonl")
+
+import httpx
+
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import StubProvider
+from app.core.tracing import Tracer, tracer
+from app.main import app
+from app.services.github_service import github_service
+from benchmarks.stub_github import create_app, serve
+from benchmarks.synthetic_diff import make_diff
+
+
+def bench_spans(count: int):
+    print(f"📊 Cost per span, {count:,} spans")
+    for label, path in (("export off", ""), ("export on", os.path.join(_tmp, "overhead.jsonl"))):
+        local = Tracer(path=path, service_name="bench", batch_size=256, flush_interval=5)
+        start = time.perf_counter()
+        for i in range(count):
+            with local.span("outer", i=i):
+                with local.span("inner") as span:
+                    span.set_attribute("tokens.in", 100)
+        local.flush()
+        print(f"   {label:<11} {(time.perf_counter() - start) / (count * 2) * 1e6:6.2f}us")
+
+
+def read_spans(path: str) -> list:
+    spans = []
+    with open(path) as f:
+        for line in f:
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    spans.extend(scope["spans"])
+    return spans
+
+
+def print_tree(spans: list):
+    by_parent = {}
+    for span in spans:
+        by_parent.setdefault(span.get("parentSpanId"), []).append(span)
+
+    def show(span, depth):
+        duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+        attributes = {a["key"]: next(iter(a["value"].values())) for a in span["attributes"]}
+        shown = ", ".join(f"{k}={v}" for k, v in attributes.items()
+                          if k.startswith(("diff.", "tokens.", "pr.", "job.", "http.status")))
+        print(f"   {'  ' * depth}{span['name']:<{34 - 2 * depth}} {duration:9.1f}ms  {shown}")
+        for child in sorted(by_parent.get(span["spanId"], []), key=lambda s: int(s["startTimeUnixNano"])):
+            show(child, depth + 1)
+
+    for root in by_parent.get(None, []):
+        show(root, 0)
+
+
+def run(lines: int, latency: float):
+    gemini_client.provider = StubProvider(latency=f"fixed:{latency}", issues=0)
+    stub = create_app(diff=make_diff(lines, files=max(lines // 250, 1)))
+    webhook = {
+        "action": "opened",
+        "number": 7,
+        "pull_request": {"number": 7, "title": "Traced PR", "head": {"sha": "a" * 40}},
+        "repository": {"full_name": "octo/repo"},
+    }
+
+    with serve(stub) as github_url:
+        github_service.base_url = github_url
+        with serve(app) as base_url, httpx.Client(base_url=base_url, timeout=None) as client:
+            start = time.perf_counter()
+            client.post("/api/webhooks/github", json=webhook, headers={
+                "X-GitHub-Event": "pull_request", "X-GitHub-Delivery": "bench-1"
+            }).raise_for_status()
+            while not (stub.state.comments or stub.state.reviews):
+                time.sleep(0.05)
+            elapsed = time.perf_counter() - start
+        # Leaving serve(app) ran the shutdown hook, which flushed the exporter
+
+    spans = read_spans(tracer.path)
+    traces = {span["traceId"] for span in spans}
+    print(f"📊 Webhook to posted comment: {elapsed:.2f}s, {len(spans)} spans, "
+          f"{'one trace' if len(traces) == 1 else f'{len(traces)} traces'}")
+    print_tree(spans)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--spans", type=int, default=100000)
+    parser.add_argument("--lines", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+    bench_spans(args.spans)
+    run(args.lines, args.latency)
@@ -0,0 +1,92 @@
+"""
+Load test for /api/review/analyze
+
+Fires concurrent review requests at the app in-process and checks that the
+Gemini calls overlap instead of running one after another. The real model is
+swapped for a fake one that blocks for a fixed time, so no API key or network
+is needed.
+
+Usage:
+    python benchmarks/load_test_analyze.py --requests 8 --latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "load-test")
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+
+import httpx
+
+from app.main import app
+from app.core.gemini_client import gemini_client
+from app.core.llm_provider import StubProvider
+
+FAKE_REVIEW = json.dumps({
+    "issues": [],
+    "summary": "Looks fine",
+    "positive_aspects": []
+})
+
+
+class BlockingModel(StubProvider):
+    """Stands in for the Gemini model with a blocking call of fixed length"""
+
+    def __init__(self, latency: float):
+        super().__init__(latency=f"fixed:{latency}")
+
+    def respond(self, prompt, rng):
+        return FAKE_REVIEW
+
+
+async def run(num_requests: int, latency: float):
+    gemini_client.provider = BlockingModel(latency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        async def analyze(i: int):
+            response = await client.post("/api/review/analyze", json={
+                "code": f"const x{i} = {i};",
+                "filename": f"file{i}.js",
+                "review_type": "general"
+            })
+            response.raise_for_status()
+
+        async def health():
+            start = time.perf_counter()
+            response = await client.get("/api/health")
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        reviews = asyncio.gather(*(analyze(i) for i in range(num_requests)))
+        # Give the reviews a head start so the health check lands mid-flight
+        await asyncio.sleep(latency / 4)
+        health_latency = await health()
+        await reviews
+        elapsed = time.perf_counter() - start
+
+    sequential = num_requests * latency
+    print(f"📊 {num_requests} requests, {latency:.2f}s model latency, "
+          f"{gemini_client._executor._max_workers} worker threads")
+    print(f"   Wall time:          {elapsed:.2f}s (sequential would be {sequential:.2f}s)")
+    print(f"   Speedup:            {sequential / elapsed:.1f}x")
+    print(f"   /api/health during: {health_latency * 1000:.1f}ms")
+
+    if elapsed >= sequential * 0.9:
+        print("❌ Requests ran one after another")
+        return 1
+    print("✅ Requests overlapped")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.requests, args.latency)))
@@ -0,0 +1,230 @@
+"""
+Load test webhook ingestion
+
+Fires a realistic mix of signed GitHub deliveries at /api/webhooks/github:
+events the endpoint ignores (check_run, workflow_job, issue_comment),
+pull_request actions it ignores (labeled, edited), pushes, redeliveries of
+earlier deliveries, and opened/synchronize events that queue a review.
+Payloads are padded to GitHub-like sizes. Reports deliveries/sec and
+latency percentiles per kind, first through the ASGI app in-process
+(the handler's own capacity), then over HTTP with concurrent connections.
+
+Usage:
+    python benchmarks/load_test_webhooks.py --deliveries 5000 --concurrency 32
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp(prefix="brocode-bench-")
+SECRET = "benchmark-secret"
+os.environ["LLM_PROVIDER"] = "stub"
+os.environ["GITHUB_WEBHOOK_SECRET"] = SECRET
+os.environ["JOB_QUEUE_PATH"] = os.path.join(_tmp, "jobs.db")
+os.environ["JOB_WORKERS"] = "0"
+os.environ["PR_REVIEW_DEBOUNCE_SECONDS"] = "0"
+os.environ["LOG_LEVEL"] = "WARNING"
+
+from app.main import app
+from app.services.job_queue import job_queue
+from benchmarks.stub_github import serve
+
+# Share of each kind of delivery in the mix
+MIX = {
+    "ignored_event": 0.45,
+    "ignored_action": 0.20,
+    "push": 0.10,
+    "redelivery": 0.10,
+    "review": 0.15,
+}
+
+
+def _user(rng: random.Random) -> dict:
+    login = f"user{rng.randint(1, 99999)}"
+    return {"login": login, "id": rng.randint(1, 10 ** 8), "avatar_url": f"https://avatars.example/{login}",
+            "html_url": f"https://github.com/{login}", "type": "User", "site_admin": False}
+
+
+def _repository(number: int) -> dict:
+    return {"id": number, "name": f"repo-{number % 50}", "full_name": f"octo/repo-{number % 50}",
+            "private": False, "description": "x" * 200, "default_branch": "main",
+            "topics": ["python", "fastapi", "review"] * 5}
+
+
+def pull_request(number: int, action: str, rng: random.Random) -> dict:
+    """A pull_request payload of about 20KB, "action" first like GitHub's"""
+    return {
+        "action": action,
+        "number": number,
+        "pull_request": {
+            "number": number, "title": f"Change {number}", "body": "Description. " * 600,
+            "user": _user(rng), "head": {"sha": f"{number:040x}", "ref": f"feature-{number}"},
+            "base": {"sha": "0" * 40, "ref": "main"},
+            "labels": [{"name": f"label-{i}", "color": "ededed"} for i in range(10)],
+            "requested_reviewers": [_user(rng) for _ in range(5)],
+        },
+        "repository": _repository(number),
+        "sender": _user(rng),
+    }
+
+
+def payload_for(kind: str, index: int, rng: random.Random) -> tuple:
+    """(event, payload) for one delivery of a kind"""
+    if kind == "ignored_event":
+        event = rng.choice(["check_run", "workflow_job", "issue_comment"])
+        return event, {"action": "completed", "check_run": {"output": {"text": "log line\n" * 2000}},
+                       "repository": _repository(index), "sender": _user(rng)}
+    if kind == "ignored_action":
+        return "pull_request", pull_request(index, rng.choice(["labeled", "edited", "assigned"]), rng)
+    if kind == "push":
+        commits = [{"id": f"{rng.getrandbits(160):040x}", "message": "Commit message. " * 20,
+                    "author": _user(rng), "added": [f"src/file_{i}.py" for i in range(10)]}
+                   for _ in range(20)]
+        return "push", {"ref": "refs/heads/main", "commits": commits, "repository": _repository(index),
+                        "sender": _user(rng)}
+    return "pull_request", pull_request(index, rng.choice(["opened", "synchronize"]), rng)
+
+
+def build_deliveries(count: int, seed: int = 0) -> list:
+    """Signed (kind, headers, body) deliveries in a shuffled mix"""
+    rng = random.Random(seed)
+    kinds = [kind for kind, share in MIX.items() for _ in range(int(count * share))]
+    rng.shuffle(kinds)
+    deliveries = []
+    for index, kind in enumerate(kinds):
+        if kind == "redelivery" and deliveries:
+            _, headers, body = rng.choice(deliveries)
+            deliveries.append((kind, headers, body))
+            continue
+        event, payload = payload_for("review" if kind == "redelivery" else kind, index, rng)
+        body = json.dumps(payload).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "X-GitHub-Event": event,
+            "X-GitHub-Delivery": f"delivery-{seed}-{index}",
+            "X-Hub-Signature-256": "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest(),
+        }
+        deliveries.append((kind, headers, body))
+    return deliveries
+
+
+async def fire(post, deliveries: list, concurrency: int) -> tuple:
+    """Send every delivery with `concurrency` in flight; returns (elapsed, latencies by kind)"""
+    pending = iter(deliveries)
+    latencies = {kind: [] for kind in MIX}
+
+    async def sender(send):
+        for kind, headers, body in pending:
+            start = time.perf_counter()
+            status = await send(headers, body)
+            latencies[kind].append(time.perf_counter() - start)
+            if status >= 300:
+                raise RuntimeError(f"{kind} delivery answered {status}")
+
+    senders = [await post() for _ in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(sender(send) for send in senders))
+    return time.perf_counter() - start, latencies
+
+
+def asgi_client():
+    """Calls the app directly, so only the app's own work is timed"""
+    async def connect():
+        async def send(headers: dict, body: bytes) -> int:
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+                "scheme": "http", "path": "/api/webhooks/github", "raw_path": b"/api/webhooks/github",
+                "root_path": "", "query_string": b"", "server": ("brocode", 80), "client": ("127.0.0.1", 1),
+                "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+                + [(b"content-length", str(len(body)).encode())],
+            }
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+            status = []
+
+            async def receive():
+                return messages.pop() if messages else {"type": "http.disconnect"}
+
+            async def respond(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            await app(scope, receive, respond)
+            return status[0]
+        return send
+    return connect
+
+
+def http_client(host: str, port: int):
+    """
+    A bare keep-alive HTTP/1.1 connection per sender; a full client library
+    costs more CPU per request than the endpoint does
+    """
+    async def connect():
+        reader, writer = await asyncio.open_connection(host, port)
+
+        async def send(headers: dict, body: bytes) -> int:
+            head = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+            writer.write(
+                f"POST /api/webhooks/github HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n"
+                f"{head}\r\n".encode() + body
+            )
+            response_head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in response_head.split(b"\r\n")[1:]:
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            return int(response_head.split(b" ", 2)[1])
+        return send
+    return connect
+
+
+def report(label: str, count: int, elapsed: float, latencies: dict):
+    print(f"   {label:<10} {count / elapsed:8,.0f} deliveries/s  ({count} in {elapsed:.2f}s)")
+    for kind, values in latencies.items():
+        if values:
+            ordered = sorted(values)
+            p99 = ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)]
+            print(f"      {kind:<15} p50 {statistics.median(values) * 1000:7.2f}ms  p99 {p99 * 1000:7.2f}ms")
+
+
+async def in_process(deliveries: list, concurrency: int):
+    elapsed, latencies = await fire(asgi_client(), deliveries, concurrency)
+    report("in-process", len(deliveries), elapsed, latencies)
+
+
+async def over_http(base_url: str, deliveries: list, concurrency: int):
+    host, port = base_url.rsplit("//", 1)[1].split(":")
+    elapsed, latencies = await fire(http_client(host, int(port)), deliveries, concurrency)
+    report("HTTP", len(deliveries), elapsed, latencies)
+
+
+def run(count: int, concurrency: int):
+    deliveries = build_deliveries(count)
+    size = sum(len(body) for _, _, body in deliveries) / len(deliveries)
+    print(f"📊 {len(deliveries)} signed deliveries, {size / 1024:.0f}KB average, {concurrency} in flight")
+    with serve(app) as base_url:
+        # The served app owns startup (job queue, tracer); in-process requests reuse it
+        asyncio.run(in_process(build_deliveries(count, seed=1), concurrency))
+        asyncio.run(over_http(base_url, deliveries, concurrency))
+        counts = asyncio.run(job_queue.stats())
+    reviews = sum(kind == "review" for kind, _, _ in deliveries) * 2
+    print(f"   Jobs written: {sum(counts.values())} for {reviews} review deliveries "
+          f"(plus {sum(kind == 'redelivery' for kind, _, _ in deliveries) * 2} redeliveries of random earlier ones)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--deliveries", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    run(args.deliveries, args.concurrency)
@@ -0,0 +1,285 @@
+"""
+Benchmark suite for the review pipeline, with machine-readable results
+
+Runs fully offline: the stub GitHub server stands in for api.github.com and
+the stub model (LLM_PROVIDER=stub) for Gemini. Over a synthetic corpus of
+small, medium and large (10k-line) PR diffs it measures
+
+* webhook ack latency: pull_request webhook to 2xx, through the real app
+* diff parse time and prompt build time (chunk packing plus prompt text)
+* peak Python memory and wall time of one full PR review per diff size
+* reviews/sec with several PR reviews in flight at once
+
+and writes them as JSON. Given a baseline from an earlier run, it compares
+every metric and exits non-zero if any got worse by more than --tolerance,
+so a regression in the hot path fails CI. Only compare runs from the same
+machine, and on shared runners raise --tolerance to what reruns of an
+unchanged tree show.
+
+Usage:
+    python benchmarks/run_suite.py --output bench.json
+    python benchmarks/run_suite.py --baseline bench-main.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown per metric")
+    parser.add_argument("--concurrency", default="1,4,16", help="PR reviews in flight for reviews/sec")
+    parser.add_argument("--prs", type=int, default=16, help="PR reviews per concurrency level")
+    parser.add_argument("--webhooks", type=int, default=200)
+    parser.add_argument("--latency", default="fixed:0.05", help="Stub model latency, see LLM_STUB_LATENCY")
+    parser.add_argument("--runs", type=int, default=20, help="Repetitions for parse and prompt timings")
+    return parser.parse_args()
+
+
+args = parse_args()
+_tmp = tempfile.mkdtemp(prefix="brocode-bench-")
+os.environ["LLM_PROVIDER"] = "stub"
+os.environ["LLM_STUB_LATENCY"] = args.latency
+os.environ.setdefault("REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("TOKENS_PER_MINUTE", "0")
+os.environ["REVIEW_CACHE_ENABLED"] = "False"
+os.environ["JOB_QUEUE_PATH"] = os.path.join(_tmp, "jobs.db")
+os.environ["JOB_WORKERS"] = "0"
+os.environ["PR_REVIEW_DEBOUNCE_SECONDS"] = "0"
+os.environ["GITHUB_WEBHOOK_SECRET"] = ""
+os.environ["LOG_LEVEL"] = "WARNING"
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.services.diff_chunker import pack_chunks
+from app.services.diff_parser import iter_file_diffs
+from app.services.github_service import github_service
+from app.services.pr_review_service import PR_CHUNK_PROMPT, _diff_budget, review_pull_request
+from app.services.static_analysis import static_analyzer
+from benchmarks.stub_github import create_app, serve
+from benchmarks.synthetic_diff import make_diff
+
+# Changed lines and files per corpus diff
+CORPUS = {
+    "small": (60, 2),
+    "medium": (1000, 10),
+    "large": (10000, 40),
+}
+TITLE = "Benchmark PR"
+
+
+def corpus() -> dict:
+    return {name: make_diff(lines, files=files, seed=7) for name, (lines, files) in CORPUS.items()}
+
+
+def metric(value: float, unit: str, better: str = "lower") -> dict:
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def best_ms(fn, runs: int) -> float:
+    """Fastest of several runs: noise only ever adds time, so the minimum is the stable figure"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def webhook_ack(count: int) -> dict:
+    """Latency of the webhook endpoint: verify, parse, enqueue, respond"""
+    acks = []
+    with serve(app) as base_url, httpx.Client(base_url=base_url) as client:
+        for number in range(1, count + 1):
+            webhook = {
+                "action": "opened",
+                "number": number,
+                "pull_request": {"number": number, "title": TITLE, "head": {"sha": f"{number:040d}"}},
+                "repository": {"full_name": "octo/repo"},
+            }
+            start = time.perf_counter()
+            client.post("/api/webhooks/github", json=webhook, headers={
+                "X-GitHub-Event": "pull_request", "X-GitHub-Delivery": f"suite-{number}"
+            }).raise_for_status()
+            acks.append((time.perf_counter() - start) * 1000)
+    return {
+        "webhook_ack_ms.p50": metric(statistics.median(acks), "ms"),
+        "webhook_ack_ms.p95": metric(percentile(acks, 0.95), "ms"),
+    }
+
+
+def hot_path(diffs: dict, runs: int) -> dict:
+    """Diff parsing and prompt building, the CPU work of every PR review"""
+    results = {}
+    budget = _diff_budget(TITLE)
+    for name, diff in diffs.items():
+        files = list(iter_file_diffs(diff.splitlines()))
+
+        def build_prompts():
+            chunks = pack_chunks(files, budget)
+            for part, chunk in enumerate(chunks, start=1):
+                PR_CHUNK_PROMPT.format(part=part, total=len(chunks), title=TITLE, diff=chunk.text)
+
+        results[f"diff_parse_ms.{name}"] = metric(
+            best_ms(lambda: list(iter_file_diffs(diff.splitlines())), runs), "ms"
+        )
+        results[f"prompt_build_ms.{name}"] = metric(best_ms(build_prompts, runs), "ms")
+    return results
+
+
+async def full_reviews(diffs: dict, concurrency_levels: list, prs: int) -> dict:
+    """One whole PR review per diff size, then reviews/sec at each concurrency level"""
+    results = {}
+    await static_analyzer.start()
+    # Warm up first: the first review calibrates the token estimator and opens connections
+    with serve(create_app(diff=diffs["small"])) as base_url:
+        github_service.base_url = base_url
+        await github_service.start()
+        await review_pull_request("octo", "warmup", 1, TITLE)
+        await github_service.close()
+    for name, diff in diffs.items():
+        stub = create_app(diff=diff)
+        with serve(stub) as base_url:
+            github_service.base_url = base_url
+            await github_service.start()
+            tracemalloc.start()
+            start = time.perf_counter()
+            # A repo of its own per review, so no hunk is ever memoized from an earlier one
+            ok = await review_pull_request("octo", f"memory-{name}", 1, TITLE)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            await github_service.close()
+        if not ok:
+            raise RuntimeError(f"Review of the {name} diff failed")
+        results[f"review_seconds.{name}"] = metric(elapsed, "s")
+        results[f"peak_memory_mb.{name}"] = metric(peak / 1024 / 1024, "MB")
+
+    stub = create_app(diff=diffs["medium"])
+    with serve(stub) as base_url:
+        github_service.base_url = base_url
+        await github_service.start()
+        for level in concurrency_levels:
+            semaphore = asyncio.Semaphore(level)
+
+            async def review(number: int) -> bool:
+                async with semaphore:
+                    return await review_pull_request("octo", f"throughput-{level}-{number}", number, TITLE)
+
+            start = time.perf_counter()
+            outcomes = await asyncio.gather(*(review(number) for number in range(1, prs + 1)))
+            elapsed = time.perf_counter() - start
+            if not all(outcomes):
+                raise RuntimeError(f"{outcomes.count(False)} review(s) failed at concurrency {level}")
+            results[f"reviews_per_second.c{level}"] = metric(prs / elapsed, "reviews/s", better="higher")
+        await github_service.close()
+    static_analyzer.shutdown()
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Metrics that got worse than the baseline by more than tolerance
+
+    Args:
+        results: Metrics of this run
+        baseline: Metrics of an earlier run
+        tolerance: Allowed relative change in the bad direction, e.g. 0.2
+
+    Returns:
+        (name, baseline value, value, relative change) of each regression
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None or not before["value"]:
+            continue
+        change = (current["value"] - before["value"]) / before["value"]
+        worse = change if current["better"] == "lower" else -change
+        if worse > tolerance:
+            regressions.append((name, before["value"], current["value"], change))
+    return regressions
+
+
+def main() -> int:
+    diffs = corpus()
+    levels = [int(level) for level in args.concurrency.split(",")]
+    started = time.perf_counter()
+
+    results = {}
+    results.update(hot_path(diffs, args.runs))
+    results.update(asyncio.run(full_reviews(diffs, levels, args.prs)))
+    # Last: leaving the served app runs its shutdown hook, which stops the model's worker pool
+    results.update(webhook_ack(args.webhooks))
+    # Timed again at the end, keeping the faster, so one slow moment doesn't read as a regression
+    for name, value in hot_path(diffs, args.runs).items():
+        results[name]["value"] = min(results[name]["value"], value["value"])
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "model_latency": args.latency,
+            "corpus": {name: {"lines": lines, "files": files, "bytes": len(diffs[name])}
+                       for name, (lines, files) in CORPUS.items()},
+            "token_budget_per_request": settings.TOKEN_BUDGET_PER_REQUEST,
+            "pr_review_concurrency": settings.PR_REVIEW_CONCURRENCY,
+            "gemini_max_workers": settings.GEMINI_MAX_WORKERS,
+        },
+        "duration_seconds": round(time.perf_counter() - started, 2),
+        "metrics": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📊 Benchmark suite at {report['revision'] or 'unknown revision'}, model latency {args.latency}")
+    for name, value in results.items():
+        print(f"   {name:<28} {value['value']:>10.3f} {value['unit']}")
+    print(f"   Written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["metrics"], args.tolerance)
+    print(f"📊 Against {args.baseline} ({baseline.get('revision') or 'unknown revision'}), "
+          f"tolerance {args.tolerance:.0%}")
+    for name, before, after, change in regressions:
+        print(f"   ❌ {name:<28} {before:>10.3f} -> {after:>10.3f} ({change:+.0%})")
+    if not regressions:
+        print("   ✅ No regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
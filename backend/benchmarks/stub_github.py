@@ -0,0 +1,240 @@
+"""
+Local stub of the GitHub REST API for benchmarks
+
+Serves the handful of endpoints BroCode talks to (PR diff, PR files, issue
+comments, pull request reviews and review comments) from memory, on a real
+socket, so HTTP connection setup and reuse behave as they would against
+api.github.com. Like GitHub, GETs carry an ETag and answer If-None-Match
+with 304; optionally responses carry X-RateLimit-* headers from a quota
+(`stub.state.quota`) and writes beyond `stub.state.write_limit` per second
+get a secondary rate limit 403 with Retry-After.
+
+It also mints GitHub App installation tokens for any app JWT and maps repos
+to installations (`stub.state.installations`, installation 1 by default;
+None for a repo the app is not installed on). Each installation token spends
+the quota of its own installation, starting from a copy of `quota`, the way
+GitHub gives every installation its own.
+"""
+import datetime
+import hashlib
+import itertools
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+DEFAULT_DIFF = """diff --git a/app.js b/app.js
+index 1111111..2222222 100644
+--- a/app.js
++++ b/app.js
+@@ -1,3 +1,4 @@
+ const a = 1;
++const b = a + 1;
+ console.log(a);
+ module.exports = a;
+"""
+
+
+def files_listing(diff: str) -> list:
+    """The PR files listing GitHub would return for a diff"""
+    from app.services.diff_parser import iter_file_diffs
+    from app.services.file_filter import listing_from_diff
+    return listing_from_diff(iter_file_diffs(diff.splitlines()))
+
+
+def _etag(content: str) -> str:
+    return '"' + hashlib.sha1(content.encode("utf-8")).hexdigest() + '"'
+
+
+def create_app(diff: str = DEFAULT_DIFF, files: list = None, quota: dict = None, write_limit: int = 0) -> FastAPI:
+    """
+    Build the stub app serving a fixed diff and file listing (derived from the diff by default)
+
+    Args:
+        diff: The PR diff
+        files: The PR files listing; derived from the diff if None
+        quota: {"remaining": n, "reset": epoch seconds} to send X-RateLimit-* headers, optionally
+               with the "limit" and "window" seconds it resets to
+        write_limit: Writes allowed per second before a secondary rate limit (0 = no limit)
+    """
+    from app.services.diff_parser import iter_file_diffs
+    from app.services.pr_review_service import commentable_lines
+
+    stub = FastAPI()
+    stub.state.diff = diff
+    stub.state.files = files_listing(diff) if files is None else files
+    stub.state.comments = []
+    stub.state.reviews = []
+    stub.state.review_comments = []
+    stub.state.requests = {"diff": 0, "files": 0, "not_modified": 0, "writes": 0, "rate_limited": 0,
+                           "tokens_minted": 0}
+    stub.state.quota = quota
+    stub.state.installations = {}  # owner/repo -> installation id
+    stub.state.installation_quotas = {}  # installation id -> quota
+    stub.state.tokens = {}  # installation token -> installation id
+    stub.state.token_ttl = 3600
+    token_numbers = itertools.count(1)
+    stub.state.write_limit = write_limit
+    stub.state.write_times = []
+
+    def quota_for(request: Request):
+        """The installation's own quota for installation tokens, the shared one otherwise"""
+        token = request.headers.get("authorization", "").split(" ")[-1]
+        installation = stub.state.tokens.get(token)
+        if stub.state.quota is None or installation is None:
+            return stub.state.quota
+        quotas = stub.state.installation_quotas
+        if installation not in quotas:
+            quotas[installation] = {**stub.state.quota, "remaining": stub.state.quota.get(
+                "limit", stub.state.quota["remaining"])}
+        return quotas[installation]
+
+    def rate_limit_headers(request: Request, response: Response, spend: bool = True):
+        quota = quota_for(request)
+        if quota is None:
+            return
+        if time.time() >= quota["reset"]:
+            quota.update(remaining=quota.get("limit", 5000), reset=time.time() + quota.get("window", 3600))
+        if spend and quota["remaining"] > 0:
+            quota["remaining"] -= 1
+        response.headers["X-RateLimit-Remaining"] = str(quota["remaining"])
+        response.headers["X-RateLimit-Reset"] = str(int(quota["reset"]))
+
+    def conditional(request: Request, etag: str):
+        """A 304 if the client already has this version (free, like on GitHub)"""
+        if request.headers.get("if-none-match") == etag:
+            stub.state.requests["not_modified"] += 1
+            response = Response(status_code=304, headers={"ETag": etag})
+            rate_limit_headers(request, response, spend=False)
+            return response
+        return None
+
+    def throttled_write():
+        """Secondary rate limit on bursts of writes"""
+        stub.state.requests["writes"] += 1
+        if not stub.state.write_limit:
+            return None
+        now = time.monotonic()
+        stub.state.write_times = [t for t in stub.state.write_times if now - t < 1.0] + [now]
+        if len(stub.state.write_times) > stub.state.write_limit:
+            stub.state.requests["rate_limited"] += 1
+            return JSONResponse({"message": "You have exceeded a secondary rate limit"},
+                                status_code=403, headers={"Retry-After": "1"})
+        return None
+
+    def app_jwt(request: Request) -> bool:
+        """Whether the request carries something shaped like an app JWT"""
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        return scheme == "Bearer" and token.count(".") == 2
+
+    @stub.post("/app/installations/{installation_id}/access_tokens", status_code=201)
+    async def mint_token(installation_id: int, request: Request):
+        if not app_jwt(request):
+            return JSONResponse({"message": "A JSON web token could not be decoded"}, status_code=401)
+        stub.state.requests["tokens_minted"] += 1
+        token = f"ghs_stub{installation_id}x{next(token_numbers)}"
+        stub.state.tokens[token] = installation_id
+        expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=stub.state.token_ttl)
+        return {"token": token, "expires_at": expires.strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+    @stub.get("/repos/{owner}/{repo}/installation")
+    async def get_installation(owner: str, repo: str, request: Request):
+        if not app_jwt(request):
+            return JSONResponse({"message": "A JSON web token could not be decoded"}, status_code=401)
+        installation = stub.state.installations.get(f"{owner}/{repo}", 1)
+        if installation is None:
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        return {"id": installation}
+
+    @stub.get("/repos/{owner}/{repo}/pulls/{pr_number}")
+    async def get_pull(owner: str, repo: str, pr_number: int, request: Request):
+        if "diff" in request.headers.get("accept", ""):
+            stub.state.requests["diff"] += 1
+            etag = _etag(stub.state.diff)
+            response = conditional(request, etag) or Response(
+                stub.state.diff, media_type="text/plain", headers={"ETag": etag}
+            )
+            if response.status_code == 200:
+                rate_limit_headers(request, response)
+            return response
+        return {"number": pr_number, "title": "Stub PR", "head": {"sha": "0" * 40}}
+
+    @stub.get("/repos/{owner}/{repo}/pulls/{pr_number}/files")
+    async def get_files(owner: str, repo: str, pr_number: int, request: Request,
+                        per_page: int = 30, page: int = 1):
+        stub.state.requests["files"] += 1
+        start = (page - 1) * per_page
+        page_files = stub.state.files[start:start + per_page]
+        headers = {"ETag": _etag(f"{start}:{per_page}:{stub.state.diff}")}
+        if start + per_page < len(stub.state.files):
+            next_url = request.url.include_query_params(per_page=per_page, page=page + 1)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        response = conditional(request, headers["ETag"])
+        if response is not None:
+            return response
+        response = JSONResponse(page_files, headers=headers)
+        rate_limit_headers(request, response)
+        return response
+
+    @stub.post("/repos/{owner}/{repo}/issues/{pr_number}/comments", status_code=201)
+    async def post_comment(owner: str, repo: str, pr_number: int, request: Request):
+        limited = throttled_write()
+        if limited is not None:
+            return limited
+        body = await request.json()
+        stub.state.comments.append({"pr_number": pr_number, **body})
+        return {"id": len(stub.state.comments)}
+
+    @stub.post("/repos/{owner}/{repo}/pulls/{pr_number}/comments", status_code=201)
+    async def post_review_comment(owner: str, repo: str, pr_number: int, request: Request):
+        """One inline comment per call, the way inline feedback is posted without reviews"""
+        limited = throttled_write()
+        if limited is not None:
+            return limited
+        body = await request.json()
+        stub.state.review_comments.append(body)
+        return {"id": len(stub.state.review_comments)}
+
+    @stub.post("/repos/{owner}/{repo}/pulls/{pr_number}/reviews")
+    async def post_review(owner: str, repo: str, pr_number: int, request: Request):
+        limited = throttled_write()
+        if limited is not None:
+            return limited
+        body = await request.json()
+        # Like GitHub, reject comments on lines that are not part of the diff
+        lines = commentable_lines(list(iter_file_diffs(stub.state.diff.splitlines())))
+        for comment in body.get("comments", []):
+            if comment["line"] not in lines.get(comment["path"], ()):
+                return JSONResponse({"message": "Unprocessable Entity",
+                                     "errors": ["Line could not be resolved"]}, status_code=422)
+        stub.state.reviews.append({"pr_number": pr_number, **body})
+        return {"id": len(stub.state.reviews), "state": "COMMENTED"}
+
+    return stub
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(app: FastAPI = None):
+    """Run the stub server on a background thread and yield its base URL"""
+    app = app or create_app()
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
@@ -0,0 +1,57 @@
+"""
+Synthetic unified diffs for benchmarks
+
+Generates deterministic git-style diffs with a given number of changed lines
+spread over several files and hunks.
+"""
+import random
+
+
+def make_diff(total_lines: int, files: int = 10, hunk_size: int = 20, seed: int = 0) -> str:
+    """
+    Build a diff with roughly total_lines lines of hunk content
+
+    Args:
+        total_lines: Approximate number of hunk body lines in the diff
+        files: How many files to spread them over
+        hunk_size: Body lines per hunk
+        seed: Random seed, so the same arguments always give the same diff
+    """
+    rng = random.Random(seed)
+    lines_per_file = max(total_lines // files, 1)
+    out = []
+
+    for file_index in range(files):
+        path = f"src/module_{file_index}/service_{file_index}.py"
+        out += [
+            f"diff --git a/{path} b/{path}",
+            f"index {rng.getrandbits(28):07x}..{rng.getrandbits(28):07x} 100644",
+            f"--- a/{path}",
+            f"+++ b/{path}",
+        ]
+        old_line = new_line = 1
+        written = 0
+        while written < lines_per_file:
+            body = []
+            old_count = new_count = 0
+            for _ in range(min(hunk_size, lines_per_file - written)):
+                roll = rng.random()
+                name = f"value_{rng.randint(0, 9999)}"
+                if roll < 0.5:
+                    body.append(f"+    {name} = compute({name}, retries={rng.randint(1, 5)})")
+                    new_count += 1
+                elif roll < 0.7:
+                    body.append(f"-    {name} = compute({name})")
+                    old_count += 1
+                else:
+                    body.append(f"     log.debug('{name}')")
+                    old_count += 1
+                    new_count += 1
+            out.append(f"@@ -{old_line},{old_count} +{new_line},{new_count} @@ def handler_{written}():")
+            out += body
+            written += len(body)
+            # Leave a gap of unchanged lines between hunks
+            old_line += old_count + 10
+            new_line += new_count + 10
+
+    return "\n".join(out) + "\n"
@@ -0,0 +1,142 @@
+"""
+Job queue dedupe, fair claiming, retries and leases
+
+Run from backend/: python -m pytest tests
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.job_queue import FAILED, QUEUED, RUNNING, SUCCEEDED, SUPERSEDED, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    yield queue
+    queue.close()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def enqueue(queue: JobQueue, repo: str = "octo/a", **kwargs) -> str:
+    return run(queue.enqueue("pr_review", repo, {"repo": repo}, **kwargs))["id"]
+
+
+def lapse_lease(queue: JobQueue, job_id: str):
+    queue.conn.execute("UPDATE jobs SET lease_expires_at = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def make_runnable(queue: JobQueue, job_id: str):
+    queue.conn.execute("UPDATE jobs SET run_at = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def test_dedupe_key_supersedes_queued_and_running_jobs(queue):
+    running = enqueue(queue, dedupe_key="octo/a#1")
+    run(queue.claim("w1"))
+    queued = enqueue(queue, dedupe_key="octo/a#1")
+    other = enqueue(queue, dedupe_key="octo/a#2")
+    newest = enqueue(queue, dedupe_key="octo/a#1")
+
+    assert run(queue.get(running))["status"] == SUPERSEDED
+    assert run(queue.get(queued))["status"] == SUPERSEDED
+    assert run(queue.get(other))["status"] == QUEUED
+    assert run(queue.get(newest))["status"] == QUEUED
+    # The superseded job's worker can no longer finish it
+    run(queue.complete(running, "w1"))
+    assert run(queue.get(running))["status"] == SUPERSEDED
+
+
+def test_claim_prefers_repos_with_fewer_running_jobs(queue):
+    a1 = enqueue(queue, "octo/a")
+    a2 = enqueue(queue, "octo/a")
+    b1 = enqueue(queue, "octo/b")
+
+    assert run(queue.claim("w1"))["id"] == a1
+    assert run(queue.claim("w2"))["id"] == b1
+    assert run(queue.claim("w3"))["id"] == a2
+    assert run(queue.claim("w4")) is None
+
+
+def test_claim_prefers_least_recently_served_repo(queue):
+    a1 = enqueue(queue, "octo/a")
+    run(queue.claim("w1"))
+    run(queue.complete(a1, "w1"))
+    enqueue(queue, "octo/a")
+    b1 = enqueue(queue, "octo/b")
+
+    assert run(queue.claim("w1"))["id"] == b1
+
+
+def test_failures_back_off_then_fail(queue, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 10.0)
+    monkeypatch.setattr(settings, "JOB_RETRY_MAX_SECONDS", 25.0)
+    job_id = enqueue(queue, max_attempts=4)
+
+    # 10s, 20s, then capped at 25s, each jittered by ±20%
+    for attempt, delay in enumerate([10, 20, 25], start=1):
+        job = run(queue.claim("w1"))
+        assert (job["id"], job["attempts"]) == (job_id, attempt)
+        before = time.time()
+        assert run(queue.fail(job_id, "boom", "w1")) == QUEUED
+        job = run(queue.get(job_id))
+        assert job["last_error"] == "boom" and job["worker_id"] is None
+        assert before + delay * 0.8 <= job["run_at"] <= time.time() + delay * 1.2
+        assert run(queue.claim("w1")) is None
+        make_runnable(queue, job_id)
+
+    run(queue.claim("w1"))
+    assert run(queue.fail(job_id, "boom", "w1")) == FAILED
+    job = run(queue.get(job_id))
+    assert job["status"] == FAILED and job["attempts"] == 4 and job["finished_at"] is not None
+
+
+def test_fail_without_retry(queue):
+    job_id = enqueue(queue, max_attempts=3)
+    run(queue.claim("w1"))
+    assert run(queue.fail(job_id, "bad payload", "w1", retry=False)) == FAILED
+
+
+def test_release_does_not_count_the_attempt(queue):
+    job_id = enqueue(queue)
+    run(queue.claim("w1"))
+    run(queue.release(job_id, delay=30))
+
+    job = run(queue.get(job_id))
+    assert job["status"] == QUEUED and job["attempts"] == 0 and job["worker_id"] is None
+    assert run(queue.claim("w1")) is None
+    make_runnable(queue, job_id)
+    assert run(queue.claim("w2"))["attempts"] == 1
+
+
+def test_lapsed_lease_is_claimed_again(queue):
+    job_id = enqueue(queue, max_attempts=3)
+    run(queue.claim("w1"))
+    assert run(queue.renew(job_id, "w1"))
+    lapse_lease(queue, job_id)
+
+    job = run(queue.claim("w2"))
+    assert (job["id"], job["worker_id"], job["attempts"]) == (job_id, "w2", 2)
+    # The first worker lost the job: it can't renew, complete or fail it
+    assert not run(queue.renew(job_id, "w1"))
+    run(queue.complete(job_id, "w1"))
+    assert run(queue.fail(job_id, "late", "w1")) == RUNNING
+    job = run(queue.get(job_id))
+    assert (job["status"], job["worker_id"], job["last_error"]) == (RUNNING, "w2", None)
+
+    run(queue.complete(job_id, "w2"))
+    assert run(queue.get(job_id))["status"] == SUCCEEDED
+
+
+def test_lapsed_lease_on_last_attempt_fails(queue):
+    job_id = enqueue(queue, max_attempts=1)
+    run(queue.claim("w1"))
+    lapse_lease(queue, job_id)
+
+    assert run(queue.claim("w2")) is None
+    job = run(queue.get(job_id))
+    assert job["status"] == FAILED and job["finished_at"] is not None and job["worker_id"] is None
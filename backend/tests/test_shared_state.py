@@ -0,0 +1,81 @@
+"""
+Shared state keys: add, renew and delete only by the owner
+
+Run from backend/: python -m pytest tests
+"""
+import asyncio
+
+import pytest
+
+from app.core.shared_state import PROCESSES, MemoryState, SQLiteState
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def state(request, tmp_path):
+    state = MemoryState(10) if request.param == "memory" else SQLiteState(str(tmp_path / "state.db"), 10)
+    yield state
+    state.close()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_add_only_sets_a_missing_key(state):
+    assert run(state.add("lock", 60, "w1"))
+    assert not run(state.add("lock", 60, "w2"))
+    assert run(state.get("lock")) == "w1"
+
+
+def test_add_takes_over_an_expired_key(state):
+    assert run(state.add("lock", -1, "w1"))
+    assert run(state.get("lock")) is None
+    assert run(state.add("lock", 60, "w2"))
+    assert run(state.get("lock")) == "w2"
+
+
+def test_renew_only_by_owner(state):
+    run(state.add("lock", 60, "w1"))
+    assert run(state.renew("lock", "w1", 60))
+    assert not run(state.renew("lock", "w2", 60))
+    assert not run(state.renew("missing", "w1", 60))
+
+
+def test_renew_fails_once_expired(state):
+    run(state.add("lock", -1, "w1"))
+    assert not run(state.renew("lock", "w1", 60))
+
+
+def test_delete_with_owner(state):
+    run(state.add("lock", 60, "w1"))
+    assert not run(state.delete("lock", "w2"))
+    assert run(state.get("lock")) == "w1"
+    assert run(state.delete("lock", "w1"))
+    assert run(state.get("lock")) is None
+    assert not run(state.delete("lock", "w1"))
+
+
+def test_delete_without_owner(state):
+    run(state.set("cache", "value", 60))
+    assert run(state.delete("cache"))
+    assert run(state.get("cache")) is None
+
+
+def test_set_replaces(state):
+    run(state.add("key", 60, "old"))
+    run(state.set("key", "new", 60))
+    assert run(state.get("key")) == "new"
+
+
+def test_sqlite_state_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "state.db")
+    first, second = SQLiteState(path, 10), SQLiteState(path, 10)
+    try:
+        assert run(first.add("lock", 60, "w1"))
+        assert not run(second.add("lock", 60, "w2"))
+        assert not run(second.delete("lock", "w2"))
+        assert run(first.heartbeat(PROCESSES, "p1", 60)) == 1
+        assert run(second.heartbeat(PROCESSES, "p2", 60)) == 2
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,43 @@
+"""
+Comment-only hunk detection in the static pre-analysis
+
+Run from backend/: python -m pytest tests
+"""
+import pytest
+
+from app.core.prompts import detect_language
+from app.services.diff_parser import Hunk
+from app.services.static_analysis import SKIP_COMMENT_ONLY, has_code, trivial_hunk_reason
+
+
+def hunk(*lines: str) -> Hunk:
+    return Hunk(1, 1, 1, 1, lines=list(lines))
+
+
+@pytest.mark.parametrize("filename, lines", [
+    ("a.c", ["-    *out = 0;", "+    *out = len;"]),
+    ("a.go", ["-    *p = x", "+    *p = y"]),
+    ("a.php", ["+#[Route('/users')]"]),
+    ("a.js", ["+  *[Symbol.iterator]() {"]),
+    ("a.c", ["+/* note */ count++;"]),
+    # A * line whose /* opened above the hunk can't be told from code
+    ("a.c", ["- * old wording", "+ * new wording"]),
+])
+def test_code_is_not_comment_only(filename, lines):
+    assert trivial_hunk_reason(hunk(*lines), detect_language(filename)) is None
+
+
+@pytest.mark.parametrize("filename, lines", [
+    ("a.c", [" /**", "- * old wording", "+ * new wording", " */"]),
+    ("a.c", ["+/* added", "+ * block", "+ */"]),
+    ("a.js", ["-// old", "+// new"]),
+    ("a.php", ["-# old", "+# new", "+// also"]),
+    ("a.py", ["-# old", "+# new"]),
+])
+def test_comment_only_hunks(filename, lines):
+    assert trivial_hunk_reason(hunk(*lines), detect_language(filename)) == SKIP_COMMENT_ONLY
+
+
+def test_php_attribute_file_has_code():
+    assert has_code("<?php\n#[Attribute]\n", detect_language("a.php"))
+    assert not has_code("<?php\n# only a comment\n", detect_language("a.php"))
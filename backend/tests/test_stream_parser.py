@@ -0,0 +1,158 @@
+"""
+Streamed review parsing gives the same result however the text is chunked
+
+Run from backend/: python -m pytest tests
+"""
+import json
+import random
+
+import pytest
+
+from app.core.stream_parser import IssueStreamParser, parse_review
+
+
+def issue(title: str, **fields) -> dict:
+    return {"type": "bug", "severity": "high", "line": 3, "title": title,
+            "description": "Explained", "suggestion": "Fix it", **fields}
+
+
+VALID = json.dumps({
+    "summary": "Two problems",
+    "issues": [issue("First"), issue("Second", line=None)],
+    "positive_aspects": ["Clear names"],
+}, indent=2)
+
+FENCED = "Here is the review:\n```json\n" + VALID + "\n```\nHope this helps."
+
+ESCAPES = json.dumps({
+    "issues": [
+        issue('Quote \\" and } brace', description='Ends with a backslash \\', code_snippet='x = "]"; {y}'),
+        issue("Unicode é \\u2603", description="Line one\nLine two\ttabbed"),
+    ],
+    "summary": 'Mentions "issues": [ inside a string',
+})
+
+NESTED = json.dumps({
+    "issues": [issue("Nested", extra={"list": [1, {"brace": "}"}], "text": "]"}), issue("After")],
+    "summary": "Extra fields",
+})
+
+TRAILING_COMMAS = """{
+  "summary": "Sloppy JSON",
+  "issues": [
+    {"type": "bug", "severity": "low", "title": "Comma", "description": "d", "suggestion": "s",},
+    {"type": "style", "severity": "low", "title": "Comma, \\"quoted\\" }", "description": "d", "suggestion": "s"},
+  ],
+  "positive_aspects": ["a", "b",],
+}"""
+
+MISSING_FIELDS = json.dumps({
+    "issues": [{"type": "bug", "title": "No severity"}, issue("Kept")],
+    "summary": "One invalid",
+})
+
+TRUNCATED_IN_ISSUES = json.dumps({
+    "summary": "Cut off",
+    "issues": [issue("Complete"), issue("Cut", description="This sentence never ends")],
+})[:-80]
+
+TRUNCATED_IN_SUMMARY = json.dumps({
+    "issues": [issue("Complete")],
+    "summary": "The model stopped writing in the middle of this",
+})[:-15]
+
+NO_ISSUES_KEY = "I could not review this diff."
+
+DOCUMENTS = {
+    "valid": (VALID, ["First", "Second"], False),
+    "fenced": (FENCED, ["First", "Second"], False),
+    "escapes": (ESCAPES, ['Quote \\" and } brace', "Unicode é \\u2603"], False),
+    "nested": (NESTED, ["Nested", "After"], False),
+    "trailing_commas": (TRAILING_COMMAS, ["Comma", 'Comma, "quoted" }'], False),
+    "missing_fields": (MISSING_FIELDS, ["Kept"], False),
+    "truncated_in_issues": (TRUNCATED_IN_ISSUES, ["Complete"], True),
+    "truncated_in_summary": (TRUNCATED_IN_SUMMARY, ["Complete"], True),
+}
+
+
+def parse_in(chunks):
+    parser = IssueStreamParser()
+    streamed = [found for chunk in chunks for found in parser.feed(chunk)]
+    result = parser.finish()
+    if result.data is not None:
+        # Issues handed back while streaming are the first ones finish() returns
+        assert result.data["issues"][:len(streamed)] == streamed
+    return result.data, result.repaired, result.truncated, result.rejected
+
+
+def random_chunks(text: str, seed: int):
+    rng = random.Random(seed)
+    chunks, pos = [], 0
+    while pos < len(text):
+        size = rng.randint(1, 12)
+        chunks.append(text[pos:pos + size])
+        pos += size
+    return chunks
+
+
+@pytest.mark.parametrize("name", DOCUMENTS)
+def test_one_character_at_a_time_matches_whole(name):
+    text, titles, truncated = DOCUMENTS[name]
+    whole = parse_in([text])
+    assert parse_in(list(text)) == whole
+
+    data, _, was_truncated, _ = whole
+    assert [found["title"] for found in data["issues"]] == titles
+    assert was_truncated == truncated
+
+
+@pytest.mark.parametrize("name", DOCUMENTS)
+def test_every_chunk_boundary_matches_whole(name):
+    text = DOCUMENTS[name][0]
+    whole = parse_in([text])
+    for split in range(1, len(text)):
+        assert parse_in([text[:split], text[split:]]) == whole, f"split at {split}: {text[split - 5:split + 5]!r}"
+    for seed in range(20):
+        assert parse_in(random_chunks(text, seed)) == whole
+
+
+def test_whole_document_values():
+    data, repaired, truncated, rejected = parse_in([VALID])
+    assert (data["summary"], data["positive_aspects"]) == ("Two problems", ["Clear names"])
+    assert data["issues"][1]["line"] is None
+    assert (repaired, truncated, rejected) == (False, False, 0)
+
+    data, _, _, _ = parse_in([ESCAPES])
+    assert data["issues"][0]["description"] == "Ends with a backslash \\"
+    assert data["issues"][0]["code_snippet"] == 'x = "]"; {y}'
+    assert data["issues"][1]["description"] == "Line one\nLine two\ttabbed"
+    assert data["summary"] == 'Mentions "issues": [ inside a string'
+
+
+def test_trailing_commas_are_repaired():
+    data, repaired, truncated, rejected = parse_in([TRAILING_COMMAS])
+    assert data["positive_aspects"] == ["a", "b"]
+    assert (repaired, truncated, rejected) == (True, False, 0)
+
+
+def test_invalid_issue_is_rejected():
+    assert parse_in([MISSING_FIELDS])[3] == 1
+
+
+def test_truncated_keeps_summary_before_the_cut():
+    data, repaired, truncated, _ = parse_in([TRUNCATED_IN_ISSUES])
+    assert data["summary"] == "Cut off"
+    assert repaired and truncated
+
+
+def test_no_issues_array():
+    assert parse_in([NO_ISSUES_KEY])[0] is None
+    assert parse_in(list(NO_ISSUES_KEY))[0] is None
+
+
+@pytest.mark.parametrize("name", DOCUMENTS)
+def test_parse_review_matches_streaming(name):
+    text = DOCUMENTS[name][0]
+    result = parse_review(text)
+    data, _, truncated, rejected = parse_in([text])
+    assert (result.data, result.truncated, result.rejected) == (data, truncated, rejected)
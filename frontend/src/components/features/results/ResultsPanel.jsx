@@ -80,7 +80,7 @@ const ResultsPanel = ({ result, loading }) => {
       <div style={summaryCardStyles}>
         <h3 style={summaryTitleStyles}><FileText size={18} color="#1a1c16" /> EXECUTIVE SUMMARY</h3>
         <p style={{ color: '#1a1c16', lineHeight: '1.6', fontWeight: '500' }}>
-          {result.summary}
+          {result.summary || (loading ? 'Reviewing…' : '')}
         </p>
       </div>
 
@@ -114,7 +114,7 @@ const ResultsPanel = ({ result, loading }) => {
                     <IssueCard key={i} issue={issue} />
                 ))}
             </div>
-         ) : (
+         ) : !loading && (
             <div style={{ ...summaryCardStyles, textAlign: 'center', background: colors.severity.low.bg, borderColor: colors.severity.low.border }}>
                 <div style={{ marginBottom: spacing.sm, display: 'flex', justifyContent: 'center' }}>
                   <CheckCircle size={48} color={colors.status.success} />
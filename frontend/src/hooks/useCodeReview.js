@@ -1,5 +1,5 @@
 import { useState, useCallback } from 'react';
-import { reviewCode } from '../services/api';
+import { streamReview } from '../services/api';
 
 export const useCodeReview = () => {
   const [loading, setLoading] = useState(false);
@@ -18,7 +18,19 @@ export const useCodeReview = () => {
     setResult(null);
 
     try {
-      const data = await reviewCode({ code, filename, reviewType });
+      // Show issues as they stream in; the final review replaces them
+      const data = await streamReview({
+        code,
+        filename,
+        reviewType,
+        onIssue: (issue) => setResult(prev => ({
+          summary: '',
+          positive_aspects: [],
+          metadata: { filename, review_type: reviewType },
+          ...prev,
+          issues: [...(prev?.issues || []), issue]
+        }))
+      });
 
       setResult(data);
 
@@ -38,6 +38,62 @@ export const reviewCode = async ({ code, filename, reviewType }) => {
     }
 };
 
+/**
+ * Review code, receiving issues as the model writes them (Server-Sent Events)
+ *
+ * onIssue is called with each issue as it arrives; resolves with the full review.
+ */
+export const streamReview = async ({ code, filename, reviewType, onIssue }) => {
+    let response;
+    try {
+        response = await fetch(`${API_URL}/api/review/analyze/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ code, filename, review_type: reviewType }),
+        });
+    } catch (error) {
+        throw new Error('Failed to analyze code. Please check if the backend is running.');
+    }
+
+    if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.detail || 'Failed to analyze code.');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            const event = raw.match(/^event: (.*)$/m)?.[1];
+            const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? 'null');
+
+            if (event === 'issue') {
+                onIssue?.(data);
+            } else if (event === 'done') {
+                return data;
+            } else if (event === 'error') {
+                if (data.status === 429) {
+                    throw new Error('Rate limit reached. Please wait a moment and try again.');
+                }
+                throw new Error(data.detail);
+            }
+        }
+    }
+
+    throw new Error('Review stream ended unexpectedly.');
+};
+
 /**
  * Health check
  */